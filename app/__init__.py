@@ -1,20 +1,70 @@
 # app/__init__.py
+"""
+应用工厂
 
+导入本包没有副作用：不连接数据库、不建表。扩展和蓝图在 create_app() 内部导入，
+连接池在第一个请求借连接时才建立连接；表结构由 flask db migrate 维护
+"""
 import os
 from dotenv import load_dotenv
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
-from app.extentions.db_postgres import db
 
+from datetime import timedelta
 from flask import Flask
-app = Flask(__name__)
+
 
 def create_app():
-    db.init_database()
-    from app.api.v1.order import order_bp
-    app.register_blueprint(order_bp)
+    # 严格按照如下方式配置静态资源
+    static_folder = '../app/static' if os.path.exists('../app/static') else '../app/static'
+    app = Flask(__name__, static_folder=static_folder, static_url_path='/')
+
+    # Flask 配置
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'primordial-culture-secret-key-2025')
+    app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-primordial-2025')
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=7)
+    # 按蓝图配置 Cache-Control（与 ETag / 304 配合使用）
+    app.config['CACHE_CONTROL'] = {
+        'content': os.getenv('CONTENT_CACHE_CONTROL', 'public, max-age=60, stale-while-revalidate=300')
+    }
+    # 音频 / 视频文件目录，默认 static/media
+    app.config['MEDIA_FOLDER'] = os.getenv('MEDIA_FOLDER') or os.path.join(app.static_folder, 'media')
+
+    # CORS 配置
+    from flask_cors import CORS
+    CORS(app, resources={r"/api/*": {"origins": "*"}})
+
+    # 数据库连接池（请求结束时自动归还连接）
+    from app.extentions.db_postgres import init_app as init_db
+    init_db(app)
+
+    # SQL 统计：Server-Timing 响应头、N+1 告警、慢查询 EXPLAIN
+    from app.extentions.sql_trace import init_app as init_sql_trace
+    init_sql_trace(app)
+
+    # JWT 配置
+    from app.extentions.jwt import jwt
+    jwt.init_app(app)
+
+    # 注册蓝图
     from app.api.v1.user import user_bp
+    from app.api.v1.content import content_bp
+    from app.api.v1.order import order_bp
+    from app.api.v1.static import static_bp
     app.register_blueprint(user_bp)
-    from app.api.v1.auth import auth_bp
-    app.register_blueprint(auth_bp)
-    
-    return app
\ No newline at end of file
+    app.register_blueprint(content_bp)
+    app.register_blueprint(order_bp)
+    app.register_blueprint(static_bp)
+
+    # 静态资源：模板函数 asset_url() 与构建命令 flask build-assets
+    from app.utils.assets import init_app as init_assets
+    init_assets(app)
+
+    # 指标：按路由的延迟直方图、进行中请求数、连接池 / 缓存状态，/metrics 导出
+    from app.extentions.metrics import init_app as init_metrics
+    init_metrics(app)
+
+    # 数据库迁移与示例数据：flask db migrate / status / seed
+    from app.migrations.commands import db_cli
+    app.cli.add_command(db_cli)
+
+    return app
@@ -2,15 +2,21 @@
 import os
 import csv
 import io
+import zlib
 from datetime import datetime
-from flask import Flask, redirect, url_for, request, make_response, flash
+from flask import Flask, Response, redirect, url_for, request, make_response, flash, stream_with_context
 from flask_admin import Admin, AdminIndexView, BaseView, expose
 from flask_admin.contrib.sqla import ModelView
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import check_password_hash
+from sqlalchemy import inspect
 from app.extentions.db_postgres import db
-from app.models.user import User
-from app.models.content import Content
+from app.extentions.cache import content_cache
+from app.sevices.identity import identity_cache
+from app.sevices.entitlements import entitlements
+from app.sevices.ranking import rankings
+from app.sevices.statistics import get_stats_snapshot, refresh_snapshot
+from app.models import User, Content, Order
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -46,6 +52,10 @@ class UserModelView(SecureModelView):
         'created_at': lambda v, c, m, p: m.created_at.strftime('%Y-%m-%d %H:%M:%S') if m.created_at else '-'
     }
 
+    def after_model_change(self, form, model, is_created):
+        # 会员等级等资料变更后失效身份缓存
+        identity_cache.invalidate(model.id)
+
 class ContentModelView(SecureModelView):
     """内容管理视图"""
     column_list = ['id', 'type', 'title', 'price', 'created_at']
@@ -75,6 +85,17 @@ class ContentModelView(SecureModelView):
         'price': lambda v, c, m, p: f'¥{m.price:.2f}'
     }
 
+    def on_model_change(self, form, model, is_created):
+        # 记录修改前的类型，类型变更时新旧两个类型的列表缓存都要失效
+        history = inspect(model).attrs.type.history
+        model._previous_type = history.deleted[0] if history.deleted else None
+
+    def after_model_change(self, form, model, is_created):
+        content_cache.invalidate_content(model.id, {model.type, getattr(model, '_previous_type', None)})
+
+    def after_model_delete(self, model):
+        content_cache.invalidate_content(model.id, {model.type})
+
 class OrderModelView(SecureModelView):
     """订单管理视图"""
     column_list = ['id', 'user_id', 'content_id', 'payment_status', 'payment_time']
@@ -103,6 +124,21 @@ class OrderModelView(SecureModelView):
         'payment_time': lambda v, c, m, p: m.payment_time.strftime('%Y-%m-%d %H:%M:%S') if m.payment_time else '-'
     }
 
+    def on_model_change(self, form, model, is_created):
+        history = inspect(model).attrs.payment_status.history
+        model._previous_status = history.deleted[0] if history.deleted else None
+
+    def after_model_change(self, form, model, is_created):
+        # 退款等状态变更：本进程立即重新加载；其他 worker 通过订单计数器的 version 发现变更
+        previous = getattr(model, '_previous_status', None)
+        if previous != model.payment_status and 'paid' in (previous, model.payment_status):
+            entitlements.invalidate(model.user_id)
+            # 排行榜同步增减这笔销售
+            if previous == 'paid':
+                rankings.record_refund(model.content_id, model.payment_time)
+            else:
+                rankings.record_paid(model.content_id)
+
 class DataStatisticsView(BaseView):
     """数据统计视图"""
     def is_accessible(self):
@@ -114,40 +150,9 @@ class DataStatisticsView(BaseView):
     @expose('/')
     def index(self):
         try:
-            from models import User, Content, Order
-            
-            total_users = User.query.count()
-            vip_users = User.query.filter_by(membership_level='vip').count()
-            total_contents = Content.query.count()
-            total_orders = Order.query.count()
-            paid_orders = Order.query.filter_by(payment_status='paid').count()
-            
-            content_stats = db.session.query(
-                Content.type,
-                db.func.count(Content.id)
-            ).group_by(Content.type).all()
-            
-            order_stats = db.session.query(
-                Order.payment_status,
-                db.func.count(Order.id)
-            ).group_by(Order.payment_status).all()
-            
-            revenue = db.session.query(
-                db.func.sum(Content.price)
-            ).join(Order, Order.content_id == Content.id).filter(
-                Order.payment_status == 'paid'
-            ).scalar() or 0
-            
-            stats = {
-                'total_users': total_users,
-                'vip_users': vip_users,
-                'total_contents': total_contents,
-                'total_orders': total_orders,
-                'paid_orders': paid_orders,
-                'revenue': float(revenue),
-                'content_stats': dict(content_stats),
-                'order_stats': dict(order_stats)
-            }
+            # 读取预计算的统计快照（单行），不再逐项聚合
+            stats = get_stats_snapshot()
+            stats['cache_stats'] = content_cache.stats()
             
             return self.render('admin/statistics.html', stats=stats)
         
@@ -155,6 +160,94 @@ class DataStatisticsView(BaseView):
             logger.error(f"数据统计失败: {str(e)}")
             return self.render('admin/statistics.html', stats={}, error=str(e))
 
+    @expose('/refresh', methods=['POST'])
+    def refresh(self):
+        if refresh_snapshot():
+            flash('统计快照已刷新', 'success')
+        else:
+            flash('统计快照正在由其他进程刷新，请稍后查看', 'warning')
+        return redirect(url_for('.index'))
+
+# 导出时每批从服务端游标读取的行数
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 2000))
+
+
+class _EchoWriter:
+    """csv.writer 的写入目标：直接返回格式化后的行，不做缓冲"""
+    def write(self, value):
+        return value
+
+
+def _format_time(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else '-'
+
+
+def _format_price(value):
+    return f'{value:.2f}' if value is not None else '-'
+
+
+def _stream_query(sql):
+    """执行只读查询并返回逐行迭代器，使用服务端游标每批读取 EXPORT_BATCH_SIZE 行
+
+    查询在调用时立即执行（连接或 SQL 错误在响应开始前抛出）；
+    连接在迭代结束或响应被中断时归还连接池
+    """
+    conn = db.connect()
+    try:
+        result = conn.execution_options(yield_per=EXPORT_BATCH_SIZE).exec_driver_sql(sql)
+    except Exception:
+        conn.close()
+        raise
+
+    def rows():
+        try:
+            yield from result
+        finally:
+            conn.close()
+
+    return rows()
+
+
+def stream_csv(name, header, rows, label):
+    """以流式响应导出 CSV，内存占用与数据量无关
+
+    rows 为按批从服务端游标读取的可迭代对象；请求参数 gzip=1 时边生成边压缩
+    """
+    compress = request.args.get('gzip') == '1'
+
+    def generate():
+        writer = csv.writer(_EchoWriter())
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        count = 0
+        chunk = ['\ufeff' + writer.writerow(header)]
+        try:
+            for row in rows:
+                chunk.append(writer.writerow(row))
+                count += 1
+                if len(chunk) >= 500:
+                    data = ''.join(chunk).encode('utf-8')
+                    chunk.clear()
+                    yield compressor.compress(data) if compressor else data
+            data = ''.join(chunk).encode('utf-8')
+            yield compressor.compress(data) + compressor.flush() if compressor else data
+            logger.info(f"{label}导出成功，共 {count} 行")
+        except Exception as e:
+            # 响应头已发出，只能记录日志并中断输出
+            logger.error(f"{label}导出失败: {str(e)}")
+            raise
+
+    filename = f'{name}_{datetime.now().strftime("%Y%m%d%H%M%S")}.csv'
+    response = Response(stream_with_context(generate()))
+    if compress:
+        response.headers['Content-Type'] = 'application/gzip'
+        filename += '.gz'
+    else:
+        response.headers['Content-Type'] = 'text/csv; charset=utf-8-sig'
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 class DataExportView(BaseView):
     """数据导出视图"""
     def is_accessible(self):
@@ -163,32 +256,21 @@ class DataExportView(BaseView):
     def inaccessible_callback(self, name, **kwargs):
         return redirect(url_for('admin.login_view'))
     
+    @expose('/')
+    def index(self):
+        # 导出入口在数据统计页面
+        return redirect(url_for('statistics.index'))
+
     @expose('/export-users/')
     def export_users(self):
         try:
-            from models import User
-            
-            users = User.query.all()
-            
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(['用户ID', '用户名', '会员等级', '注册时间'])
-            
-            for user in users:
-                writer.writerow([
-                    user.id,
-                    user.username,
-                    user.membership_level,
-                    user.created_at.strftime('%Y-%m-%d %H:%M:%S') if user.created_at else '-'
-                ])
-            
-            output.seek(0)
-            response = make_response(output.getvalue())
-            response.headers['Content-Type'] = 'text/csv; charset=utf-8-sig'
-            response.headers['Content-Disposition'] = f'attachment; filename=users_{datetime.now().strftime("%Y%m%d%H%M%S")}.csv'
-            
-            logger.info("用户数据导出成功")
-            return response
+            rows = (
+                [user_id, username, membership_level, _format_time(created_at)]
+                for user_id, username, membership_level, created_at in _stream_query("""
+                    SELECT id, username, membership_level, created_at FROM users ORDER BY id
+                """)
+            )
+            return stream_csv('users', ['用户ID', '用户名', '会员等级', '注册时间'], rows, '用户数据')
         
         except Exception as e:
             logger.error(f"用户数据导出失败: {str(e)}")
@@ -197,36 +279,26 @@ class DataExportView(BaseView):
     @expose('/export-orders/')
     def export_orders(self):
         try:
-            from models import Order, User, Content
-            
-            orders = db.session.query(Order, User, Content).join(
-                User, Order.user_id == User.id
-            ).join(
-                Content, Order.content_id == Content.id
-            ).all()
-            
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(['订单ID', '用户名', '内容标题', '内容类型', '价格', '支付状态', '支付时间'])
-            
-            for order, user, content in orders:
-                writer.writerow([
-                    order.id,
-                    user.username,
-                    content.title,
-                    content.type,
-                    f'{content.price:.2f}',
-                    order.payment_status,
-                    order.payment_time.strftime('%Y-%m-%d %H:%M:%S') if order.payment_time else '-'
-                ])
-            
-            output.seek(0)
-            response = make_response(output.getvalue())
-            response.headers['Content-Type'] = 'text/csv; charset=utf-8-sig'
-            response.headers['Content-Disposition'] = f'attachment; filename=orders_{datetime.now().strftime("%Y%m%d%H%M%S")}.csv'
-            
-            logger.info("订单数据导出成功")
-            return response
+            # 用户或内容已删除的订单也导出，缺失的列显示为 -
+            rows = (
+                [
+                    order_id, username or '-', title or '-', content_type or '-', _format_price(price),
+                    _format_price(amount), payment_status, _format_time(payment_time)
+                ]
+                for order_id, username, title, content_type, price, amount, payment_status, payment_time
+                in _stream_query("""
+                    SELECT o.id, u.username, c.title, c.type, c.price, o.amount, o.payment_status, o.payment_time
+                    FROM orders o
+                    LEFT JOIN users u ON u.id = o.user_id
+                    LEFT JOIN contents c ON c.id = o.content_id
+                    ORDER BY o.id
+                """)
+            )
+            return stream_csv(
+                'orders',
+                ['订单ID', '用户名', '内容标题', '内容类型', '价格', '实付金额', '支付状态', '支付时间'],
+                rows, '订单数据'
+            )
         
         except Exception as e:
             logger.error(f"订单数据导出失败: {str(e)}")
@@ -235,31 +307,13 @@ class DataExportView(BaseView):
     @expose('/export-contents/')
     def export_contents(self):
         try:
-            from models import Content
-            
-            contents = Content.query.all()
-            
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(['内容ID', '类型', '标题', '描述', '价格', '发布时间'])
-            
-            for content in contents:
-                writer.writerow([
-                    content.id,
-                    content.type,
-                    content.title,
-                    content.description or '-',
-                    f'{content.price:.2f}',
-                    content.created_at.strftime('%Y-%m-%d %H:%M:%S') if content.created_at else '-'
-                ])
-            
-            output.seek(0)
-            response = make_response(output.getvalue())
-            response.headers['Content-Type'] = 'text/csv; charset=utf-8-sig'
-            response.headers['Content-Disposition'] = f'attachment; filename=contents_{datetime.now().strftime("%Y%m%d%H%M%S")}.csv'
-            
-            logger.info("内容数据导出成功")
-            return response
+            rows = (
+                [content_id, content_type, title, description or '-', _format_price(price), _format_time(created_at)]
+                for content_id, content_type, title, description, price, created_at in _stream_query("""
+                    SELECT id, type, title, description, price, created_at FROM contents ORDER BY id
+                """)
+            )
+            return stream_csv('contents', ['内容ID', '类型', '标题', '描述', '价格', '发布时间'], rows, '内容数据')
         
         except Exception as e:
             logger.error(f"内容数据导出失败: {str(e)}")
@@ -273,26 +327,7 @@ class SecureAdminIndexView(AdminIndexView):
             return redirect(url_for('.login_view'))
         
         try:
-            from models import User, Content, Order
-            
-            total_users = User.query.count()
-            total_contents = Content.query.count()
-            total_orders = Order.query.count()
-            paid_orders = Order.query.filter_by(payment_status='paid').count()
-            
-            revenue = db.session.query(
-                db.func.sum(Content.price)
-            ).join(Order, Order.content_id == Content.id).filter(
-                Order.payment_status == 'paid'
-            ).scalar() or 0
-            
-            stats = {
-                'total_users': total_users,
-                'total_contents': total_contents,
-                'total_orders': total_orders,
-                'paid_orders': paid_orders,
-                'revenue': float(revenue)
-            }
+            stats = get_stats_snapshot()
             
             return self.render('admin/index.html', stats=stats)
         
@@ -327,8 +362,6 @@ class SecureAdminIndexView(AdminIndexView):
 def init_admin(app, db_instance):
     """初始化Flask-Admin"""
     try:
-        from models import User, Content, Order
-        
         admin = Admin(
             app,
             name='洪荒文化IP数据中台',
@@ -336,9 +369,12 @@ def init_admin(app, db_instance):
             index_view=SecureAdminIndexView(name='数据概览', url='/admin')
         )
         
-        admin.add_view(UserModelView(User, db_instance.session, name='用户管理', endpoint='user'))
-        admin.add_view(ContentModelView(Content, db_instance.session, name='内容管理', endpoint='content'))
-        admin.add_view(OrderModelView(Order, db_instance.session, name='订单管理', endpoint='order'))
+        # user / content / order 已是 API 蓝图的名称，管理视图的 endpoint 加前缀，URL 不变
+        admin.add_view(UserModelView(User, db_instance.session, name='用户管理', endpoint='admin_user', url='/admin/user'))
+        admin.add_view(ContentModelView(
+            Content, db_instance.session, name='内容管理', endpoint='admin_content', url='/admin/content'
+        ))
+        admin.add_view(OrderModelView(Order, db_instance.session, name='订单管理', endpoint='admin_order', url='/admin/order'))
         admin.add_view(DataStatisticsView(name='数据统计', endpoint='statistics'))
         admin.add_view(DataExportView(name='数据导出', endpoint='export'))
         
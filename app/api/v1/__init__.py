@@ -4,10 +4,6 @@ from flask import Blueprint
 
 api = Blueprint('api', __name__)
 
-from .user import users_bp
-from .auth import auth_bp
-from .content import content_bp
-from .order import order_bp
-from .static import static_bp
-
-__all__ = ['users', 'auth', 'content', 'order', 'static']
\ No newline at end of file
+# 各蓝图由 create_app() 按需导入，这里不做预先导入，
+# 否则导入任意一个子模块都会连带加载全部蓝图及其依赖
+__all__ = ['user', 'auth', 'content', 'order', 'static']
@@ -1,98 +1,375 @@
 # app/api/v1/content.py
+import os
+import time
+import hashlib
+import threading
 from flask import Blueprint, request, jsonify
-from app.extensions.db_postgres import get_db_connection
+from app.extentions.db_postgres import get_db_connection
+from app.extentions.cache import content_cache
+from app.sevices.search import search_contents
+from app.sevices.entitlements import entitlements
+from app.sevices.ranking import rankings, BOARDS
+from app.utils.pagination import encode_cursor, decode_cursor, InvalidCursor
+from app.utils.http_cache import cache_entry, compute_etag, conditional_json
+from app.utils.serializers import (
+    CONTENT_FIELDS, InvalidFields, parse_fields, select_list, rows_to_dicts, fetch_dicts, json_response
+)
 import logging
 
 logger = logging.getLogger(__name__)
 content_bp = Blueprint('content', __name__, url_prefix='/api/v1/content')
 
 
+# 按类型缓存的内容总数（count=estimate 时使用）
+COUNT_CACHE_TTL = int(os.getenv('CONTENT_COUNT_CACHE_TTL', 60))
+MAX_PAGE_SIZE = 100
+_count_cache = {}
+_count_cache_lock = threading.Lock()
+
+
+def _count_contents(cursor, content_type, mode):
+    """统计内容总数
+
+    mode 为 exact 时执行 COUNT(*)；estimate 时全表取 pg_class.reltuples，
+    按类型则使用带过期时间的缓存计数；none 时不统计
+    """
+    if mode == 'none':
+        return None
+
+    if mode == 'estimate':
+        if not content_type:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = 'contents'::regclass")
+            row = cursor.fetchone()
+            # 从未 ANALYZE 过的表 reltuples 为 -1，退回精确统计
+            if row and row[0] >= 0:
+                return row[0]
+        else:
+            with _count_cache_lock:
+                cached = _count_cache.get(content_type)
+            if cached and cached[1] > time.monotonic():
+                return cached[0]
+
+    if content_type:
+        cursor.execute("SELECT COUNT(*) FROM contents WHERE type = %s", (content_type,))
+    else:
+        cursor.execute("SELECT COUNT(*) FROM contents")
+    total = cursor.fetchone()[0]
+
+    if content_type:
+        with _count_cache_lock:
+            _count_cache[content_type] = (total, time.monotonic() + COUNT_CACHE_TTL)
+    return total
+
+
+def _query_content_list(content_type, limit, page, after, count_mode, fields):
+    """从数据库查询一页内容列表，只读取 fields 及分页 / ETag 所需的列"""
+    conn = get_db_connection()
+    if not conn:
+        raise ConnectionError('数据库连接失败')
+
+    cursor = conn.cursor()
+    conditions = []
+    params = []
+    if content_type:
+        conditions.append("type = %s")
+        params.append(content_type)
+    if after:
+        conditions.append("(created_at, id) < (%s, %s)")
+        params.extend(after)
+    offset = (page - 1) * limit if page else 0
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    # 多取一行用于判断是否还有下一页，排序与索引 (type, created_at DESC, id DESC) 一致
+    # xmin 作为行版本参与 ETag 计算，内容被编辑时 ETag 随之变化
+    cursor.execute(f"""
+        SELECT {select_list(fields, 'id', 'created_at')}, xmin::text AS row_version
+        FROM contents 
+        {where}
+        ORDER BY created_at DESC, id DESC 
+        LIMIT %s OFFSET %s
+    """, (*params, limit + 1, offset))
+    names = [column[0] for column in cursor.description]
+    rows = cursor.fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    total = _count_contents(cursor, content_type, count_mode)
+
+    i_id, i_created_at, i_version = names.index('id'), names.index('created_at'), names.index('row_version')
+    last = rows[-1] if rows else None
+    result = {
+        'success': True,
+        'data': rows_to_dicts(names, rows, fields),
+        'total': total,
+        'has_more': has_more,
+        'next_cursor': encode_cursor(last[i_created_at], last[i_id]) if has_more else None
+    }
+    if page:
+        result['page'] = page
+        result['pages'] = (total + limit - 1) // limit if total is not None else None
+
+    etag = compute_etag([(row[i_id], row[i_version]) for row in rows], total, has_more, fields)
+    return cache_entry(result, etag)
+
+
+def _current_user_id():
+    """可选登录：携带有效令牌时返回用户 ID，匿名或令牌无效时返回 None"""
+    if 'Authorization' not in request.headers:
+        return None
+    from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
+def _owned_json(entry):
+    """登录用户的列表逐项标注 owned（查进程内权益索引，只按主键校验一次 version）
+
+    缓存条目由所有用户共享，标注时复制一份；ETag 同时覆盖本页的已购状态，
+    响应改为 private 并声明 Vary: Authorization，共享缓存不会把个人化结果给其他用户
+    """
+    user_id = _current_user_id()
+    data = entry['payload']['data']
+    if user_id is not None and (not data or 'id' in data[0]):
+        owned = entitlements.owned_many(user_id, [item['id'] for item in data])
+        entry = dict(
+            entry,
+            payload=dict(entry['payload'], data=[dict(item, owned=owned[item['id']]) for item in data]),
+            etag=compute_etag(entry['etag'], sorted(content_id for content_id, yes in owned.items() if yes))
+        )
+        response = conditional_json(entry)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    else:
+        response = conditional_json(entry)
+    response.vary.add('Authorization')
+    return response
+
+
 @content_bp.route('/api/content', methods=['GET'])
 def get_content():
-    """获取内容列表"""
+    """获取内容列表
+
+    支持两种分页方式：
+    - page/limit：传统页码分页，默认返回精确总数
+    - after：游标分页（首屏传空字符串），按 (created_at, id) 定位，
+      深翻页耗时恒定，默认不统计总数
+    count 参数可取 exact / estimate / none 控制总数的统计方式
+    sort=trending（近期热门）/ bestseller（畅销）按内存中的排行榜排序，只支持页码分页
+    传入 ids=1,5,9 时改为批量获取，按请求顺序返回并列出不存在的 id
+    携带登录令牌时每项附带 owned（是否已购买）
+    """
+    try:
+        if 'ids' in request.args:
+            return _get_contents_by_ids(
+                request.args.get('ids', ''), parse_fields(request.args.get('fields'), CONTENT_FIELDS)
+            )
+
+        content_type = request.args.get('type', '')
+        limit = min(max(int(request.args.get('limit', 12)), 1), MAX_PAGE_SIZE)
+        use_cursor = 'after' in request.args
+
+        sort = request.args.get('sort', 'latest')
+        if sort in BOARDS:
+            if use_cursor:
+                return jsonify({'success': False, 'message': '排行榜排序不支持游标分页'}), 400
+            page = max(int(request.args.get('page', 1)), 1)
+            fields = parse_fields(request.args.get('fields'), CONTENT_FIELDS)
+            return _get_ranked_contents(sort, content_type, page, limit, fields)
+        if sort != 'latest':
+            return jsonify({'success': False, 'message': '无效的 sort 参数'}), 400
+
+        count_mode = request.args.get('count', 'none' if use_cursor else 'exact')
+        if count_mode not in ('exact', 'estimate', 'none'):
+            return jsonify({'success': False, 'message': '无效的 count 参数'}), 400
+
+        page = None
+        after = None
+        token = request.args.get('after', '')
+        if use_cursor:
+            if token:
+                try:
+                    after = decode_cursor(token)
+                except InvalidCursor:
+                    return jsonify({'success': False, 'message': '无效的游标'}), 400
+        else:
+            page = max(int(request.args.get('page', 1)), 1)
+
+        fields = parse_fields(request.args.get('fields'), CONTENT_FIELDS)
+        position = f'c{token}' if use_cursor else f'p{page}'
+        key = content_cache.list_key(content_type, position, limit, count_mode, ','.join(fields))
+        entry = content_cache.get_or_load(
+            key, lambda: _query_content_list(content_type, limit, page, after, count_mode, fields)
+        )
+        return _owned_json(entry)
+    except InvalidFields as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except ValueError:
+        return jsonify({'success': False, 'message': '无效的分页参数'}), 400
+    except ConnectionError:
+        return jsonify({'success': False, 'message': '数据库连接失败'}), 500
+    except Exception as e:
+        logger.error(f"获取内容失败: {str(e)}")
+        return jsonify({'success': False, 'message': '获取内容失败'}), 500
+
+
+@content_bp.route('/api/content/search', methods=['GET'])
+def search_content():
+    """检索内容
+
+    q 为检索词；type 按类型过滤；mode=prefix 用于输入联想（标题前缀匹配）
+    """
     try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'success': False, 'message': '检索词不能为空'}), 400
+        content_type = request.args.get('type', '')
+        limit = min(max(int(request.args.get('limit', 20)), 1), MAX_PAGE_SIZE)
+        prefix = request.args.get('mode') == 'prefix'
+
+        digest = hashlib.sha1(query.encode('utf-8')).hexdigest()[:16]
+        key = content_cache.list_key(content_type, f"s{digest}{'p' if prefix else ''}", limit)
+        results = content_cache.get_or_load(
+            key, lambda: search_contents(query, content_type, limit, prefix)
+        )
+        return json_response({'success': True, 'data': results, 'total': len(results)})
+    except ValueError:
+        return jsonify({'success': False, 'message': '无效的参数'}), 400
+    except ConnectionError:
+        return jsonify({'success': False, 'message': '数据库连接失败'}), 500
+    except Exception as e:
+        logger.error(f"检索内容失败: {str(e)}")
+        return jsonify({'success': False, 'message': '检索内容失败'}), 500
+
+
+def _query_content_detail(content_id):
+    """从数据库查询单条内容，不存在时返回 None"""
+    conn = get_db_connection()
+    if not conn:
+        raise ConnectionError('数据库连接失败')
+
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT {select_list(CONTENT_FIELDS)}, xmin::text AS row_version FROM contents WHERE id = %s
+    """, (content_id,))
+    rows = fetch_dicts(cursor)
+    return _detail_entry(rows[0]) if rows else None
+
+
+def _detail_entry(content):
+    """把带 row_version 的内容行打包成详情缓存条目"""
+    row_version = content.pop('row_version')
+    return cache_entry(
+        {'success': True, 'data': content},
+        compute_etag(content['id'], row_version)
+    )
+
+
+def _load_detail_entries(ids):
+    """按 id 取详情缓存条目：先查缓存，未命中的 id 一次查询补齐并回填缓存"""
+    keys = {content_id: content_cache.detail_key(content_id) for content_id in ids}
+    cached = content_cache.get_many(list(keys.values()))
+    entries = {content_id: cached[key] for content_id, key in keys.items() if key in cached}
+
+    pending = [content_id for content_id in ids if content_id not in entries]
+    if pending:
         conn = get_db_connection()
         if not conn:
-            return jsonify({'success': False, 'message': '数据库连接失败'}), 500
-        
+            raise ConnectionError('数据库连接失败')
         cursor = conn.cursor()
-        content_type = request.args.get('type', '')
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 12))
-        offset = (page - 1) * limit
-        
-        if content_type:
-            cursor.execute("""
-                SELECT * FROM contents 
-                WHERE type = %s 
-                ORDER BY created_at DESC 
-                LIMIT %s OFFSET %s
-            """, (content_type, limit, offset))
-            
-            cursor.execute("SELECT COUNT(*) FROM contents WHERE type = %s", (content_type,))
-        else:
-            cursor.execute("""
-                SELECT * FROM contents 
-                ORDER BY created_at DESC 
-                LIMIT %s OFFSET %s
-            """, (limit, offset))
-            
-            cursor.execute("SELECT COUNT(*) FROM contents")
-        
-        contents = cursor.fetchall()
-        total = cursor.fetchone()[0]
-        
-        content_list = []
-        for content in contents:
-            content_list.append({
-                'id': content[0],
-                'type': content[1],
-                'title': content[2],
-                'description': content[3],
-                'price': content[4],
-                'image_url': content[5],
-                'created_at': content[6].isoformat() if content[6] else None
-            })
-        
-        return jsonify({
+        cursor.execute(f"""
+            SELECT {select_list(CONTENT_FIELDS)}, xmin::text AS row_version
+            FROM contents WHERE id = ANY(%s)
+        """, (pending,))
+        for content in fetch_dicts(cursor):
+            entry = _detail_entry(content)
+            entries[content['id']] = entry
+            content_cache.set(keys[content['id']], entry)
+    return entries
+
+
+def _get_ranked_contents(board, content_type, page, limit, fields):
+    """按排行榜分页：榜单是内存中的 ID 元组，本页内容走详情缓存"""
+    ranked = rankings.top(board, content_type)
+    start = (page - 1) * limit
+    ids = list(ranked[start:start + limit])
+    entries = _load_detail_entries(ids) if ids else {}
+
+    # 榜单刷新前被删除的内容直接跳过
+    found = [entries[content_id] for content_id in ids if content_id in entries]
+    total = len(ranked)
+    entry = cache_entry(
+        {
             'success': True,
-            'data': content_list,
+            'data': [{field: entry['payload']['data'][field] for field in fields} for entry in found],
             'total': total,
+            'has_more': start + limit < total,
             'page': page,
-            'pages': (total + limit - 1) // limit
-        })
-    except Exception as e:
-        logger.error(f"获取内容失败: {str(e)}")
-        return jsonify({'success': False, 'message': '获取内容失败'}), 500
+            'pages': (total + limit - 1) // limit,
+            'sort': board
+        },
+        compute_etag(board, [entry['etag'] for entry in found], total, fields)
+    )
+    return _owned_json(entry)
+
+
+def _get_contents_by_ids(raw_ids, fields):
+    """批量获取内容：先查详情缓存，未命中的 id 一次查询补齐并回填缓存"""
+    try:
+        ids = list(dict.fromkeys(int(content_id) for content_id in raw_ids.split(',') if content_id.strip()))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'ids 只能包含整数'}), 400
+    if not ids:
+        return jsonify({'success': False, 'message': 'ids 不能为空'}), 400
+    if len(ids) > MAX_PAGE_SIZE:
+        return jsonify({'success': False, 'message': f'单次最多获取 {MAX_PAGE_SIZE} 个内容'}), 400
+
+    entries = _load_detail_entries(ids)
+    found = [entries[content_id] for content_id in ids if content_id in entries]
+    data = [
+        {field: entry['payload']['data'][field] for field in fields}
+        for entry in found
+    ]
+    entry = cache_entry(
+        {
+            'success': True,
+            'data': data,
+            'missing': [content_id for content_id in ids if content_id not in entries]
+        },
+        compute_etag([entry['etag'] for entry in found], fields)
+    )
+    return _owned_json(entry)
+
 
 @content_bp.route('/api/content/<int:content_id>', methods=['GET'])
 def get_content_detail(content_id):
     """获取内容详情"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': '数据库连接失败'}), 500
-        
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM contents WHERE id = %s", (content_id,))
-        content = cursor.fetchone()
-        
-        if not content:
+        fields = parse_fields(request.args.get('fields'), CONTENT_FIELDS)
+        entry = content_cache.get_or_load(
+            content_cache.detail_key(content_id), lambda: _query_content_detail(content_id)
+        )
+        if not entry:
             return jsonify({'success': False, 'message': '内容不存在'}), 404
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'id': content[0],
-                'type': content[1],
-                'title': content[2],
-                'description': content[3],
-                'price': content[4],
-                'image_url': content[5],
-                'created_at': content[6].isoformat() if content[6] else None
-            }
-        })
+
+        if fields != CONTENT_FIELDS:
+            # 缓存中保存完整行，按需投影；不同投影使用不同的 ETag
+            data = entry['payload']['data']
+            entry = dict(
+                entry,
+                payload={'success': True, 'data': {field: data[field] for field in fields}},
+                etag=compute_etag(entry['etag'], fields)
+            )
+        response = conditional_json(entry)
+        # 304 重新验证不算浏览；登录用户按令牌、匿名访客按 IP 去重
+        if response.status_code == 200:
+            rankings.record_view(content_id, request.headers.get('Authorization') or request.remote_addr)
+        return response
+    except InvalidFields as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except ConnectionError:
+        return jsonify({'success': False, 'message': '数据库连接失败'}), 500
     except Exception as e:
         logger.error(f"获取内容详情失败: {str(e)}")
         return jsonify({'success': False, 'message': '获取内容详情失败'}), 500
-
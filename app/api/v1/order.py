@@ -1,66 +1,141 @@
 # api/v1/order.py
 from flask import Blueprint, request, jsonify
 from app.extentions.jwt import jwt_required, get_jwt_identity
-from app.extentions.db_postgres import db
+from app.extentions.db_postgres import db, get_db_connection
+from app.sevices.entitlements import entitlements
+from app.sevices.idempotency import idempotent, transaction, after_commit
+from app.sevices.ranking import rankings
+from app.utils.pagination import encode_id_cursor, decode_id_cursor, InvalidCursor
+from app.utils.serializers import ORDER_FIELDS, select_list, rows_to_dicts, json_response
 import logging
 
 logger = logging.getLogger(__name__)
 
 order_bp = Blueprint('order', __name__, url_prefix='/api/v1/order')
 
+# 批量下单单次最多包含的内容数
+MAX_BATCH_SIZE = 50
+# 订单列表分页大小
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# 与管理后台的支付状态选项一致
+ORDER_STATUSES = ('pending', 'paid', 'cancelled', 'refunded')
+
 @order_bp.route('/', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_order():
     """创建订单"""
     try:
         user_id = get_jwt_identity()
-        conn = db.connect()
-        
-        data = request.get_json()
+        data = request.get_json() or {}
         content_id = data.get('content_id')
-        
-        cursor = conn.execute("SELECT * FROM contents WHERE id = %s", (content_id,))
-        if not cursor.fetchone():
+
+        with transaction() as conn:
+            # 内容不存在时不插入，RETURNING 为空
+            cursor = conn.exec_driver_sql("""
+                INSERT INTO orders (user_id, content_id, payment_status)
+                SELECT %s, id, 'pending' FROM contents WHERE id = %s
+                RETURNING id
+            """, (user_id, content_id))
+            order = cursor.fetchone()
+        if not order:
             return jsonify({'success': False, 'message': '内容不存在'}), 404
-        
-        cursor = conn.execute("""
-            INSERT INTO orders (user_id, content_id, status, created_at)
-            VALUES (%s, %s, %s, NOW()) RETURNING id
-        """, (user_id, content_id, 'pending'))
-        
-        order_id = cursor.fetchone()[0]
-        conn.close()
-        
-        return jsonify({'success': True, 'order_id': order_id}), 201
+
+        return jsonify({'success': True, 'order_id': order[0]}), 201
     except Exception as e:
         logger.error(f"创建订单失败: {str(e)}")
         return jsonify({'success': False, 'message': '创建订单失败'}), 500
     
 
+@order_bp.route('/batch', methods=['POST'])
+@jwt_required()
+@idempotent
+def create_orders_batch():
+    """批量创建订单（同一事务内校验并插入，返回逐项结果）"""
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json() or {}
+        content_ids = data.get('content_ids')
+
+        if not isinstance(content_ids, list) or not content_ids:
+            return jsonify({'success': False, 'message': 'content_ids 必须是非空列表'}), 400
+        if len(content_ids) > MAX_BATCH_SIZE:
+            return jsonify({'success': False, 'message': f'单次最多购买 {MAX_BATCH_SIZE} 个内容'}), 400
+        try:
+            # 去重并保持请求顺序
+            requested = list(dict.fromkeys(int(content_id) for content_id in content_ids))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'content_ids 只能包含整数'}), 400
+
+        created = {}
+        with transaction() as conn:
+            # 一次查询校验全部内容，并加锁防止事务提交前内容被删除
+            cursor = conn.exec_driver_sql("""
+                SELECT id FROM contents WHERE id = ANY(%s) FOR KEY SHARE
+            """, (requested,))
+            existing = {row[0] for row in cursor.fetchall()}
+            valid_ids = [content_id for content_id in requested if content_id in existing]
+
+            if valid_ids:
+                cursor = conn.exec_driver_sql("""
+                    INSERT INTO orders (user_id, content_id, payment_status)
+                    SELECT %s, content_id, 'pending' FROM unnest(%s::int[]) AS content_id
+                    RETURNING id, content_id
+                """, (user_id, valid_ids))
+                created = {row[1]: row[0] for row in cursor.fetchall()}
+
+        results = []
+        for content_id in requested:
+            if content_id in created:
+                results.append({'content_id': content_id, 'success': True, 'order_id': created[content_id]})
+            else:
+                results.append({'content_id': content_id, 'success': False, 'message': '内容不存在'})
+
+        logger.info(f"批量创建订单: 用户{user_id} 成功{len(created)}/{len(requested)}")
+        status = 201 if created else 404
+        return jsonify({'success': bool(created), 'data': results}), status
+    except Exception as e:
+        logger.error(f"批量创建订单失败: {str(e)}")
+        return jsonify({'success': False, 'message': '批量创建订单失败'}), 500
+    
+
 @order_bp.route('/<int:order_id>/pay', methods=['POST'])
 @jwt_required()
+@idempotent
 def pay_order(order_id):
-    """支付订单"""
+    """支付订单
+
+    状态变更是一条条件 UPDATE（只有待支付订单会被改为已支付），并发的重复支付只有一个生效；
+    已支付订单再次支付直接返回成功，客户端重试无副作用。支付时按当前价格记录实付金额 amount
+    """
     try:
-        from datetime import datetime
-        
         user_id = get_jwt_identity()
-        conn = db.connect()
-        
-        cursor = conn.execute("""
-            SELECT * FROM orders WHERE id = %s AND user_id = %s
-        """, (order_id, user_id))
-        order = cursor.fetchone()
+        with transaction() as conn:
+            cursor = conn.exec_driver_sql("""
+                UPDATE orders SET payment_status = 'paid', payment_time = NOW(),
+                    amount = COALESCE((SELECT price FROM contents WHERE id = orders.content_id), 0)
+                WHERE id = %s AND user_id = %s AND payment_status = 'pending'
+                RETURNING content_id
+            """, (order_id, user_id))
+            paid = cursor.fetchone()
+            if not paid:
+                cursor = conn.exec_driver_sql("""
+                    SELECT payment_status FROM orders WHERE id = %s AND user_id = %s
+                """, (order_id, user_id))
+                order = cursor.fetchone()
+
+        if paid:
+            # 本进程立即丢弃缓存；其他 worker 通过计数器 version 发现变更
+            content_id = paid[0]
+            after_commit(lambda: entitlements.invalidate(user_id))
+            after_commit(lambda: rankings.record_paid(content_id))
+            return jsonify({'success': True, 'message': '订单支付成功'}), 200
         if not order:
             return jsonify({'success': False, 'message': '订单不存在'}), 404
-        
-        conn.execute("""
-            UPDATE orders SET status = %s, payment_time = %s WHERE id = %s
-        """, ('paid', datetime.utcnow(), order_id))
-        
-        conn.close()
-        
-        return jsonify({'success': True, 'message': '订单支付成功'}), 200
+        if order[0] == 'paid':
+            return jsonify({'success': True, 'message': '订单已支付'}), 200
+        return jsonify({'success': False, 'message': '订单当前状态无法支付'}), 400
     except Exception as e:
         logger.error(f"支付订单失败: {str(e)}")
         return jsonify({'success': False, 'message': '支付订单失败'}), 500
@@ -74,24 +149,16 @@ def get_order(order_id):
         user_id = get_jwt_identity()
         conn = db.connect()
         
-        cursor = conn.execute("""
-            SELECT * FROM orders WHERE id = %s AND user_id = %s
+        cursor = conn.exec_driver_sql(f"""
+            SELECT {select_list(ORDER_FIELDS)} FROM orders WHERE id = %s AND user_id = %s
         """, (order_id, user_id))
-        order = cursor.fetchone()
+        orders = rows_to_dicts(list(cursor.keys()), cursor.fetchall())
         conn.close()
         
-        if not order:
+        if not orders:
             return jsonify({'success': False, 'message': '订单不存在'}), 404
         
-        order_data = {
-            'id': order[0],
-            'user_id': order[1],
-            'content_id': order[2],
-            'status': order[3],
-            'payment_time': order[4].isoformat() if order[4] else None
-        }
-        
-        return jsonify({'success': True, 'data': order_data}), 200
+        return json_response({'success': True, 'data': orders[0]}, 200)
     except Exception as e:
         logger.error(f"获取订单详情失败: {str(e)}")
         return jsonify({'success': False, 'message': '获取订单详情失败'}), 500
@@ -100,28 +167,78 @@ def get_order(order_id):
 @order_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_orders():
-    """获取订单列表"""
+    """获取订单列表
+
+    按订单 id 倒序（即下单先后）游标分页：首屏不传 after，之后传上一页的 next_cursor；
+    status 按支付状态过滤。每个订单附带内容的标题、类型、价格和封面，
+    与订单在同一条查询中取出，前端无需再逐个请求内容详情
+    """
     try:
         user_id = get_jwt_identity()
-        conn = db.connect()
-        
-        cursor = conn.execute("""
-            SELECT * FROM orders WHERE user_id = %s ORDER BY created_at DESC
-        """, (user_id,))
-        orders = cursor.fetchall()
-        conn.close()
-        
-        orders_list = []
-        for order in orders:
-            orders_list.append({
-                'id': order[0],
-                'user_id': order[1],
-                'content_id': order[2],
-                'status': order[3],
-                'payment_time': order[4].isoformat() if order[4] else None
-            })
-        
-        return jsonify({'success': True, 'data': orders_list}), 200
+        limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+
+        status = request.args.get('status')
+        if status and status not in ORDER_STATUSES:
+            return jsonify({'success': False, 'message': '无效的订单状态'}), 400
+
+        after = None
+        token = request.args.get('after')
+        if token:
+            try:
+                after = decode_id_cursor(token)
+            except InvalidCursor:
+                return jsonify({'success': False, 'message': '无效的游标'}), 400
+
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'success': False, 'message': '数据库连接失败'}), 500
+
+        conditions = ["o.user_id = %s"]
+        params = [user_id]
+        if status:
+            conditions.append("o.payment_status = %s")
+            params.append(status)
+        if after is not None:
+            conditions.append("o.id < %s")
+            params.append(after)
+
+        # id 不会改变，翻页期间支付或退款的订单不会重复或跳过；
+        # 排序与索引 (user_id, id DESC) 一致，多取一行判断是否还有下一页；
+        # 内容按主键逐行关联，只关联本页的 limit 行
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT o.id, o.content_id, o.payment_status, o.payment_time, o.amount,
+                   c.title, c.type, c.price, c.image_url
+            FROM orders o
+            LEFT JOIN contents c ON c.id = o.content_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY o.id DESC
+            LIMIT %s
+        """, (*params, limit + 1))
+        rows = cursor.fetchall()
+        cursor.close()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        orders_list = [{
+            'id': order_id,
+            'content_id': content_id,
+            'payment_status': payment_status,
+            'payment_time': payment_time,
+            'amount': amount,
+            'content': {'title': title, 'type': content_type, 'price': price, 'image_url': image_url}
+            if title is not None else None
+        } for order_id, content_id, payment_status, payment_time, amount, title, content_type, price, image_url in rows]
+
+        last = rows[-1] if rows else None
+        return json_response({
+            'success': True,
+            'data': orders_list,
+            'has_more': has_more,
+            'next_cursor': encode_id_cursor(last[0]) if has_more else None
+        }, 200)
+    except ValueError:
+        return jsonify({'success': False, 'message': '无效的分页参数'}), 400
     except Exception as e:
         logger.error(f"获取订单列表失败: {str(e)}")
         return jsonify({'success': False, 'message': '获取订单列表失败'}), 500
@@ -129,29 +246,30 @@ def get_orders():
 
 @order_bp.route('/<int:order_id>/cancel', methods=['POST'])
 @jwt_required()
+@idempotent
 def cancel_order(order_id):
-    """取消订单"""
+    """取消订单（仅待支付订单可以取消）"""
     try:
         user_id = get_jwt_identity()
-        conn = db.connect()
-        
-        cursor = conn.execute("""
-            SELECT * FROM orders WHERE id = %s AND user_id = %s
-        """, (order_id, user_id))
-        order = cursor.fetchone()
+        with transaction() as conn:
+            cursor = conn.exec_driver_sql("""
+                UPDATE orders SET payment_status = 'cancelled'
+                WHERE id = %s AND user_id = %s AND payment_status = 'pending'
+                RETURNING id
+            """, (order_id, user_id))
+            if cursor.fetchone():
+                return jsonify({'success': True, 'message': '订单取消成功'}), 200
+
+            cursor = conn.exec_driver_sql("""
+                SELECT payment_status FROM orders WHERE id = %s AND user_id = %s
+            """, (order_id, user_id))
+            order = cursor.fetchone()
+
         if not order:
             return jsonify({'success': False, 'message': '订单不存在'}), 404
-        
-        if order[3] == 'paid':
+        if order[0] == 'paid':
             return jsonify({'success': False, 'message': '已支付订单无法取消'}), 400
-        
-        conn.execute("""
-            UPDATE orders SET status = %s WHERE id = %s
-        """, ('canceled', order_id))
-        
-        conn.close()
-        
-        return jsonify({'success': True, 'message': '订单取消成功'}), 200
+        return jsonify({'success': False, 'message': '订单当前状态无法取消'}), 400
     except Exception as e:
         logger.error(f"取消订单失败: {str(e)}")
         return jsonify({'success': False, 'message': '取消订单失败'}), 500
@@ -160,30 +278,38 @@ def cancel_order(order_id):
 @order_bp.route('/stats', methods=['GET'])
 @jwt_required()
 def order_stats():
-    """获取订单统计数据"""
+    """获取订单统计数据
+
+    读取 user_order_stats 计数器（订单创建、支付、取消、退款时由触发器增量维护），
+    不随订单数量增长；没有订单的用户没有计数器行，返回全 0
+    """
     try:
         user_id = get_jwt_identity()
-        conn = db.connect()
-        
-        cursor = conn.execute("""
-            SELECT COUNT(*) FROM orders WHERE user_id = %s
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'success': False, 'message': '数据库连接失败'}), 500
+
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT total_orders, pending_orders, paid_orders, cancelled_orders, refunded_orders, total_spent
+            FROM user_order_stats WHERE user_id = %s
         """, (user_id,))
-        total_orders = cursor.fetchone()[0]
-        
-        cursor = conn.execute("""
-            SELECT COUNT(*) FROM orders WHERE user_id = %s AND status = %s
-        """, (user_id, 'paid'))
-        paid_orders = cursor.fetchone()[0]
-        
-        conn.close()
-        
+        row = cursor.fetchone() or (0, 0, 0, 0, 0, 0)
+        cursor.close()
+
+        total_orders, pending_orders, paid_orders, cancelled_orders, refunded_orders, total_spent = row
         stats = {
             'total_orders': total_orders,
-            'paid_orders': paid_orders
+            'paid_orders': paid_orders,
+            'by_status': {
+                'pending': pending_orders,
+                'paid': paid_orders,
+                'cancelled': cancelled_orders,
+                'refunded': refunded_orders
+            },
+            'total_spent': float(total_spent)
         }
-        
         return jsonify({'success': True, 'data': stats}), 200
     except Exception as e:
         logger.error(f"获取订单统计数据失败: {str(e)}")
         return jsonify({'success': False, 'message': '获取订单统计数据失败'}), 500
-    
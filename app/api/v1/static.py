@@ -1,14 +1,166 @@
 # app/api/v1/static.py
-from flask import Blueprint, send_from_directory, current_app
+from flask import Blueprint, send_from_directory, current_app, request, jsonify, Response
+from werkzeug.exceptions import NotFound
+from werkzeug.http import parse_date, http_date
+from werkzeug.security import safe_join
+from app.utils.assets import fingerprinted_paths
+from app.utils.media import (
+    media_files, parse_ranges, multipart_parts, FileRangeStream, RangeNotSatisfiable
+)
 import os
+import mimetypes
+import logging
+
+logger = logging.getLogger(__name__)
 
 static_bp = Blueprint('static', __name__, url_prefix='/static')
 
+# 指纹化文件内容不会变化，可以让浏览器和 CDN 永久缓存
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = os.getenv('STATIC_CACHE_CONTROL', 'public, max-age=300')
+# 按优先级排列的预压缩编码及对应后缀
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+MEDIA_CACHE_CONTROL = os.getenv('MEDIA_CACHE_CONTROL', 'public, max-age=86400')
+
+
+def _negotiate_encoding(available):
+    for encoding, suffix in PRECOMPRESSED:
+        if encoding in available and request.accept_encodings[encoding]:
+            return encoding, suffix
+    return None, ''
+
+
 @static_bp.route('/<path:filename>', methods=['GET'])
 def serve_static_file(filename):
-    """提供静态文件"""
+    """提供静态文件
+
+    构建产物（static/dist 下的指纹化文件）按 Accept-Encoding 直接返回预压缩版本，
+    并设置 immutable 长期缓存；其他文件使用较短的缓存时间
+    """
     try:
-        return send_from_directory(current_app.static_folder, filename)
+        fingerprinted = fingerprinted_paths(current_app.static_folder)
+        if filename not in fingerprinted:
+            response = send_from_directory(current_app.static_folder, filename)
+            response.headers['Cache-Control'] = DEFAULT_CACHE_CONTROL
+            return response
+
+        encoding, suffix = _negotiate_encoding(fingerprinted[filename])
+        response = send_from_directory(
+            current_app.static_folder,
+            filename + suffix,
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            max_age=31536000
+        )
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+        return response
+    except NotFound:
+        raise
     except Exception as e:
         logger.error(f"提供静态文件失败: {str(e)}")
-        return jsonify({'success': False, 'message': '提供静态文件失败'}), 500
\ No newline at end of file
+        return jsonify({'success': False, 'message': '提供静态文件失败'}), 500
+
+
+def _if_range_matches(handle):
+    """If-Range 只接受强 ETag 或与 Last-Modified 完全相同的日期，不匹配时返回完整文件"""
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith('"'):
+        return value == f'"{handle.etag}"'
+    if value.startswith('W/'):
+        return False
+    date = parse_date(value)
+    return date is not None and int(date.timestamp()) == int(handle.mtime)
+
+
+def _media_response(handle, content_type):
+    """按 Range 构造 200 / 206 / 416 响应
+
+    描述符交给 FileRangeStream 后由响应体在发送完毕时释放；其余情况（包括中途抛出异常）在返回前释放
+    """
+    handed_off = False
+    try:
+        headers = {
+            'Accept-Ranges': 'bytes',
+            'ETag': f'"{handle.etag}"',
+            'Last-Modified': http_date(handle.mtime),
+            'Cache-Control': MEDIA_CACHE_CONTROL
+        }
+        size = handle.size
+
+        if request.if_none_match and request.if_none_match.contains_weak(handle.etag):
+            return Response(status=304, headers=headers)
+
+        try:
+            ranges = parse_ranges(request.headers.get('Range'), size) if _if_range_matches(handle) else None
+        except RangeNotSatisfiable:
+            headers['Content-Range'] = f'bytes */{size}'
+            return Response(status=416, headers=headers)
+
+        if not ranges or len(ranges) == 1:
+            start, stop = ranges[0] if ranges else (0, size)
+            status = 206 if ranges else 200
+            if status == 206:
+                headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+            headers['Content-Length'] = str(stop - start)
+
+            if request.method == 'HEAD':
+                return Response(status=status, headers=headers, mimetype=content_type)
+
+            file_wrapper = request.environ.get('wsgi.file_wrapper')
+            if file_wrapper and stop == size:
+                # 读到文件末尾的区间（浏览器拖动进度条发出的 bytes=N-）交给服务器零拷贝发送；
+                # 服务器使用自己打开的文件对象，缓存的描述符在返回前释放
+                f = open(handle.path, 'rb')
+                try:
+                    f.seek(start)
+                    return Response(file_wrapper(f, 65536), status=status, headers=headers,
+                                    mimetype=content_type, direct_passthrough=True)
+                except Exception:
+                    f.close()
+                    raise
+            response = Response(
+                FileRangeStream(media_files, handle, [(b'', start, stop)]),
+                status=status, headers=headers, mimetype=content_type, direct_passthrough=True
+            )
+            handed_off = True
+            return response
+
+        boundary, parts, trailer, length = multipart_parts(ranges, size, content_type)
+        headers['Content-Length'] = str(length)
+        mimetype = f'multipart/byteranges; boundary={boundary}'
+        if request.method == 'HEAD':
+            return Response(status=206, headers=headers, content_type=mimetype)
+        response = Response(
+            FileRangeStream(media_files, handle, parts, trailer),
+            status=206, headers=headers, content_type=mimetype, direct_passthrough=True
+        )
+        handed_off = True
+        return response
+    finally:
+        if not handed_off:
+            media_files.release(handle)
+
+
+@static_bp.route('/media/<path:filename>', methods=['GET', 'HEAD'])
+def serve_media_file(filename):
+    """提供音频 / 视频等媒体文件，支持 Range 分段请求"""
+    media_root = current_app.config.get('MEDIA_FOLDER') or os.path.join(current_app.static_folder, 'media')
+    path = safe_join(media_root, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+
+    try:
+        handle = media_files.acquire(path)
+    except OSError:
+        raise NotFound()
+
+    try:
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        return _media_response(handle, content_type)
+    except Exception as e:
+        logger.error(f"提供媒体文件失败: {str(e)}")
+        return jsonify({'success': False, 'message': '提供媒体文件失败'}), 500
@@ -1,27 +1,26 @@
 # app/api/v1/user.py
 
+import logging
 from flask import Blueprint, request, jsonify
-from flask_login import login_required
+from flask_jwt_extended import create_access_token, get_jwt, get_current_user
 from app.extentions.jwt import jwt_required, get_jwt_identity
-from models import user
-from app.extentions.db_postgres import db
+from app.extentions.db_postgres import db, get_db_connection
+from app.sevices.identity import identity_cache, get_user_record
+from app.sevices.revocation import revocation_store
+from app.sevices.password import password_hasher, HashingBusy, PasswordTooLong
+
+logger = logging.getLogger(__name__)
 
 user_bp = Blueprint('user', __name__, url_prefix='/api/v1/user')
 
 def serialize_user(user):
-    return {
-        'id': user.id,
-        'username': user.username,
-        'membership_level': user.membership_level,
-        'created_at': user.created_at.isoformat()
-    }
+    return user.to_dict()
 
 @user_bp.route('/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
     """获取当前用户的资料"""
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = get_current_user()
     if not user:
         return jsonify({'message': '用户未找到'}), 404
     return jsonify(serialize_user(user)), 200
@@ -31,34 +30,66 @@ def get_profile():
 def update_profile():
     """更新当前用户的资料"""
     current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-    if not user:
-        return jsonify({'message': '用户未找到'}), 404
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'message': '数据库连接失败'}), 500
 
-    data = request.get_json()
-    if data.get('username'):
-        user.username = data['username']
-    if data.get('membership_level'):
-        user.membership_level = data['membership_level']
+    data = request.get_json() or {}
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE users
+            SET username = COALESCE(%s, username),
+                membership_level = COALESCE(%s, membership_level)
+            WHERE id = %s
+        """, (data.get('username') or None, data.get('membership_level') or None, current_user_id))
+        if cursor.rowcount == 0:
+            conn.rollback()
+            return jsonify({'message': '用户未找到'}), 404
+        conn.commit()
+    except Exception as e:
+        logger.error(f"更新用户资料失败: {str(e)}")
+        conn.rollback()
+        return jsonify({'message': '更新用户资料失败'}), 500
+    finally:
+        identity_cache.invalidate(current_user_id)
 
-    db.session.commit()
     return jsonify({'message': '用户资料已更新'}), 200
 
 @user_bp.route('/<int:user_id>', methods=['GET'])
 @jwt_required()
 def get_user(user_id):
-    user = User.query.get(user_id)
+    user = get_user_record(user_id)
     if not user:
         return jsonify({'message': '用户未找到'}), 404
     return jsonify(serialize_user(user)), 200
 
 
+def _too_many_requests():
+    response = jsonify({'success': False, 'message': '请求过于频繁，请稍后重试'})
+    response.headers['Retry-After'] = '1'
+    return response, 429
+
+def _rehash_password(conn, user_id, password):
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE users SET password_hash = %s WHERE id = %s",
+            (password_hasher.hash(password), user_id)
+        )
+        conn.commit()
+    except (HashingBusy, PasswordTooLong):
+        # 队列繁忙时跳过，下次登录再升级；超长密码的旧哈希无法换成 bcrypt，保留原哈希
+        pass
+    except Exception as e:
+        logger.warning(f"密码哈希升级失败: {str(e)}")
+        conn.rollback()
+
 @user_bp.route('/user/register', methods=['GET'])
 def register():
     """用户注册"""
+    conn = None
     try:
-        from werkzeug.security import generate_password_hash
-        
         conn = get_db_connection()
         if not conn:
             return jsonify({'success': False, 'message': '数据库连接失败'}), 500
@@ -75,7 +106,7 @@ def register():
         if cursor.fetchone():
             return jsonify({'success': False, 'message': '用户名已存在'}), 400
         
-        password_hash = generate_password_hash(password)
+        password_hash = password_hasher.hash(password)
         cursor.execute("""
             INSERT INTO users (username, password_hash, membership_level)
             VALUES (%s, %s, %s)
@@ -84,6 +115,10 @@ def register():
         conn.commit()
         logger.info(f"用户注册成功: {username}")
         return jsonify({'success': True, 'message': '注册成功'})
+    except PasswordTooLong as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except HashingBusy:
+        return _too_many_requests()
     except Exception as e:
         logger.error(f"用户注册失败: {str(e)}")
         if conn:
@@ -94,8 +129,6 @@ def register():
 def login():
     """用户登录"""
     try:
-        from werkzeug.security import check_password_hash
-        
         conn = get_db_connection()
         if not conn:
             return jsonify({'success': False, 'message': '数据库连接失败'}), 500
@@ -108,9 +141,15 @@ def login():
         cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
         user = cursor.fetchone()
         
-        if not user or not check_password_hash(user[2], password):
+        if not user or not password_hasher.verify(password, user[2]):
             return jsonify({'success': False, 'message': '用户名或密码错误'}), 401
         
+        # 哈希算法或成本已调整时，借本次登录透明升级
+        if password_hasher.needs_rehash(user[2]):
+            _rehash_password(conn, user[0], password)
+        
+        # 令牌只携带用户 ID：会员等级等可变资料从身份缓存读取，变更后最多 IDENTITY_CACHE_TTL 秒生效，
+        # 不会在 7 天有效期内一直沿用签发时的值
         access_token = create_access_token(identity=user[0])
         logger.info(f"用户登录成功: {username}")
         
@@ -124,6 +163,8 @@ def login():
                 'created_at': user[4].isoformat() if user[4] else None
             }
         })
+    except HashingBusy:
+        return _too_many_requests()
     except Exception as e:
         logger.error(f"用户登录失败: {str(e)}")
         return jsonify({'success': False, 'message': '登录失败'}), 500
@@ -133,8 +174,10 @@ def login():
 def logout():
     """用户登出"""
     try:
-        jti = get_jwt()['jti']
-        blacklist.add(jti)
+        claims = get_jwt()
+        jti = claims['jti']
+        # 记录保留到令牌自然过期为止
+        revocation_store.revoke(jti, claims['exp'])
         logger.info(f"用户已登出, jti: {jti}")
         return jsonify({'success': True, 'message': '登出成功'})
     except Exception as e:
@@ -146,27 +189,11 @@ def logout():
 def get_user_info():
     """获取用户信息"""
     try:
-        user_id = get_jwt_identity()
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': '数据库连接失败'}), 500
-        
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-        user = cursor.fetchone()
-        
+        user = get_current_user()
         if not user:
             return jsonify({'success': False, 'message': '用户不存在'}), 404
         
-        return jsonify({
-            'success': True,
-            'data': {
-                'id': user[0],
-                'username': user[1],
-                'membership_level': user[3],
-                'created_at': user[4].isoformat() if user[4] else None
-            }
-        })
+        return jsonify({'success': True, 'data': user.to_dict()})
     except Exception as e:
         logger.error(f"获取用户信息失败: {str(e)}")
         return jsonify({'success': False, 'message': '获取用户信息失败'}), 500
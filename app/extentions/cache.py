@@ -0,0 +1,282 @@
+# app.extentions.cache.py
+"""
+内容缓存：进程内 LRU+TTL 后端，可选共享缓存后端（Redis 协议，本地替身即可）
+
+进程内后端每个 worker 各有一份：失效时除了清理本进程，还会递增 CACHE_EPOCH_FILE
+（mmap 共享的 8 字节计数器），同一主机上的其他 worker 在下一次读写缓存时发现计数变化，
+清空本进程的内容缓存。多台主机部署时计数器无法共享，必须使用 CACHE_BACKEND=redis
+"""
+import os
+import mmap
+import time
+import uuid
+import fcntl
+import struct
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+from app.utils.serializers import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://127.0.0.1:6379/0')
+CACHE_MAX_SIZE = int(os.getenv('CACHE_MAX_SIZE', 2048))
+CACHE_DEFAULT_TTL = int(os.getenv('CACHE_DEFAULT_TTL', 300))
+CACHE_EPOCH_FILE = os.getenv('CACHE_EPOCH_FILE', os.path.join(tempfile.gettempdir(), 'honghuang_content_cache.epoch'))
+
+_EPOCH = struct.Struct('<Q')
+
+
+class LRUCache:
+    """进程内 LRU 缓存，每个条目带过期时间"""
+
+    def __init__(self, max_size=CACHE_MAX_SIZE, default_ttl=CACHE_DEFAULT_TTL):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def size(self):
+        return len(self._data)
+
+
+class SharedEpoch:
+    """mmap 共享文件中的计数器，同一主机上的进程借此广播缓存失效"""
+
+    def __init__(self, path=CACHE_EPOCH_FILE):
+        self.path = path
+        self._map = None
+        self._lock = threading.Lock()
+
+    def _mmap(self):
+        # MAP_SHARED 映射在 fork 后仍指向同一文件，子进程可以直接沿用
+        if self._map is None:
+            with self._lock:
+                if self._map is None:
+                    fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                    try:
+                        if os.fstat(fd).st_size < _EPOCH.size:
+                            os.ftruncate(fd, _EPOCH.size)
+                        self._map = mmap.mmap(fd, _EPOCH.size)
+                    finally:
+                        os.close(fd)
+        return self._map
+
+    def value(self):
+        return _EPOCH.unpack_from(self._mmap(), 0)[0]
+
+    def bump(self):
+        shared = self._mmap()
+        # 多个进程同时递增时用文件锁串行化，读方不加锁
+        with open(self.path, 'rb') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            _EPOCH.pack_into(shared, 0, _EPOCH.unpack_from(shared, 0)[0] + 1)
+
+
+class RedisCache:
+    """共享缓存后端，多个 worker 进程共用；值以 JSON 存储（datetime 存为 ISO 字符串）"""
+
+    def __init__(self, url=CACHE_REDIS_URL, default_ttl=CACHE_DEFAULT_TTL):
+        import redis
+
+        self.default_ttl = default_ttl
+        self.evictions = 0
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self._client.get(key)
+        return loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        self._client.set(key, dumps(value), ex=ttl or None)
+
+    def get_many(self, keys):
+        return [loads(raw) if raw is not None else None for raw in self._client.mget(keys)]
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*keys)
+
+    def size(self):
+        return self._client.dbsize()
+
+
+class ContentCache:
+    """内容列表 / 详情的读穿缓存
+
+    列表键包含按类型划分的代数（generation），内容变更时只需更换代数，
+    旧的列表条目自然失效，无需逐个扫描删除
+    """
+
+    ALL_TYPES = '*'
+
+    def __init__(self, backend, epoch=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        # 进程内后端使用共享计数器发现其他 worker 的失效
+        self._epoch = epoch
+        self._seen_epoch = None
+
+    def _sync(self):
+        if self._epoch is None:
+            return
+        try:
+            current = self._epoch.value()
+        except Exception as e:
+            logger.warning(f"读取缓存失效计数失败: {str(e)}")
+            return
+        if current != self._seen_epoch:
+            # 不知道其他 worker 失效了哪些条目，整体清空；内容变更只来自后台操作，频率很低
+            self._seen_epoch = current
+            self.backend.clear()
+
+    def _generation(self, content_type):
+        key = f'content:gen:{content_type or self.ALL_TYPES}'
+        generation = self.backend.get(key)
+        if generation is None:
+            # 代数丢失（被淘汰或首次访问）时生成新值，保证不会命中旧条目
+            generation = uuid.uuid4().hex[:8]
+            self.backend.set(key, generation, ttl=0)
+        return generation
+
+    def list_key(self, content_type, position, limit, *extra):
+        parts = [self._generation(content_type), content_type or self.ALL_TYPES, position, limit, *extra]
+        return 'content:list:' + ':'.join(str(part) for part in parts)
+
+    @staticmethod
+    def detail_key(content_id):
+        return f'content:detail:{content_id}'
+
+    def get_or_load(self, key, loader, ttl=None):
+        """命中则直接返回，否则调用 loader 加载；loader 返回 None 时不缓存"""
+        self._sync()
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"读取缓存失败: {str(e)}")
+            value = None
+
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if value is not None:
+            return value
+
+        value = loader()
+        if value is not None:
+            try:
+                self.backend.set(key, value, ttl)
+            except Exception as e:
+                logger.warning(f"写入缓存失败: {str(e)}")
+        return value
+
+    def get_many(self, keys):
+        """批量读取，返回 {key: value}，未命中的键不出现在结果中"""
+        self._sync()
+        try:
+            values = self.backend.get_many(keys)
+        except Exception as e:
+            logger.warning(f"读取缓存失败: {str(e)}")
+            values = [None] * len(keys)
+
+        found = {key: value for key, value in zip(keys, values) if value is not None}
+        with self._stats_lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key, value, ttl=None):
+        self._sync()
+        try:
+            self.backend.set(key, value, ttl)
+        except Exception as e:
+            logger.warning(f"写入缓存失败: {str(e)}")
+
+    def invalidate_content(self, content_id=None, content_types=()):
+        """内容新增 / 修改 / 删除后失效详情及相关类型的列表"""
+        try:
+            if content_id is not None:
+                self.backend.delete(self.detail_key(content_id))
+            for content_type in {*content_types, self.ALL_TYPES}:
+                if content_type:
+                    self.backend.set(f'content:gen:{content_type}', uuid.uuid4().hex[:8], ttl=0)
+            if self._epoch is not None:
+                self._epoch.bump()
+        except Exception as e:
+            logger.error(f"缓存失效失败: {str(e)}")
+
+    def stats(self):
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else 0.0,
+            'evictions': self.backend.evictions,
+            'size': self.backend.size()
+        }
+
+
+def create_cache_backend(name=CACHE_BACKEND):
+    """按配置创建缓存后端，共享后端不可用时退回进程内缓存"""
+    if name == 'redis':
+        try:
+            backend = RedisCache()
+            backend.size()
+            logger.info(f"已连接共享缓存: {CACHE_REDIS_URL}")
+            return backend
+        except Exception as e:
+            logger.warning(f"共享缓存不可用，使用进程内缓存: {str(e)}")
+    return LRUCache()
+
+
+def create_content_cache(name=CACHE_BACKEND):
+    backend = create_cache_backend(name)
+    return ContentCache(backend, SharedEpoch() if isinstance(backend, LRUCache) else None)
+
+
+content_cache = create_content_cache()
@@ -2,10 +2,11 @@
 import os
 import logging
 logger = logging.getLogger(__name__)
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import threading
+from flask import g, has_app_context
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as SQLAlchemyTimeoutError
+from app.extentions.sql_trace import SQL_TRACE_ENABLED, instrument_connection, restore_connection
 
 # 数据库连接配置（从环境变量获取）
 DB_CONFIG = {
@@ -16,140 +17,125 @@ DB_CONFIG = {
     'port': os.getenv('DB_PORT', '31853')
 }
 
-# 全局数据库连接对象
-db_connection = None
+# 连接池配置：SQLAlchemy 引擎与 psycopg2 原生游标共用同一个连接池
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 2))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
 
 db = create_engine(
-    f"postgresql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['dbname']}"
+    f"postgresql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['dbname']}",
+    pool_size=DB_POOL_MIN,
+    max_overflow=max(DB_POOL_MAX - DB_POOL_MIN, 0),
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    # 借出连接前先做一次存活检查，自动替换已断开的连接
+    pool_pre_ping=True
 )
 
+# 连接池运行指标
+_pool_stats_lock = threading.Lock()
+_pool_stats = {
+    'checkouts': 0,
+    'checkins': 0,
+    'timeouts': 0,
+    'errors': 0,
+    'peak_checked_out': 0
+}
+
+
+@event.listens_for(db, 'checkout')
+def _on_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    with _pool_stats_lock:
+        _pool_stats['checkouts'] += 1
+        _pool_stats['peak_checked_out'] = max(_pool_stats['peak_checked_out'], db.pool.checkedout())
+
+
+@event.listens_for(db, 'checkin')
+def _on_pool_checkin(dbapi_connection, connection_record):
+    with _pool_stats_lock:
+        _pool_stats['checkins'] += 1
+
+
+def get_pool_stats():
+    """获取连接池状态，用于监控连接池是否饱和"""
+    checked_out = db.pool.checkedout()
+    with _pool_stats_lock:
+        stats = dict(_pool_stats)
+    stats.update({
+        'min_size': DB_POOL_MIN,
+        'max_size': DB_POOL_MAX,
+        'idle': db.pool.checkedin(),
+        'checked_out': checked_out,
+        'overflow': max(db.pool.overflow(), 0),
+        'saturation': round(checked_out / DB_POOL_MAX, 4) if DB_POOL_MAX else 0.0
+    })
+    return stats
+
+
+def fill_pool(size=DB_POOL_MIN):
+    """预先建立 size 个连接放回连接池（worker 开始接收请求前调用），返回建立的连接数"""
+    connections = []
+    try:
+        for _ in range(size):
+            conn = db.raw_connection()
+            connections.append(conn)
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+    finally:
+        for conn in connections:
+            conn.close()
+    return len(connections)
+
+
 def get_db_connection():
-    """获取数据库连接"""
-    global db_connection
+    """获取数据库连接
+
+    在请求上下文中，每个请求从连接池借出一个连接并缓存在 g 上，
+    请求结束时由 close_db_connection 归还；请求上下文之外（如脚本）
+    返回的连接需由调用方自行 close() 归还连接池。
+    """
     try:
-        import psycopg2
-        from psycopg2 import pool
-        
-        if db_connection is None or db_connection.closed:
-            db_connection = psycopg2.connect(**DB_CONFIG)
-            logger.info(f"成功连接到 PostgreSQL 数据库: {DB_CONFIG['dbname']}")
-        
-        return db_connection
+        if has_app_context() and '_db_conn' in g:
+            return g._db_conn
+
+        conn = db.raw_connection()
+
+        if has_app_context():
+            if SQL_TRACE_ENABLED:
+                g._db_cursor_factory = instrument_connection(conn)
+            g._db_conn = conn
+        return conn
+    except SQLAlchemyTimeoutError:
+        with _pool_stats_lock:
+            _pool_stats['timeouts'] += 1
+        logger.error(f"数据库连接池已满，等待超过 {DB_POOL_TIMEOUT} 秒")
+        return None
     except Exception as e:
+        with _pool_stats_lock:
+            _pool_stats['errors'] += 1
         logger.error(f"数据库连接失败: {str(e)}")
         return None
 
-def init_database():
-    """初始化数据库表结构"""
-    try:
-        conn = get_db_connection()
-        if not conn:
-            logger.warning("数据库连接失败，跳过初始化")
-            return False
-        
-        cursor = conn.cursor()
-        
-        # 创建用户表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(80) UNIQUE NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                membership_level VARCHAR(20) DEFAULT 'free',
-                created_at TIMESTAMPTZ DEFAULT NOW()
-            )
-        """)
-        
-        # 创建内容表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS contents (
-                id SERIAL PRIMARY KEY,
-                type VARCHAR(20) NOT NULL,
-                title VARCHAR(200) NOT NULL,
-                description TEXT,
-                price FLOAT DEFAULT 0.0,
-                image_url VARCHAR(500),
-                created_at TIMESTAMPTZ DEFAULT NOW()
-            )
-        """)
-        
-        # 创建订单表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS orders (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER NOT NULL REFERENCES users(id),
-                content_id INTEGER NOT NULL REFERENCES contents(id),
-                payment_status VARCHAR(20) DEFAULT 'pending',
-                payment_time TIMESTAMPTZ DEFAULT NOW()
-            )
-        """)
-        
-        # 创建索引
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_contents_type ON contents(type)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders(user_id)")
-        
-        conn.commit()
-        logger.info("数据库表结构初始化成功")
-        
-        # 检查是否需要插入示例数据
-        cursor.execute("SELECT COUNT(*) FROM contents")
-        content_count = cursor.fetchone()[0]
-        
-        if content_count == 0:
-            logger.info("数据库为空，插入示例数据...")
-            insert_sample_data(conn, cursor)
-        
-        return True
-    except Exception as e:
-        logger.error(f"数据库初始化失败: {str(e)}")
-        return False
 
-def insert_sample_data(conn, cursor):
-    """插入示例数据"""
+def close_db_connection(exception=None):
+    """将当前请求借出的连接归还连接池（未提交的事务会被回滚）"""
+    conn = g.pop('_db_conn', None)
+    if conn is None:
+        return
     try:
-        from werkzeug.security import generate_password_hash
-        
-        # 插入示例用户
-        cursor.execute("""
-            INSERT INTO users (username, password_hash, membership_level)
-            VALUES (%s, %s, %s)
-            ON CONFLICT (username) DO NOTHING
-        """, ('admin', generate_password_hash('admin123'), 'vip'))
-        
-        cursor.execute("""
-            INSERT INTO users (username, password_hash, membership_level)
-            VALUES (%s, %s, %s)
-            ON CONFLICT (username) DO NOTHING
-        """, ('test_user', generate_password_hash('test123'), 'free'))
-        
-        # 插入示例内容
-        sample_contents = [
-            ('novel', '洪荒纪元：开天辟地', '讲述盘古开天辟地的传说故事', 29.9, 
-             'https://hpi-hub.tos-cn-beijing.volces.com/static/mobilewallpapers/cHJpdmF0ZS9sci91748499192317-7763YzJfMS5qcGc.jpg'),
-            ('music', '洪荒之音：神话旋律', '古风音乐专辑，演绎洪荒时代的壮阔', 19.9,
-             'https://hpi-hub.tos-cn-beijing.volces.com/static/batch_24/1757660354173-6723.jpg'),
-            ('anime', '洪荒传说：神魔录', '动漫番剧，重现上古神魔之战', 39.9,
-             'https://hpi-hub.tos-cn-beijing.volces.com/static/batch_20/1757610826493-2572.jpg'),
-            ('wallpaper', '洪荒壁纸集：神韵典藏', '高清壁纸合集，展现洪荒美学', 9.9,
-             'https://hpi-hub.tos-cn-beijing.volces.com/static/people/ai-generated-7957396_1280.png')
-        ]
-        
-        for content in sample_contents:
-            cursor.execute("""
-                INSERT INTO contents (type, title, description, price, image_url)
-                VALUES (%s, %s, %s, %s, %s)
-            """, content)
-        
-        conn.commit()
-        logger.info("示例数据插入成功")
+        if '_db_cursor_factory' in g:
+            restore_connection(conn, g.pop('_db_cursor_factory'))
+        conn.close()
     except Exception as e:
-        logger.error(f"插入示例数据失败: {str(e)}")
-        conn.rollback()
+        logger.error(f"归还数据库连接失败: {str(e)}")
+
 
-# 初始化数据库
-try:
-    init_database()
-except Exception as e:
-    logger.error(f"数据库初始化异常: {str(e)}")
+def init_app(app):
+    """注册请求结束时的连接归还钩子
 
+    Flask-SQLAlchemy 初始化时要求配置 URI；实际引擎由 app.models.SharedEngineSQLAlchemy 直接复用本模块的 db
+    """
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', db.url.render_as_string(hide_password=False))
+    app.teardown_appcontext(close_db_connection)
@@ -7,12 +7,20 @@ jwt = JWTManager()
 # 配置 JWT 回调函数（如有需要）
 @jwt.user_identity_loader
 def user_identity_lookup(user):
-    return user.identity
+    # 既支持直接传入用户 ID，也支持传入带 id 属性的用户对象
+    return getattr(user, 'id', user)
 
 @jwt.user_lookup_loader
 def user_lookup_callback(_jwt_header, jwt_data):
-    from models import User
+    # 走进程内身份缓存，返回精简的 UserRecord
+    from app.sevices.identity import get_user_record
     identity = jwt_data["sub"]
-    return User.query.filter_by(id=identity).one_or_none()
+    return get_user_record(identity)
+
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(_jwt_header, jwt_payload):
+    # 先查共享布隆过滤器，只有可能命中时才查询吊销表
+    from app.sevices.revocation import revocation_store
+    return revocation_store.is_revoked(jwt_payload["jti"])
 
 # 你可以根据需要添加更多的 JWT 配置和回调函数
\ No newline at end of file
@@ -0,0 +1,340 @@
+# app.extentions.metrics.py
+"""
+Prometheus 文本格式的指标：/metrics
+
+- 每个路由（endpoint + method + status）一组延迟直方图；直方图按线程各自累加，
+  记录时不加锁，只在导出时合并
+- 每个 worker 进程定期把本进程的快照写入 METRICS_DIR/<pid>.json（先写临时文件再原子替换），
+  /metrics 合并目录下所有进程的快照，因此任意一个 worker 收到抓取请求都能返回全局数据
+- worker 退出时（gunicorn child_exit，或抓取时发现进程已不存在）把它的直方图并入
+  METRICS_DIR/_retired.json 并删除其快照文件：计数不会因 worker 重启而回退，目录也不会随轮换增长；
+  新进程首次写快照时若同名文件已存在（PID 被复用），先把旧文件并入再覆盖
+- 并入与读取通过 METRICS_DIR/.lock 上的文件锁互斥，抓取不会看到同一份计数两次
+- 进行中请求数和连接池 / 缓存 / 哈希进程池等状态只统计仍存活的进程
+
+单次请求的额外开销（WSGI 中间件 + 一个 after_request 钩子）约 7 µs，直方图记录本身约 0.6 µs，
+见 benchmarks/bench_metrics.py
+"""
+import os
+import json
+import time
+import fcntl
+import bisect
+import tempfile
+import threading
+import logging
+from flask import request, Response
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'honghuang-metrics'))
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+# 延迟桶上界（秒）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 每条序列：len(BUCKETS) 个桶 + 溢出桶 + 耗时总和
+_SERIES_LENGTH = len(BUCKETS) + 2
+# 已退出进程的直方图累计
+RETIRED_FILE = '_retired.json'
+LOCK_FILE = '.lock'
+
+
+class _ThreadStore:
+    """单个线程的累加器，只由所属线程写入"""
+
+    __slots__ = ('thread', 'series', 'in_flight')
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.series = {}
+        self.in_flight = 0
+
+
+class MetricsRegistry:
+    """进程内的请求指标与状态采集函数"""
+
+    def __init__(self, directory=METRICS_DIR):
+        self.directory = directory
+        self._local = threading.local()
+        self._stores = []
+        self._retired = {}
+        self._lock = threading.Lock()
+        self._collectors = []
+        self._flusher_pid = None
+        self._written_pid = None
+
+    def _store(self):
+        store = getattr(self._local, 'store', None)
+        if store is None:
+            store = self._local.store = _ThreadStore(threading.current_thread())
+            with self._lock:
+                self._stores.append(store)
+        return store
+
+    def observe(self, route, method, status, seconds):
+        series = self._store().series
+        key = (route, method, status)
+        values = series.get(key)
+        if values is None:
+            values = series[key] = [0] * _SERIES_LENGTH
+        values[bisect.bisect_left(BUCKETS, seconds)] += 1
+        values[-1] += seconds
+
+    def register_collector(self, prefix, collect, help_text):
+        """注册状态采集函数：collect() 返回 {名称: 数值}，导出为 <prefix>_<名称> 仪表"""
+        self._collectors.append((prefix, collect, help_text))
+
+    # ==================== 快照 ====================
+
+    def _merge_series(self):
+        with self._lock:
+            # 已退出线程的数据并入 _retired，避免线程频繁创建时累加器无限增长
+            alive = []
+            for store in self._stores:
+                if store.thread.is_alive():
+                    alive.append(store)
+                else:
+                    _add_series(self._retired, store.series)
+            self._stores = alive
+            merged = {key: list(values) for key, values in self._retired.items()}
+        for store in alive:
+            _add_series(merged, dict(store.series))
+        return merged, sum(store.in_flight for store in alive)
+
+    def snapshot(self):
+        series, in_flight = self._merge_series()
+        gauges = {'http_requests_in_flight': {'help': '正在处理的请求数', 'values': {'': in_flight}}}
+        for prefix, collect, help_text in self._collectors:
+            try:
+                for name, value in collect().items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        gauges[f'{prefix}_{name}'] = {'help': help_text, 'values': {'': value}}
+            except Exception as e:
+                logger.warning(f"采集指标 {prefix} 失败: {str(e)}")
+        return {
+            'pid': os.getpid(),
+            'written_at': time.time(),
+            'series': [[*key, values] for key, values in series.items()],
+            'gauges': gauges
+        }
+
+    def flush(self):
+        """把本进程快照写入共享目录"""
+        os.makedirs(self.directory, exist_ok=True)
+        pid = os.getpid()
+        if self._written_pid != pid:
+            with self._lock:
+                if self._written_pid != pid:
+                    # 同名文件属于已退出的同 PID 进程，覆盖前先并入，否则它的计数会丢失
+                    self.retire(pid)
+                    self._written_pid = pid
+        path = os.path.join(self.directory, f'{pid}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def _locked(self, mode):
+        os.makedirs(self.directory, exist_ok=True)
+        lock = open(os.path.join(self.directory, LOCK_FILE), 'a')
+        fcntl.flock(lock, mode)
+        return lock
+
+    def retire(self, pid):
+        """把已退出进程的直方图并入 _retired.json 并删除其快照文件；返回是否有文件被并入"""
+        path = os.path.join(self.directory, f'{pid}.json')
+        if not os.path.exists(path):
+            return False
+        with self._locked(fcntl.LOCK_EX):
+            try:
+                snapshot = _read_snapshot(path)
+            except FileNotFoundError:
+                return False
+            except (OSError, ValueError):
+                snapshot = None
+            if snapshot is not None:
+                retired_path = os.path.join(self.directory, RETIRED_FILE)
+                try:
+                    retired = _read_series(_read_snapshot(retired_path))
+                except (OSError, ValueError):
+                    retired = {}
+                _add_series(retired, _read_series(snapshot))
+                tmp_path = f'{retired_path}.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'pid': None, 'series': [[*key, values] for key, values in retired.items()]},
+                              f, separators=(',', ':'))
+                os.replace(tmp_path, retired_path)
+            os.unlink(path)
+        return True
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"写入指标快照失败: {str(e)}")
+
+    def ensure_flusher(self):
+        """在当前进程中启动定时写快照线程（fork 后的子进程会各自启动）"""
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid != os.getpid():
+                threading.Thread(target=self._flush_loop, name='metrics-flusher', daemon=True).start()
+                self._flusher_pid = os.getpid()
+
+    def collect_all(self):
+        """合并共享目录下所有进程的快照及已退出进程的累计；本进程直接使用最新数据"""
+        self.flush()
+        # 未经 child_exit 并入的已退出进程（非 gunicorn 运行、主进程被强杀等）在这里补上
+        for name in os.listdir(self.directory):
+            if name.endswith('.json') and name[:-5].isdigit() and not _pid_alive(int(name[:-5])):
+                self.retire(int(name[:-5]))
+
+        series, gauges = {}, {}
+        with self._locked(fcntl.LOCK_SH):
+            snapshots = []
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    snapshots.append(_read_snapshot(os.path.join(self.directory, name)))
+                except (OSError, ValueError):
+                    continue
+        for snapshot in snapshots:
+            _add_series(series, _read_series(snapshot))
+            if snapshot['pid'] is None or not _pid_alive(snapshot['pid']):
+                continue
+            for metric, gauge in snapshot['gauges'].items():
+                merged = gauges.setdefault(metric, {'help': gauge['help'], 'values': {}})
+                merged['values'][str(snapshot['pid'])] = gauge['values']['']
+        return series, gauges
+
+    def reset(self):
+        """清空共享目录（主进程启动时调用，避免沿用上次运行的计数）"""
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                os.unlink(os.path.join(self.directory, name))
+
+
+def _read_snapshot(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _read_series(snapshot):
+    return {tuple(item[:3]): item[3] for item in snapshot['series']}
+
+
+def _add_series(target, source):
+    for key, values in source.items():
+        existing = target.get(key)
+        if existing is None:
+            target[key] = list(values)
+        else:
+            for i, value in enumerate(values):
+                existing[i] += value
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render(series, gauges):
+    """输出 Prometheus 文本格式（0.0.4）"""
+    lines = [
+        '# HELP http_request_duration_seconds 请求处理耗时',
+        '# TYPE http_request_duration_seconds histogram'
+    ]
+    for (route, method, status), values in sorted(series.items()):
+        labels = f'route="{_escape(route)}",method="{method}",status="{status}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS, values):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        total = cumulative + values[len(BUCKETS)]
+        lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {total}')
+        lines.append(f'http_request_duration_seconds_sum{{{labels}}} {values[-1]:.6f}')
+        lines.append(f'http_request_duration_seconds_count{{{labels}}} {total}')
+
+    for metric, gauge in sorted(gauges.items()):
+        lines.append(f'# HELP {metric} {gauge["help"]}')
+        lines.append(f'# TYPE {metric} gauge')
+        for pid, value in sorted(gauge['values'].items()):
+            lines.append(f'{metric}{{pid="{pid}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """WSGI 中间件：记录开始时间和进行中请求数，耗时由 after_request 钩子按 endpoint 记录
+
+    相比 before_request + teardown_request 两个 Flask 钩子，每个请求少两次钩子分发和 g 读写
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        registry.ensure_flusher()
+        store = registry._store()
+        store.in_flight += 1
+        environ['metrics.started'] = time.perf_counter()
+        try:
+            return self.wsgi_app(environ, start_response)
+        finally:
+            store.in_flight -= 1
+
+
+def _after_request(response):
+    started = request.environ.get('metrics.started')
+    if started is not None:
+        registry.observe(request.endpoint or 'unmatched', request.method, response.status_code,
+                         time.perf_counter() - started)
+    return response
+
+
+def metrics_view():
+    """Prometheus 抓取入口"""
+    series, gauges = registry.collect_all()
+    return Response(render(series, gauges), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _register_default_collectors():
+    from app.extentions.db_postgres import get_pool_stats
+    from app.extentions.cache import content_cache
+    from app.sevices.password import password_hasher
+    from app.sevices.entitlements import entitlements
+    from app.sevices.idempotency import idempotency_store
+    from app.sevices.ranking import rankings
+
+    registry.register_collector('db_pool', get_pool_stats, '数据库连接池状态')
+    registry.register_collector('content_cache', content_cache.stats, '内容缓存命中情况')
+    registry.register_collector('password_hasher', password_hasher.stats, '密码哈希进程池状态')
+    registry.register_collector('entitlements', entitlements.stats, '内容权益索引')
+    registry.register_collector('idempotency', idempotency_store.stats, '幂等键重放')
+    registry.register_collector('rankings', rankings.stats, '热门 / 畅销排行')
+
+
+def init_app(app):
+    """注册请求计时钩子和 /metrics；METRICS_ENABLED=false 时不挂任何钩子"""
+    if not METRICS_ENABLED:
+        return
+    _register_default_collectors()
+    app.wsgi_app = MetricsMiddleware(app.wsgi_app)
+    app.after_request(_after_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
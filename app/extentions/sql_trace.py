@@ -0,0 +1,192 @@
+# app.extentions.sql_trace.py
+"""
+按请求统计 SQL：查询次数、总耗时、最慢语句，写入 Server-Timing 响应头
+
+两条执行路径都会被记录：
+- SQLAlchemy 引擎（exec_driver_sql / ORM / Flask-Admin）通过 Engine 事件
+- get_db_connection() 借出的原生连接换成 InstrumentedCursor
+
+同一请求内同一语句形状重复执行达到阈值时告警（N+1），
+超过慢查询阈值的语句在后台线程 EXPLAIN 后写入日志
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import psycopg2.extensions
+
+logger = logging.getLogger(__name__)
+
+SQL_TRACE_ENABLED = os.getenv('SQL_TRACE_ENABLED', 'true').lower() == 'true'
+SQL_SLOW_QUERY_MS = float(os.getenv('SQL_SLOW_QUERY_MS', 200))
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv('SQL_N_PLUS_ONE_THRESHOLD', 5))
+SQL_EXPLAIN_SLOW_QUERIES = os.getenv('SQL_EXPLAIN_SLOW_QUERIES', 'true').lower() == 'true'
+# 同一语句形状在该时间内只 EXPLAIN 一次，避免慢查询高峰时刷屏
+SQL_EXPLAIN_INTERVAL = int(os.getenv('SQL_EXPLAIN_INTERVAL', 300))
+
+_EXPLAINABLE = ('select', 'with', 'insert', 'update', 'delete')
+
+_explain_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sql-explain')
+_explained_at = {}
+_explained_lock = threading.Lock()
+
+
+class RequestTrace:
+    """单个请求内执行过的语句"""
+
+    __slots__ = ('count', 'total', 'slowest', 'slowest_statement', 'shapes')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_statement = None
+        self.shapes = {}
+
+    def add(self, shape, elapsed):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.slowest:
+            self.slowest = elapsed
+            self.slowest_statement = shape
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def repeated(self, threshold=SQL_N_PLUS_ONE_THRESHOLD):
+        return {shape: count for shape, count in self.shapes.items() if count >= threshold}
+
+
+def _shape(statement):
+    """参数化语句本身就是形状，只需折叠空白"""
+    if isinstance(statement, bytes):
+        statement = statement.decode('utf-8', 'replace')
+    return ' '.join(str(statement).split())
+
+
+def record(statement, parameters, elapsed):
+    """记录一次语句执行，由两条执行路径的钩子调用"""
+    shape = _shape(statement)
+    if has_request_context():
+        trace = g.get('_sql_trace')
+        if trace is None:
+            trace = g._sql_trace = RequestTrace()
+        trace.add(shape, elapsed)
+
+    elapsed_ms = elapsed * 1000
+    if elapsed_ms >= SQL_SLOW_QUERY_MS:
+        endpoint = request.endpoint if has_request_context() else None
+        logger.warning(f"慢查询 {elapsed_ms:.1f}ms [{endpoint}]: {shape[:500]}")
+        if SQL_EXPLAIN_SLOW_QUERIES:
+            _schedule_explain(shape, statement, parameters)
+
+
+def _schedule_explain(shape, statement, parameters):
+    if not shape.lower().startswith(_EXPLAINABLE):
+        return
+    now = time.monotonic()
+    with _explained_lock:
+        if now - _explained_at.get(shape, -SQL_EXPLAIN_INTERVAL) < SQL_EXPLAIN_INTERVAL:
+            return
+        _explained_at[shape] = now
+    _explain_pool.submit(_explain, shape, statement, parameters)
+
+
+def _explain(shape, statement, parameters):
+    """在独立连接上执行 EXPLAIN（不带 ANALYZE，不会真正执行语句）"""
+    from app.extentions.db_postgres import db
+
+    conn = None
+    try:
+        conn = db.raw_connection()
+        cursor = conn.cursor()
+        cursor.execute('EXPLAIN ' + statement, parameters or None)
+        plan = '\n'.join(row[0] for row in cursor.fetchall())
+        logger.warning(f"慢查询执行计划: {shape[:200]}\n{plan}")
+    except Exception as e:
+        logger.warning(f"慢查询 EXPLAIN 失败: {str(e)}")
+    finally:
+        if conn is not None:
+            conn.rollback()
+            conn.close()
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """原生 psycopg2 游标：execute / executemany 计时后交给 record()"""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record(query if isinstance(query, (str, bytes)) else query.as_string(self), vars,
+                   time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record(query if isinstance(query, (str, bytes)) else query.as_string(self), None,
+                   time.perf_counter() - started)
+
+
+def instrument_connection(conn):
+    """让连接池借出的原生连接使用 InstrumentedCursor，返回原来的 cursor_factory"""
+    dbapi_connection = conn.dbapi_connection
+    previous = dbapi_connection.cursor_factory
+    dbapi_connection.cursor_factory = InstrumentedCursor
+    return previous
+
+
+def restore_connection(conn, previous):
+    """归还连接池前恢复原来的 cursor_factory，避免被引擎路径重复统计"""
+    dbapi_connection = conn.dbapi_connection
+    if dbapi_connection is not None:
+        dbapi_connection.cursor_factory = previous
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_sql_trace_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['_sql_trace_started'].pop()
+    record(statement, None if executemany else parameters, time.perf_counter() - started)
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('_sql_trace_started'):
+        conn.info['_sql_trace_started'].pop()
+
+
+def _add_server_timing(response):
+    trace = g.pop('_sql_trace', None)
+    if trace is None:
+        return response
+
+    response.headers.add('Server-Timing', f'db;dur={trace.total * 1000:.2f};desc="{trace.count} queries"')
+    response.headers.add('Server-Timing', f'db-slowest;dur={trace.slowest * 1000:.2f}')
+    logger.debug(f"[{request.endpoint}] {trace.count} 条 SQL，共 {trace.total * 1000:.1f}ms，"
+                 f"最慢 {trace.slowest * 1000:.1f}ms: {trace.slowest_statement}")
+
+    repeated = trace.repeated()
+    if repeated:
+        for shape, count in sorted(repeated.items(), key=lambda item: -item[1]):
+            logger.warning(f"疑似 N+1 [{request.endpoint}]: 同一语句执行 {count} 次: {shape[:300]}")
+    return response
+
+
+if SQL_TRACE_ENABLED:
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+
+
+def init_app(app):
+    """注册 after_request 钩子；SQL_TRACE_ENABLED=false 时不挂任何钩子"""
+    if SQL_TRACE_ENABLED:
+        app.after_request(_add_server_timing)
@@ -0,0 +1,115 @@
+# app/migrations/__init__.py
+"""
+版本化数据库迁移
+
+versions/ 下每个 vNNNN_<名称>.py 是一个迁移，提供 upgrade(cursor)，模块文档字符串即说明；
+已执行的版本记录在 schema_migrations 表中。每个迁移在独立事务中执行，
+执行前获取 advisory lock，多个实例同时部署时只有一个在迁移，其余等待后发现已是最新
+
+应用启动时不再建表；部署时执行：
+    flask --app app:create_app db migrate
+    flask --app app:create_app db seed     # 可选，空库写入示例数据
+"""
+import re
+import time
+import pkgutil
+import importlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 与统计快照刷新锁（0x68680001）区分
+MIGRATION_LOCK_KEY = 0x68680002
+
+_MODULE_NAME = re.compile(r'^v(\d{4})_(\w+)$')
+
+
+class Migration:
+    __slots__ = ('version', 'name', 'module')
+
+    def __init__(self, version, name, module):
+        self.version = version
+        self.name = name
+        self.module = module
+
+    @property
+    def description(self):
+        return (self.module.__doc__ or '').strip()
+
+
+def load_migrations():
+    """按版本号排序返回全部迁移"""
+    from app.migrations import versions
+
+    migrations = []
+    for info in pkgutil.iter_modules(versions.__path__):
+        match = _MODULE_NAME.match(info.name)
+        if not match:
+            continue
+        module = importlib.import_module(f'{versions.__name__}.{info.name}')
+        migrations.append(Migration(int(match.group(1)), match.group(2), module))
+    migrations.sort(key=lambda migration: migration.version)
+
+    seen = set()
+    for migration in migrations:
+        if migration.version in seen:
+            raise RuntimeError(f'迁移版本号重复: {migration.version}')
+        seen.add(migration.version)
+    return migrations
+
+
+def _ensure_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """)
+
+
+def applied_versions(conn):
+    cursor = conn.cursor()
+    _ensure_table(cursor)
+    conn.commit()
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(conn, target=None):
+    """执行所有未执行的迁移（或直到 target 版本），返回本次执行的迁移列表"""
+    applied = []
+    for migration in load_migrations():
+        if target is not None and migration.version > target:
+            break
+
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+        _ensure_table(cursor)
+        cursor.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (migration.version,))
+        if cursor.fetchone():
+            conn.rollback()
+            continue
+
+        started = time.perf_counter()
+        try:
+            migration.module.upgrade(cursor)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (migration.version, migration.name)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"迁移 v{migration.version:04d}_{migration.name} 失败")
+            raise
+        logger.info(f"迁移 v{migration.version:04d}_{migration.name} 完成，"
+                    f"耗时 {(time.perf_counter() - started) * 1000:.1f}ms")
+        applied.append(migration)
+    return applied
+
+
+def pending(conn):
+    """未执行的迁移"""
+    done = applied_versions(conn)
+    return [migration for migration in load_migrations() if migration.version not in done]
@@ -0,0 +1,58 @@
+# app/migrations/commands.py
+"""
+命令行：flask db migrate / flask db status / flask db seed
+"""
+import click
+from flask.cli import AppGroup
+
+db_cli = AppGroup('db', help='数据库迁移与示例数据')
+
+
+def _connect():
+    from app.extentions.db_postgres import db
+    return db.raw_connection()
+
+
+@db_cli.command('migrate')
+@click.option('--target', type=int, default=None, help='只迁移到指定版本')
+def migrate_command(target):
+    """执行未执行的迁移"""
+    from app.migrations import migrate
+
+    conn = _connect()
+    try:
+        applied = migrate(conn, target)
+    finally:
+        conn.close()
+    if not applied:
+        click.echo('数据库已是最新版本')
+    for migration in applied:
+        click.echo(f'v{migration.version:04d} {migration.name}: {migration.description}')
+
+
+@db_cli.command('status')
+def status_command():
+    """列出迁移及执行状态"""
+    from app.migrations import load_migrations, applied_versions
+
+    conn = _connect()
+    try:
+        done = applied_versions(conn)
+    finally:
+        conn.close()
+    for migration in load_migrations():
+        mark = 'x' if migration.version in done else ' '
+        click.echo(f'[{mark}] v{migration.version:04d} {migration.name}: {migration.description}')
+
+
+@db_cli.command('seed')
+def seed_command():
+    """内容表为空时写入示例数据"""
+    from app.migrations.seed import seed_sample_data
+
+    conn = _connect()
+    try:
+        seeded = seed_sample_data(conn)
+    finally:
+        conn.close()
+    click.echo('示例数据已写入' if seeded else '未写入示例数据')
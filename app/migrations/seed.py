@@ -0,0 +1,64 @@
+# app/migrations/seed.py
+"""
+示例数据：只在内容表为空时写入，可重复执行
+"""
+import logging
+# 命令行脚本不经过进程池，直接按当前配置的成本同步计算
+from app.sevices.password import _hash_password, PASSWORD_HASH_ROUNDS
+
+logger = logging.getLogger(__name__)
+
+
+def seed_sample_data(conn):
+    """内容表为空时插入示例数据，返回是否写入"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM contents")
+    if cursor.fetchone()[0] > 0:
+        logger.info("内容表已有数据，跳过示例数据")
+        return False
+    logger.info("数据库为空，插入示例数据...")
+    return insert_sample_data(conn, cursor)
+
+
+def insert_sample_data(conn, cursor):
+    """插入示例数据"""
+    try:
+        
+        # 插入示例用户
+        cursor.execute("""
+            INSERT INTO users (username, password_hash, membership_level)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (username) DO NOTHING
+        """, ('admin', _hash_password('admin123', PASSWORD_HASH_ROUNDS), 'vip'))
+        
+        cursor.execute("""
+            INSERT INTO users (username, password_hash, membership_level)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (username) DO NOTHING
+        """, ('test_user', _hash_password('test123', PASSWORD_HASH_ROUNDS), 'free'))
+        
+        # 插入示例内容
+        sample_contents = [
+            ('novel', '洪荒纪元：开天辟地', '讲述盘古开天辟地的传说故事', 29.9, 
+             'https://hpi-hub.tos-cn-beijing.volces.com/static/mobilewallpapers/cHJpdmF0ZS9sci91748499192317-7763YzJfMS5qcGc.jpg'),
+            ('music', '洪荒之音：神话旋律', '古风音乐专辑，演绎洪荒时代的壮阔', 19.9,
+             'https://hpi-hub.tos-cn-beijing.volces.com/static/batch_24/1757660354173-6723.jpg'),
+            ('anime', '洪荒传说：神魔录', '动漫番剧，重现上古神魔之战', 39.9,
+             'https://hpi-hub.tos-cn-beijing.volces.com/static/batch_20/1757610826493-2572.jpg'),
+            ('wallpaper', '洪荒壁纸集：神韵典藏', '高清壁纸合集，展现洪荒美学', 9.9,
+             'https://hpi-hub.tos-cn-beijing.volces.com/static/people/ai-generated-7957396_1280.png')
+        ]
+        
+        for content in sample_contents:
+            cursor.execute("""
+                INSERT INTO contents (type, title, description, price, image_url)
+                VALUES (%s, %s, %s, %s, %s)
+            """, content)
+        
+        conn.commit()
+        logger.info("示例数据插入成功")
+        return True
+    except Exception as e:
+        logger.error(f"插入示例数据失败: {str(e)}")
+        conn.rollback()
+        return False
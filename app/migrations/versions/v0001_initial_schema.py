@@ -0,0 +1,40 @@
+# app/migrations/versions/v0001_initial_schema.py
+"""用户、内容、订单三张基础表及其索引"""
+
+
+def upgrade(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(80) UNIQUE NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            membership_level VARCHAR(20) DEFAULT 'free',
+            created_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS contents (
+            id SERIAL PRIMARY KEY,
+            type VARCHAR(20) NOT NULL,
+            title VARCHAR(200) NOT NULL,
+            description TEXT,
+            price FLOAT DEFAULT 0.0,
+            image_url VARCHAR(500),
+            created_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS orders (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            content_id INTEGER NOT NULL REFERENCES contents(id),
+            payment_status VARCHAR(20) DEFAULT 'pending',
+            payment_time TIMESTAMPTZ DEFAULT NOW()
+        )
+    """)
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contents_type ON contents(type)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders(user_id)")
@@ -0,0 +1,13 @@
+# app/migrations/versions/v0002_content_listing_indexes.py
+"""内容列表游标分页：按类型 / 全部两种排序路径的索引"""
+
+
+def upgrade(cursor):
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_contents_type_created_id
+        ON contents(type, created_at DESC, id DESC)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_contents_created_id
+        ON contents(created_at DESC, id DESC)
+    """)
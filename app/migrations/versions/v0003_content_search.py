@@ -0,0 +1,34 @@
+# app/migrations/versions/v0003_content_search.py
+"""内容检索：bigram 分词函数与 tsvector 表达式 GIN 索引"""
+
+CREATE_SEARCH_FUNCTIONS_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION cjk_bigrams(doc text) RETURNS tsvector
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT COALESCE(array_to_tsvector(array_agg(DISTINCT gram)), ''::tsvector)
+        FROM (
+            SELECT substr(lower(doc), i, 2) AS gram
+            FROM generate_series(1, greatest(char_length(doc) - 1, 1)) AS i
+        ) grams
+        WHERE gram <> '' AND gram !~ '[[:space:]]'
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION content_search_vector(title text, description text) RETURNS tsvector
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT setweight(cjk_bigrams(COALESCE(title, '')), 'A')
+            || setweight(cjk_bigrams(COALESCE(description, '')), 'B')
+    $$
+    """,
+]
+
+CREATE_SEARCH_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_contents_search
+    ON contents USING gin (content_search_vector(title, description))
+"""
+
+
+def upgrade(cursor):
+    for sql in CREATE_SEARCH_FUNCTIONS_SQL:
+        cursor.execute(sql)
+    cursor.execute(CREATE_SEARCH_INDEX_SQL)
@@ -0,0 +1,44 @@
+# app/migrations/versions/v0004_admin_stats_snapshot.py
+"""管理后台统计快照（物化视图）"""
+
+CREATE_SNAPSHOT_SQL = """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS admin_stats_snapshot AS
+    SELECT
+        1 AS id,
+        (SELECT COUNT(*) FROM users) AS total_users,
+        (SELECT COUNT(*) FROM users WHERE membership_level = 'vip') AS vip_users,
+        (SELECT COUNT(*) FROM contents) AS total_contents,
+        o.total_orders,
+        o.paid_orders,
+        o.revenue,
+        (
+            SELECT COALESCE(jsonb_object_agg(type, cnt), '{}'::jsonb)
+            FROM (SELECT type, COUNT(*) AS cnt FROM contents GROUP BY type) t
+        ) AS content_stats,
+        (
+            SELECT COALESCE(jsonb_object_agg(status, cnt), '{}'::jsonb)
+            FROM (
+                SELECT COALESCE(payment_status, 'unknown') AS status, COUNT(*) AS cnt
+                FROM orders GROUP BY 1
+            ) t
+        ) AS order_stats,
+        NOW() AS refreshed_at
+    FROM (
+        SELECT
+            COUNT(*) AS total_orders,
+            COUNT(*) FILTER (WHERE orders.payment_status = 'paid') AS paid_orders,
+            COALESCE(SUM(contents.price) FILTER (WHERE orders.payment_status = 'paid'), 0) AS revenue
+        FROM orders
+        LEFT JOIN contents ON contents.id = orders.content_id
+    ) o
+"""
+
+# REFRESH ... CONCURRENTLY 要求物化视图上存在唯一索引
+CREATE_SNAPSHOT_INDEX_SQL = """
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_admin_stats_snapshot_id ON admin_stats_snapshot(id)
+"""
+
+
+def upgrade(cursor):
+    cursor.execute(CREATE_SNAPSHOT_SQL)
+    cursor.execute(CREATE_SNAPSHOT_INDEX_SQL)
@@ -0,0 +1,13 @@
+# app/migrations/versions/v0005_order_history_index.py
+"""订单历史游标分页：(user_id, payment_time DESC, id DESC) 覆盖索引"""
+
+
+def upgrade(cursor):
+    # INCLUDE 列让按状态过滤、取 content_id 都在索引内完成，一页订单只需一次索引范围扫描
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_orders_user_payment_time_id
+        ON orders(user_id, payment_time DESC, id DESC)
+        INCLUDE (content_id, payment_status)
+    """)
+    # 新索引以 user_id 开头，单列索引已经多余，删除以减少写入开销
+    cursor.execute("DROP INDEX IF EXISTS idx_orders_user_id")
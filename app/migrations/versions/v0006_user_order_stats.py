@@ -0,0 +1,112 @@
+# app/migrations/versions/v0006_user_order_stats.py
+"""按用户的订单计数器：触发器随订单创建 / 状态变更增量维护，并按现有订单回填"""
+
+# 单次聚合统计一个用户（或全部用户）的订单，回填与重算都使用
+ORDER_STATS_AGGREGATE_SQL = """
+    SELECT
+        o.user_id,
+        COUNT(*) AS total_orders,
+        COUNT(*) FILTER (WHERE o.payment_status = 'pending') AS pending_orders,
+        COUNT(*) FILTER (WHERE o.payment_status = 'paid') AS paid_orders,
+        COUNT(*) FILTER (WHERE o.payment_status = 'cancelled') AS cancelled_orders,
+        COUNT(*) FILTER (WHERE o.payment_status = 'refunded') AS refunded_orders,
+        COALESCE(SUM(c.price) FILTER (WHERE o.payment_status = 'paid'), 0) AS total_spent
+    FROM orders o
+    LEFT JOIN contents c ON c.id = o.content_id
+"""
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS user_order_stats (
+        user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+        total_orders INTEGER NOT NULL DEFAULT 0,
+        pending_orders INTEGER NOT NULL DEFAULT 0,
+        paid_orders INTEGER NOT NULL DEFAULT 0,
+        cancelled_orders INTEGER NOT NULL DEFAULT 0,
+        refunded_orders INTEGER NOT NULL DEFAULT 0,
+        total_spent NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    )
+"""
+
+# 先减去旧行、再加上新行；已支付订单的消费金额按变更时的内容价格计算
+CREATE_TRIGGER_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION user_order_stats_apply() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE user_order_stats SET
+                total_orders = total_orders - 1,
+                pending_orders = pending_orders - (COALESCE(OLD.payment_status, '') = 'pending')::int,
+                paid_orders = paid_orders - (COALESCE(OLD.payment_status, '') = 'paid')::int,
+                cancelled_orders = cancelled_orders - (COALESCE(OLD.payment_status, '') = 'cancelled')::int,
+                refunded_orders = refunded_orders - (COALESCE(OLD.payment_status, '') = 'refunded')::int,
+                total_spent = total_spent - CASE WHEN OLD.payment_status = 'paid'
+                    THEN COALESCE((SELECT price FROM contents WHERE id = OLD.content_id), 0) ELSE 0 END,
+                updated_at = NOW()
+            WHERE user_id = OLD.user_id;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO user_order_stats AS s (
+                user_id, total_orders, pending_orders, paid_orders, cancelled_orders, refunded_orders, total_spent
+            ) VALUES (
+                NEW.user_id,
+                1,
+                (COALESCE(NEW.payment_status, '') = 'pending')::int,
+                (COALESCE(NEW.payment_status, '') = 'paid')::int,
+                (COALESCE(NEW.payment_status, '') = 'cancelled')::int,
+                (COALESCE(NEW.payment_status, '') = 'refunded')::int,
+                CASE WHEN NEW.payment_status = 'paid'
+                    THEN COALESCE((SELECT price FROM contents WHERE id = NEW.content_id), 0) ELSE 0 END
+            )
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_orders = s.total_orders + EXCLUDED.total_orders,
+                pending_orders = s.pending_orders + EXCLUDED.pending_orders,
+                paid_orders = s.paid_orders + EXCLUDED.paid_orders,
+                cancelled_orders = s.cancelled_orders + EXCLUDED.cancelled_orders,
+                refunded_orders = s.refunded_orders + EXCLUDED.refunded_orders,
+                total_spent = s.total_spent + EXCLUDED.total_spent,
+                updated_at = NOW();
+        END IF;
+        RETURN NULL;
+    END
+    $$
+"""
+
+CREATE_TRIGGERS_SQL = [
+    "DROP TRIGGER IF EXISTS orders_stats_insert_delete ON orders",
+    """
+    CREATE TRIGGER orders_stats_insert_delete
+    AFTER INSERT OR DELETE ON orders
+    FOR EACH ROW EXECUTE FUNCTION user_order_stats_apply()
+    """,
+    "DROP TRIGGER IF EXISTS orders_stats_update ON orders",
+    """
+    CREATE TRIGGER orders_stats_update
+    AFTER UPDATE OF user_id, content_id, payment_status ON orders
+    FOR EACH ROW
+    WHEN (OLD.user_id IS DISTINCT FROM NEW.user_id
+          OR OLD.content_id IS DISTINCT FROM NEW.content_id
+          OR OLD.payment_status IS DISTINCT FROM NEW.payment_status)
+    EXECUTE FUNCTION user_order_stats_apply()
+    """,
+]
+
+BACKFILL_SQL = f"""
+    INSERT INTO user_order_stats (
+        user_id, total_orders, pending_orders, paid_orders, cancelled_orders, refunded_orders, total_spent
+    )
+    {ORDER_STATS_AGGREGATE_SQL}
+    GROUP BY o.user_id
+    ON CONFLICT (user_id) DO NOTHING
+"""
+
+
+def upgrade(cursor):
+    cursor.execute(CREATE_TABLE_SQL)
+    cursor.execute(CREATE_TRIGGER_FUNCTION_SQL)
+    # 回填期间阻止订单写入，保证回填结果与触发器的增量衔接
+    cursor.execute("LOCK TABLE orders IN SHARE MODE")
+    for sql in CREATE_TRIGGERS_SQL:
+        cursor.execute(sql)
+    cursor.execute(BACKFILL_SQL)
@@ -0,0 +1,19 @@
+# app/migrations/versions/v0007_idempotency_keys.py
+"""下单 / 支付 / 取消的幂等键：按 (user_id, idem_key) 唯一，保存首次请求的响应"""
+
+
+def upgrade(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            user_id INTEGER NOT NULL,
+            idem_key VARCHAR(255) NOT NULL,
+            request_hash CHAR(40) NOT NULL,
+            status_code SMALLINT,
+            response_body TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (user_id, idem_key)
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys(created_at)
+    """)
@@ -0,0 +1,27 @@
+# app/migrations/versions/v0008_content_rankings.py
+"""热门 / 畅销排行：按榜单保存每个内容的时间衰减得分，并按已支付订单回填畅销榜"""
+
+# 与 app.sevices.ranking 中畅销榜的默认半衰期一致
+BESTSELLER_HALF_LIFE_DAYS = 30
+
+
+def upgrade(cursor):
+    # score 是 updated_at 时刻的得分，读取时再按经过的时间衰减
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS content_rankings (
+            board VARCHAR(20) NOT NULL,
+            content_id INTEGER NOT NULL REFERENCES contents(id) ON DELETE CASCADE,
+            score DOUBLE PRECISION NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (board, content_id)
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO content_rankings (board, content_id, score)
+        SELECT 'bestseller', content_id,
+               SUM(exp(-ln(2) * extract(epoch FROM NOW() - payment_time) / %s))
+        FROM orders
+        WHERE payment_status = 'paid' AND payment_time IS NOT NULL
+        GROUP BY content_id
+        ON CONFLICT (board, content_id) DO NOTHING
+    """, (BESTSELLER_HALF_LIFE_DAYS * 86400,))
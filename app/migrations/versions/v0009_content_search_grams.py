@@ -0,0 +1,39 @@
+# app/migrations/versions/v0009_content_search_grams.py
+"""内容检索：同时索引单字与二元组，并记录位置，使标题（A）/ 描述（B）权重参与排序"""
+
+# 每个字符位置 i 产生单字 lexeme 和从 i 开始的二元组 lexeme，都带位置 i：
+# - 单字查询精确匹配单字 lexeme，末尾字符、空白前的字符也能命中
+# - 带位置的 lexeme 才能被 setweight 标记权重，ts_rank 据此让标题命中排在描述命中之前
+# tsvector 位置上限 16383，更长的文本位置取上限（不影响命中）
+CREATE_SEARCH_FUNCTIONS_SQL = [
+    r"""
+    CREATE OR REPLACE FUNCTION cjk_grams(doc text) RETURNS tsvector
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT COALESCE(string_agg(
+            '''' || replace(replace(gram, '\', '\\'), '''', '''''') || ''':' || least(i, 16383),
+            ' '
+        ), '')::tsvector
+        FROM (
+            SELECT i, n, substr(lower(doc), i, n) AS gram
+            FROM generate_series(1, char_length(doc)) AS i
+            CROSS JOIN (VALUES (1), (2)) AS sizes(n)
+        ) grams
+        WHERE char_length(gram) = n AND gram !~ '[[:space:]]'
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION content_search_vector(title text, description text) RETURNS tsvector
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT setweight(cjk_grams(COALESCE(title, '')), 'A')
+            || setweight(cjk_grams(COALESCE(description, '')), 'B')
+    $$
+    """,
+]
+
+
+def upgrade(cursor):
+    for sql in CREATE_SEARCH_FUNCTIONS_SQL:
+        cursor.execute(sql)
+    # 索引表达式的函数结果变了，必须重建索引
+    cursor.execute("REINDEX INDEX idx_contents_search")
+    cursor.execute("DROP FUNCTION IF EXISTS cjk_bigrams(text)")
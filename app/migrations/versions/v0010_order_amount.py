@@ -0,0 +1,123 @@
+# app/migrations/versions/v0010_order_amount.py
+"""订单记录实付金额 amount：订单计数器的消费总额按实付金额增减，不再随内容改价漂移"""
+
+# 与 v0006 相同的单次聚合，消费总额改为按订单实付金额
+ORDER_STATS_AGGREGATE_SQL = """
+    SELECT
+        o.user_id,
+        COUNT(*) AS total_orders,
+        COUNT(*) FILTER (WHERE o.payment_status = 'pending') AS pending_orders,
+        COUNT(*) FILTER (WHERE o.payment_status = 'paid') AS paid_orders,
+        COUNT(*) FILTER (WHERE o.payment_status = 'cancelled') AS cancelled_orders,
+        COUNT(*) FILTER (WHERE o.payment_status = 'refunded') AS refunded_orders,
+        COALESCE(SUM(o.amount) FILTER (WHERE o.payment_status = 'paid'), 0) AS total_spent
+    FROM orders o
+"""
+
+# 变为已支付且未指定金额时（如管理后台改状态），按当时的内容价格记录
+CREATE_AMOUNT_TRIGGER_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION orders_set_amount() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF NEW.payment_status = 'paid' AND NEW.amount IS NULL THEN
+            NEW.amount := COALESCE((SELECT price FROM contents WHERE id = NEW.content_id), 0);
+        END IF;
+        RETURN NEW;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS orders_set_amount ON orders",
+    """
+    CREATE TRIGGER orders_set_amount
+    BEFORE INSERT OR UPDATE OF payment_status, amount ON orders
+    FOR EACH ROW EXECUTE FUNCTION orders_set_amount()
+    """,
+]
+
+# 增减都使用订单自身的 amount，加上去的金额与减掉的金额一定相同
+CREATE_STATS_TRIGGER_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION user_order_stats_apply() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE user_order_stats SET
+                total_orders = total_orders - 1,
+                pending_orders = pending_orders - (COALESCE(OLD.payment_status, '') = 'pending')::int,
+                paid_orders = paid_orders - (COALESCE(OLD.payment_status, '') = 'paid')::int,
+                cancelled_orders = cancelled_orders - (COALESCE(OLD.payment_status, '') = 'cancelled')::int,
+                refunded_orders = refunded_orders - (COALESCE(OLD.payment_status, '') = 'refunded')::int,
+                total_spent = total_spent - CASE WHEN OLD.payment_status = 'paid'
+                    THEN COALESCE(OLD.amount, 0) ELSE 0 END,
+                updated_at = NOW()
+            WHERE user_id = OLD.user_id;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO user_order_stats AS s (
+                user_id, total_orders, pending_orders, paid_orders, cancelled_orders, refunded_orders, total_spent
+            ) VALUES (
+                NEW.user_id,
+                1,
+                (COALESCE(NEW.payment_status, '') = 'pending')::int,
+                (COALESCE(NEW.payment_status, '') = 'paid')::int,
+                (COALESCE(NEW.payment_status, '') = 'cancelled')::int,
+                (COALESCE(NEW.payment_status, '') = 'refunded')::int,
+                CASE WHEN NEW.payment_status = 'paid' THEN COALESCE(NEW.amount, 0) ELSE 0 END
+            )
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_orders = s.total_orders + EXCLUDED.total_orders,
+                pending_orders = s.pending_orders + EXCLUDED.pending_orders,
+                paid_orders = s.paid_orders + EXCLUDED.paid_orders,
+                cancelled_orders = s.cancelled_orders + EXCLUDED.cancelled_orders,
+                refunded_orders = s.refunded_orders + EXCLUDED.refunded_orders,
+                total_spent = s.total_spent + EXCLUDED.total_spent,
+                updated_at = NOW();
+        END IF;
+        RETURN NULL;
+    END
+    $$
+"""
+
+CREATE_STATS_TRIGGERS_SQL = [
+    "DROP TRIGGER IF EXISTS orders_stats_update ON orders",
+    """
+    CREATE TRIGGER orders_stats_update
+    AFTER UPDATE OF user_id, payment_status, amount ON orders
+    FOR EACH ROW
+    WHEN (OLD.user_id IS DISTINCT FROM NEW.user_id
+          OR OLD.payment_status IS DISTINCT FROM NEW.payment_status
+          OR OLD.amount IS DISTINCT FROM NEW.amount)
+    EXECUTE FUNCTION user_order_stats_apply()
+    """,
+]
+
+REBUILD_STATS_SQL = [
+    "DELETE FROM user_order_stats",
+    f"""
+    INSERT INTO user_order_stats (
+        user_id, total_orders, pending_orders, paid_orders, cancelled_orders, refunded_orders, total_spent
+    )
+    {ORDER_STATS_AGGREGATE_SQL}
+    GROUP BY o.user_id
+    """,
+]
+
+
+def upgrade(cursor):
+    # 回填与重建期间阻止订单写入
+    cursor.execute("LOCK TABLE orders IN SHARE ROW EXCLUSIVE MODE")
+    cursor.execute("ALTER TABLE orders ADD COLUMN IF NOT EXISTS amount NUMERIC(10, 2)")
+    # 历史订单没有记录实付金额，只能按当前价格回填
+    cursor.execute("""
+        UPDATE orders o SET amount = COALESCE(c.price, 0)
+        FROM contents c
+        WHERE c.id = o.content_id AND o.amount IS NULL AND o.payment_status IN ('paid', 'refunded')
+    """)
+    for sql in CREATE_AMOUNT_TRIGGER_SQL:
+        cursor.execute(sql)
+    cursor.execute(CREATE_STATS_TRIGGER_FUNCTION_SQL)
+    for sql in CREATE_STATS_TRIGGERS_SQL:
+        cursor.execute(sql)
+    for sql in REBUILD_STATS_SQL:
+        cursor.execute(sql)
@@ -0,0 +1,57 @@
+# app/migrations/versions/v0011_user_order_stats_version.py
+"""订单计数器增加单调递增的 version：用户的订单每变更一次加一，供各 worker 校验进程内的权益缓存"""
+
+# 与 v0010 相同，更新计数器时同时递增 version；计数器行的行锁保证递增有序。
+# 没有计数器行的用户视为 version 0，新建的行从 1 开始
+CREATE_STATS_TRIGGER_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION user_order_stats_apply() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE user_order_stats SET
+                total_orders = total_orders - 1,
+                pending_orders = pending_orders - (COALESCE(OLD.payment_status, '') = 'pending')::int,
+                paid_orders = paid_orders - (COALESCE(OLD.payment_status, '') = 'paid')::int,
+                cancelled_orders = cancelled_orders - (COALESCE(OLD.payment_status, '') = 'cancelled')::int,
+                refunded_orders = refunded_orders - (COALESCE(OLD.payment_status, '') = 'refunded')::int,
+                total_spent = total_spent - CASE WHEN OLD.payment_status = 'paid'
+                    THEN COALESCE(OLD.amount, 0) ELSE 0 END,
+                version = version + 1,
+                updated_at = NOW()
+            WHERE user_id = OLD.user_id;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO user_order_stats AS s (
+                user_id, total_orders, pending_orders, paid_orders, cancelled_orders, refunded_orders, total_spent,
+                version
+            ) VALUES (
+                NEW.user_id,
+                1,
+                (COALESCE(NEW.payment_status, '') = 'pending')::int,
+                (COALESCE(NEW.payment_status, '') = 'paid')::int,
+                (COALESCE(NEW.payment_status, '') = 'cancelled')::int,
+                (COALESCE(NEW.payment_status, '') = 'refunded')::int,
+                CASE WHEN NEW.payment_status = 'paid' THEN COALESCE(NEW.amount, 0) ELSE 0 END,
+                1
+            )
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_orders = s.total_orders + EXCLUDED.total_orders,
+                pending_orders = s.pending_orders + EXCLUDED.pending_orders,
+                paid_orders = s.paid_orders + EXCLUDED.paid_orders,
+                cancelled_orders = s.cancelled_orders + EXCLUDED.cancelled_orders,
+                refunded_orders = s.refunded_orders + EXCLUDED.refunded_orders,
+                total_spent = s.total_spent + EXCLUDED.total_spent,
+                version = s.version + 1,
+                updated_at = NOW();
+        END IF;
+        RETURN NULL;
+    END
+    $$
+"""
+
+
+def upgrade(cursor):
+    # 已有的行从 1 开始，与"没有计数器行"区分
+    cursor.execute("ALTER TABLE user_order_stats ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1")
+    cursor.execute(CREATE_STATS_TRIGGER_FUNCTION_SQL)
@@ -0,0 +1,13 @@
+# app/migrations/versions/v0012_order_history_id_index.py
+"""订单历史改按 id 游标分页：(user_id, id DESC) 覆盖索引替换 (user_id, payment_time DESC, id DESC)"""
+
+
+def upgrade(cursor):
+    # payment_time 会在支付时改变，且可能为 NULL，不能作为游标键；id 单调且不变。
+    # INCLUDE 列让列表页和已购列表的查询都在索引内完成
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_orders_user_id_desc
+        ON orders(user_id, id DESC)
+        INCLUDE (content_id, payment_status, payment_time, amount)
+    """)
+    cursor.execute("DROP INDEX IF EXISTS idx_orders_user_payment_time_id")
@@ -0,0 +1,16 @@
+# app/migrations/versions/v0013_contents_created_at_not_null.py
+"""内容 created_at 改为 NOT NULL：游标分页以 (created_at, id) 为键，NULL 行会让游标无法编码和比较"""
+
+
+def upgrade(cursor):
+    # 回填期间阻止新增内容
+    cursor.execute("LOCK TABLE contents IN SHARE ROW EXCLUSIVE MODE")
+    # 发布时间未知的内容按最早发布处理，排在列表末尾，不会突然出现在首页
+    cursor.execute("""
+        UPDATE contents SET created_at = COALESCE(
+            (SELECT MIN(created_at) FROM contents WHERE created_at IS NOT NULL), NOW()
+        )
+        WHERE created_at IS NULL
+    """)
+    cursor.execute("ALTER TABLE contents ALTER COLUMN created_at SET DEFAULT NOW()")
+    cursor.execute("ALTER TABLE contents ALTER COLUMN created_at SET NOT NULL")
@@ -7,7 +7,25 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-db = SQLAlchemy()
+
+class SharedEngineSQLAlchemy(SQLAlchemy):
+    """ORM 直接使用 app.extentions.db_postgres 中的共享引擎，与原生游标共用同一个连接池
+
+    不另建引擎，也不把连接池借出的代理连接当作 DBAPI 连接交给 SQLAlchemy
+    （方言的连接初始化只接受真正的 psycopg2 连接）
+    """
+
+    def _make_engine(self, bind_key, options, app):
+        from app.extentions.db_postgres import db as engine
+        return engine
+
+
+db = SharedEngineSQLAlchemy()
+
+# 模型模块依赖上面的 db，须在其定义之后导入
+from app.models.user import User  # noqa: E402
+from app.models.content import Content  # noqa: E402
+from app.models.order import Order  # noqa: E402
 
 
 def init_database(app):
@@ -1,3 +1,6 @@
+# app/models/content.py
+from datetime import datetime
+from app.models import db
 
 
 class Content(db.Model):
@@ -10,7 +13,7 @@ class Content(db.Model):
     description = db.Column(db.Text)
     price = db.Column(db.Float, default=0.0)
     image_url = db.Column(db.String(500))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
     orders = db.relationship('Order', backref='content', lazy='dynamic')
     
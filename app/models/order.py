@@ -1,3 +1,6 @@
+# app/models/order.py
+from datetime import datetime
+from app.models import db
 
 
 class Order(db.Model):
@@ -9,6 +12,7 @@ class Order(db.Model):
     content_id = db.Column(db.Integer, db.ForeignKey('contents.id'), nullable=False)
     payment_status = db.Column(db.String(20), default='pending')
     payment_time = db.Column(db.DateTime, default=datetime.utcnow)
+    amount = db.Column(db.Numeric(10, 2))
     
     def to_dict(self):
         """转换为字典"""
@@ -17,7 +21,8 @@ class Order(db.Model):
             'user_id': self.user_id,
             'content_id': self.content_id,
             'payment_status': self.payment_status,
-            'payment_time': self.payment_time.isoformat() if self.payment_time else None
+            'payment_time': self.payment_time.isoformat() if self.payment_time else None,
+            'amount': float(self.amount) if self.amount is not None else None
         }
     
     def __repr__(self):
@@ -1,3 +1,7 @@
+# app/models/user.py
+from datetime import datetime
+from werkzeug.security import generate_password_hash, check_password_hash
+from app.models import db
 
 
 class User(db.Model):
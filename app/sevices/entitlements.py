@@ -0,0 +1,154 @@
+# app/sevices/entitlements.py
+"""
+内容权益索引：每个用户已购内容 ID 的有序 int 数组，判断是否已购买只需二分查找
+
+- worker 预热时按最近购买的用户批量构建，其余用户首次访问时用一次索引扫描加载
+- 每个数组记录加载时用户订单计数器的 version（user_order_stats，订单每变更一次由触发器加一）；
+  每次读取先按主键查一次 version，与缓存不一致就重新加载。任何 worker 中的支付、
+  管理后台的退款都会改变 version，其他 worker 的下一次读取即可看到
+- version 与已购列表在同一条语句中读取（同一快照），并发加载时旧版本不会覆盖新版本
+- 数组只整体替换、不原地修改，读取无需加锁；TTL 只用于回收不活跃用户的内存
+"""
+import os
+import time
+import bisect
+import threading
+import logging
+from array import array
+from app.extentions.db_postgres import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+ENTITLEMENT_CACHE_TTL = int(os.getenv('ENTITLEMENT_CACHE_TTL', 300))
+ENTITLEMENT_CACHE_MAX_USERS = int(os.getenv('ENTITLEMENT_CACHE_MAX_USERS', 50000))
+
+
+class _Owned:
+    __slots__ = ('ids', 'version', 'expires_at')
+
+    def __init__(self, ids, version, expires_at):
+        self.ids = ids
+        self.version = version
+        self.expires_at = expires_at
+
+
+def _contains(ids, content_id):
+    i = bisect.bisect_left(ids, content_id)
+    return i < len(ids) and ids[i] == content_id
+
+
+def _cursor():
+    conn = get_db_connection()
+    if not conn:
+        raise ConnectionError('数据库连接失败')
+    return conn.cursor()
+
+
+class EntitlementIndex:
+    """按用户 ID 缓存已购内容 ID 的有序数组，读取时按共享 version 校验"""
+
+    def __init__(self, ttl=ENTITLEMENT_CACHE_TTL, max_users=ENTITLEMENT_CACHE_MAX_USERS):
+        self.ttl = ttl
+        self.max_users = max_users
+        self.hits = 0
+        self.misses = 0
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def owned_ids(self, user_id):
+        """用户已购内容 ID 的有序数组"""
+        user_id = int(user_id)
+        owned = self._users.get(user_id)
+        if owned is not None and owned.expires_at > time.monotonic():
+            cursor = _cursor()
+            cursor.execute("SELECT version FROM user_order_stats WHERE user_id = %s", (user_id,))
+            row = cursor.fetchone()
+            cursor.close()
+            if (row[0] if row else 0) == owned.version:
+                self.hits += 1
+                return owned.ids
+
+        self.misses += 1
+        version, ids = self._load(user_id)
+        self._store(user_id, version, ids)
+        return ids
+
+    def owns(self, user_id, content_id):
+        return _contains(self.owned_ids(user_id), int(content_id))
+
+    def owned_many(self, user_id, content_ids):
+        """批量判断，返回 {content_id: bool}；整页内容只校验一次 version"""
+        ids = self.owned_ids(user_id)
+        return {content_id: _contains(ids, content_id) for content_id in content_ids}
+
+    def invalidate(self, user_id):
+        """本进程内立即丢弃缓存（其他进程由 version 校验发现变更）"""
+        with self._lock:
+            self._users.pop(int(user_id), None)
+
+    def preload(self, limit=None):
+        """按最近购买时间批量构建，返回加载的用户数（worker 预热时调用）"""
+        limit = self.max_users if limit is None else limit
+        cursor = _cursor()
+        cursor.execute("""
+            SELECT o.user_id, s.version, array_agg(DISTINCT o.content_id ORDER BY o.content_id)
+            FROM orders o
+            JOIN user_order_stats s ON s.user_id = o.user_id
+            WHERE o.payment_status = 'paid'
+            GROUP BY o.user_id, s.version
+            ORDER BY MAX(o.payment_time) DESC
+            LIMIT %s
+        """, (limit,))
+        rows = cursor.fetchall()
+        cursor.close()
+
+        for user_id, version, content_ids in rows:
+            self._store(user_id, version, array('i', content_ids))
+        return len(rows)
+
+    def stats(self):
+        users = list(self._users.values())
+        return {
+            'users': len(users),
+            'content_ids': sum(len(owned.ids) for owned in users),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    def _store(self, user_id, version, ids):
+        with self._lock:
+            current = self._users.get(user_id)
+            # 并发加载时，先开始、后完成的旧快照不能覆盖新版本
+            if current is not None and current.version > version:
+                return
+            if len(self._users) >= self.max_users:
+                self._evict_expired()
+            self._users[user_id] = _Owned(ids, version, time.monotonic() + self.ttl)
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for user_id in [uid for uid, owned in self._users.items() if owned.expires_at <= now]:
+            del self._users[user_id]
+        # 仍然超限时清空，重新按需加载
+        if len(self._users) >= self.max_users:
+            self._users.clear()
+
+    def _load(self, user_id):
+        """在同一条语句中读取 version 和已购列表，返回 (version, ids)"""
+        cursor = _cursor()
+        # 已购列表走 (user_id, ...) INCLUDE (content_id, payment_status) 覆盖索引
+        cursor.execute("""
+            SELECT
+                COALESCE((SELECT version FROM user_order_stats WHERE user_id = %s), 0),
+                ARRAY(
+                    SELECT DISTINCT content_id FROM orders
+                    WHERE user_id = %s AND payment_status = 'paid'
+                    ORDER BY content_id
+                )
+        """, (user_id, user_id))
+        version, content_ids = cursor.fetchone()
+        cursor.close()
+        return version, array('i', content_ids)
+
+
+entitlements = EntitlementIndex()
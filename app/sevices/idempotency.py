@@ -0,0 +1,226 @@
+# app/sevices/idempotency.py
+"""
+幂等键：客户端重试、支付回调重复到达时，同一个 Idempotency-Key 只执行一次
+
+- 占位、视图的状态变更、保存响应在同一个数据库事务中完成：视图通过 transaction()
+  拿到这个事务的连接，要么三者一起提交，要么一起回滚，不会出现"订单已提交、键未完成"
+- 占位行在事务提交前一直持有行锁，同一个键的并发请求在 INSERT 上等待，
+  首个请求提交后直接重放它的响应；等待超过 IDEMPOTENCY_LOCK_WAIT 返回 409
+- 进程崩溃时事务由数据库回滚，不会留下无主的占位
+- 已完成的响应同时放入进程内 LRU，重放通常不需要查库
+- 同一个键的请求体不同返回 422；5xx 回滚整个事务，客户端可以用同一个键重试
+- 超过 TTL 的键视为不存在，可被重新占用，并定期清理
+"""
+import os
+import time
+import hashlib
+import logging
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, request, jsonify, g, Response
+from app.extentions.db_postgres import db
+from app.extentions.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 86400))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv('IDEMPOTENCY_CACHE_SIZE', 10000))
+IDEMPOTENCY_PURGE_INTERVAL = int(os.getenv('IDEMPOTENCY_PURGE_INTERVAL', 600))
+# 同一个键的请求正在执行时，后到的请求最多等待的毫秒数
+IDEMPOTENCY_LOCK_WAIT = int(os.getenv('IDEMPOTENCY_LOCK_WAIT_MS', 5000))
+MAX_KEY_LENGTH = 255
+
+# PostgreSQL lock_not_available
+_LOCK_NOT_AVAILABLE = '55P03'
+
+
+class IdempotencyStore:
+    """幂等键存储：数据库表保证唯一，进程内 LRU 加速重放"""
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL, cache_size=IDEMPOTENCY_CACHE_SIZE):
+        self.ttl = ttl
+        self.replays = 0
+        self._cache = LRUCache(max_size=cache_size, default_ttl=ttl)
+        self._next_purge = 0
+
+    def cached(self, user_id, key):
+        return self._cache.get((user_id, key))
+
+    def claim(self, conn, user_id, key, request_hash):
+        """在 conn 的事务中占用键：成功返回 None，否则返回已保存的记录 (request_hash, status_code, body)"""
+        conn.exec_driver_sql(f"SET LOCAL lock_timeout = {IDEMPOTENCY_LOCK_WAIT}")
+        # 已过期的键可以被覆盖，视为新键；正在执行的同键请求未提交时在这里等待
+        cursor = conn.exec_driver_sql("""
+            INSERT INTO idempotency_keys (user_id, idem_key, request_hash)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (user_id, idem_key) DO UPDATE SET
+                request_hash = EXCLUDED.request_hash,
+                status_code = NULL,
+                response_body = NULL,
+                created_at = NOW()
+            WHERE idempotency_keys.created_at < NOW() - make_interval(secs => %s)
+            RETURNING 1
+        """, (user_id, key, request_hash, self.ttl))
+        claimed = cursor.fetchone() is not None
+        conn.exec_driver_sql("SET LOCAL lock_timeout = DEFAULT")
+        if claimed:
+            return None
+
+        cursor = conn.exec_driver_sql("""
+            SELECT request_hash, status_code, response_body FROM idempotency_keys
+            WHERE user_id = %s AND idem_key = %s
+        """, (user_id, key))
+        record = tuple(cursor.fetchone())
+        if record[1] is not None:
+            self._cache.set((user_id, key), record)
+        return record
+
+    def complete(self, conn, user_id, key, status_code, body):
+        """在 conn 的事务中保存响应（随视图的状态变更一起提交）"""
+        conn.exec_driver_sql("""
+            UPDATE idempotency_keys SET status_code = %s, response_body = %s
+            WHERE user_id = %s AND idem_key = %s
+        """, (status_code, body, user_id, key))
+
+    def remember(self, user_id, key, request_hash, status_code, body):
+        """事务提交后放入进程内缓存"""
+        self._cache.set((user_id, key), (request_hash, status_code, body))
+
+    def stats(self):
+        return {'cached': self._cache.size(), 'replays': self.replays}
+
+    def maybe_purge(self):
+        now = time.monotonic()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + IDEMPOTENCY_PURGE_INTERVAL
+        try:
+            with db.begin() as conn:
+                cursor = conn.exec_driver_sql("""
+                    DELETE FROM idempotency_keys WHERE created_at < NOW() - make_interval(secs => %s)
+                """, (self.ttl,))
+            if cursor.rowcount:
+                logger.info(f"清理过期幂等键 {cursor.rowcount} 条")
+        except Exception as e:
+            logger.warning(f"清理过期幂等键失败: {str(e)}")
+
+
+idempotency_store = IdempotencyStore()
+
+
+@contextmanager
+def transaction():
+    """视图的写事务
+
+    带幂等键的请求中返回装饰器开启的事务连接（由装饰器统一提交或回滚），
+    否则与 db.begin() 相同
+    """
+    conn = g.get('_idempotent_conn')
+    if conn is not None:
+        yield conn
+        return
+    with db.begin() as conn:
+        yield conn
+
+
+def after_commit(callback):
+    """事务提交后再执行的进程内副作用（更新缓存、排行计数等）；没有幂等事务时立即执行"""
+    callbacks = g.get('_idempotent_after_commit')
+    if callbacks is None:
+        callback()
+    else:
+        callbacks.append(callback)
+
+
+def _replay(status_code, body):
+    response = Response(body, status=status_code, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _saved_response(record, request_hash):
+    saved_hash, status_code, body = record
+    if saved_hash != request_hash:
+        return jsonify({'success': False, 'message': f'{IDEMPOTENCY_HEADER} 已用于其他请求'}), 422
+    idempotency_store.replays += 1
+    return _replay(status_code, body)
+
+
+def _lock_not_available(error):
+    return getattr(getattr(error, 'orig', None), 'pgcode', None) == _LOCK_NOT_AVAILABLE
+
+
+def idempotent(view):
+    """视图装饰器（放在 jwt_required 之后）：请求带 Idempotency-Key 时按键去重，不带时照常执行
+
+    视图的写操作须通过 transaction() 获取连接，提交后的副作用通过 after_commit() 注册
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'success': False, 'message': f'{IDEMPOTENCY_HEADER} 过长'}), 400
+
+        from flask_jwt_extended import get_jwt_identity
+
+        user_id = int(get_jwt_identity())
+        # 同一个键只能用于同一个请求：方法、路径和请求体都参与摘要
+        digest = hashlib.sha1(f'{request.method} {request.path}\n'.encode('utf-8'))
+        digest.update(request.get_data())
+        request_hash = digest.hexdigest()
+
+        cached = idempotency_store.cached(user_id, key)
+        if cached is not None:
+            return _saved_response(cached, request_hash)
+
+        idempotency_store.maybe_purge()
+        callbacks = []
+        try:
+            conn = db.connect()
+        except Exception as e:
+            logger.error(f"幂等请求获取连接失败: {str(e)}")
+            return jsonify({'success': False, 'message': '请求处理失败'}), 500
+        try:
+            trans = conn.begin()
+            record = idempotency_store.claim(conn, user_id, key, request_hash)
+            if record is not None:
+                trans.rollback()
+                return _saved_response(record, request_hash)
+
+            g._idempotent_conn = conn
+            g._idempotent_after_commit = callbacks
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            finally:
+                g.pop('_idempotent_conn', None)
+                g.pop('_idempotent_after_commit', None)
+
+            if response.status_code >= 500:
+                # 回滚视图的写操作和占位，客户端可以用同一个键重试
+                trans.rollback()
+                return response
+
+            body = response.get_data(as_text=True)
+            idempotency_store.complete(conn, user_id, key, response.status_code, body)
+            trans.commit()
+        except Exception as e:
+            if _lock_not_available(e):
+                return jsonify({'success': False, 'message': '相同请求正在处理中'}), 409
+            logger.error(f"幂等请求处理失败: {str(e)}")
+            return jsonify({'success': False, 'message': '请求处理失败'}), 500
+        finally:
+            conn.close()
+
+        idempotency_store.remember(user_id, key, request_hash, response.status_code, body)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"提交后回调执行失败: {str(e)}")
+        return response
+
+    return wrapper
@@ -0,0 +1,97 @@
+# app/sevices/identity.py
+"""
+JWT 身份解析：进程内用户缓存，避免每个请求重复查询 users 表
+
+会员等级等可变资料不写入令牌，一律经 get_current_user() 读取本缓存
+"""
+import os
+import time
+import threading
+import logging
+from app.extentions.db_postgres import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+IDENTITY_CACHE_TTL = int(os.getenv('IDENTITY_CACHE_TTL', 60))
+IDENTITY_CACHE_MAX_SIZE = int(os.getenv('IDENTITY_CACHE_MAX_SIZE', 10000))
+
+
+class UserRecord:
+    """缓存中的精简用户记录"""
+    __slots__ = ('id', 'username', 'membership_level', 'created_at', 'expires_at')
+
+    def __init__(self, id, username, membership_level, created_at, expires_at):
+        self.id = id
+        self.username = username
+        self.membership_level = membership_level
+        self.created_at = created_at
+        self.expires_at = expires_at
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'membership_level': self.membership_level,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class IdentityCache:
+    """按用户 ID 缓存 UserRecord，过期或显式失效后重新加载"""
+
+    def __init__(self, ttl=IDENTITY_CACHE_TTL, max_size=IDENTITY_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        record = self._records.get(user_id)
+        if record is not None and record.expires_at > time.monotonic():
+            return record
+
+        record = self._load(user_id)
+        with self._lock:
+            if record is None:
+                self._records.pop(user_id, None)
+                return None
+            if len(self._records) >= self.max_size:
+                self._evict_expired()
+            self._records[user_id] = record
+        return record
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._records.pop(int(user_id), None)
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for user_id in [uid for uid, rec in self._records.items() if rec.expires_at <= now]:
+            del self._records[user_id]
+        # 仍然超限时清空，重新按需加载
+        if len(self._records) >= self.max_size:
+            self._records.clear()
+
+    def _load(self, user_id):
+        conn = get_db_connection()
+        if not conn:
+            raise ConnectionError('数据库连接失败')
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, username, membership_level, created_at FROM users WHERE id = %s
+        """, (user_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return UserRecord(*row, expires_at=time.monotonic() + self.ttl)
+
+
+identity_cache = IdentityCache()
+
+
+def get_user_record(user_id):
+    """获取用户记录（优先读缓存）"""
+    try:
+        return identity_cache.get(int(user_id))
+    except (TypeError, ValueError):
+        return None
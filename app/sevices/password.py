@@ -0,0 +1,145 @@
+# app/sevices/password.py
+"""
+密码哈希：在独立的进程池中计算 bcrypt，避免阻塞请求线程
+
+- 进程数默认等于 CPU 核数，排队数量有上限，超出时抛出 HashingBusy（接口返回 429）；
+  等待超时的任务仍在进程池中执行，直到它真正结束才让出名额
+- bcrypt 只使用前 72 字节：新密码超过该长度时抛出 PasswordTooLong（接口返回 400），
+  校验时按 72 字节截断，与旧版 bcrypt 静默截断生成的哈希保持一致
+- 哈希成本（bcrypt rounds）可配置；登录时若发现旧算法或旧成本，验证通过后透明重新哈希
+- 兼容早期 werkzeug 生成的 pbkdf2 / scrypt 哈希
+"""
+import os
+import time
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASH_ROUNDS = int(os.getenv('PASSWORD_HASH_ROUNDS', 12))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', PASSWORD_HASH_WORKERS * 4))
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+PASSWORD_HASH_START_METHOD = os.getenv('PASSWORD_HASH_START_METHOD', 'forkserver')
+
+BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
+BCRYPT_MAX_BYTES = 72
+
+
+class HashingBusy(Exception):
+    """哈希队列已满"""
+
+
+class PasswordTooLong(ValueError):
+    """密码超过 bcrypt 可用的 72 字节"""
+
+
+def _hash_password(password, rounds):
+    import bcrypt
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('ascii')
+
+
+def _verify_password(password, password_hash):
+    if password_hash.startswith(BCRYPT_PREFIXES):
+        import bcrypt
+        return bcrypt.checkpw(password.encode('utf-8')[:BCRYPT_MAX_BYTES], password_hash.encode('ascii'))
+    from werkzeug.security import check_password_hash
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    """带背压的密码哈希执行器"""
+
+    def __init__(self, rounds=PASSWORD_HASH_ROUNDS, workers=PASSWORD_HASH_WORKERS,
+                 queue_size=PASSWORD_HASH_QUEUE_SIZE, timeout=PASSWORD_HASH_TIMEOUT):
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._executor = None
+        self._executor_pid = None
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def _get_executor(self):
+        # 进程池不能跨 fork 复用，每个 worker 进程各自创建
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context(PASSWORD_HASH_START_METHOD)
+                    )
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HashingBusy('密码哈希队列已满')
+
+        started = time.perf_counter()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._finish(started)
+            raise
+        # 名额在任务真正结束时归还：调用方等待超时后任务仍占用一个哈希进程
+        future.add_done_callback(lambda _: self._finish(started))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise HashingBusy('密码哈希超时')
+
+    def _finish(self, started):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+            self._latency_total += elapsed
+            self._latency_max = max(self._latency_max, elapsed)
+        self._slots.release()
+
+    def hash(self, password):
+        if len(password.encode('utf-8')) > BCRYPT_MAX_BYTES:
+            raise PasswordTooLong(f'密码不能超过 {BCRYPT_MAX_BYTES} 字节')
+        return self._run(_hash_password, password, self.rounds)
+
+    def verify(self, password, password_hash):
+        return self._run(_verify_password, password, password_hash)
+
+    def needs_rehash(self, password_hash):
+        """哈希算法或成本与当前配置不一致时需要重新哈希"""
+        if not password_hash.startswith(BCRYPT_PREFIXES):
+            return True
+        try:
+            return int(password_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def stats(self):
+        with self._lock:
+            completed = self._completed
+            return {
+                'workers': self.workers,
+                'rounds': self.rounds,
+                'queue_capacity': self.queue_size,
+                'in_flight': self._in_flight,
+                'completed': completed,
+                'rejected': self._rejected,
+                'latency_avg_ms': round(self._latency_total / completed * 1000, 2) if completed else 0.0,
+                'latency_max_ms': round(self._latency_max * 1000, 2)
+            }
+
+
+password_hasher = PasswordHasher()
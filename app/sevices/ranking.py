@@ -0,0 +1,236 @@
+# app/sevices/ranking.py
+"""
+热门（trending）与畅销（bestseller）排行
+
+- 热门榜：浏览和支付都计分（支付权重更高），半衰期默认 6 小时
+- 畅销榜：只统计已支付订单，半衰期默认 30 天
+- 浏览只在返回完整内容（200）时计数，同一访客对同一内容在 RANKING_VIEW_DEDUP_TTL 内只计一次
+- 退款等使已支付订单失效的变更，按该笔销售衰减到当前的权重扣回，得分不低于 0
+- 事件先在进程内累加，后台线程定期合并写入 content_rankings
+  （写入时先把旧得分衰减到当前时刻再累加），多个 worker 的事件在数据库中汇总
+- 合并后按类型各取 top-K 放在内存中，全部类型的榜单由各类型的 top-K 归并得到；
+  列表接口读取榜单只是一次字典查找，不查询数据库
+"""
+import os
+import math
+import time
+import heapq
+import threading
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from app.extentions.db_postgres import db
+from app.extentions.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+RANKING_TOP_K = int(os.getenv('RANKING_TOP_K', 200))
+RANKING_REFRESH_INTERVAL = int(os.getenv('RANKING_REFRESH_INTERVAL', 30))
+TRENDING_HALF_LIFE = float(os.getenv('TRENDING_HALF_LIFE_HOURS', 6)) * 3600
+BESTSELLER_HALF_LIFE = float(os.getenv('BESTSELLER_HALF_LIFE_DAYS', 30)) * 86400
+TRENDING_VIEW_WEIGHT = float(os.getenv('TRENDING_VIEW_WEIGHT', 1))
+TRENDING_PAID_WEIGHT = float(os.getenv('TRENDING_PAID_WEIGHT', 10))
+RANKING_VIEW_DEDUP_TTL = int(os.getenv('RANKING_VIEW_DEDUP_TTL', 1800))
+RANKING_VIEW_DEDUP_SIZE = int(os.getenv('RANKING_VIEW_DEDUP_SIZE', 100000))
+# 衰减到该值以下的得分不再参与排行，并从表中清理
+MIN_SCORE = 0.01
+
+# 榜单 -> 半衰期（秒）
+BOARDS = {
+    'trending': TRENDING_HALF_LIFE,
+    'bestseller': BESTSELLER_HALF_LIFE,
+}
+
+
+def _decay(age, half_life):
+    return math.exp(-math.log(2) * age / half_life)
+
+
+def _aware(value):
+    # 管理后台模型中的 payment_time 可能不带时区，按 UTC 处理
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class Rankings:
+    """按榜单、类型缓存的 top-K 内容 ID"""
+
+    def __init__(self, top_k=RANKING_TOP_K, interval=RANKING_REFRESH_INTERVAL):
+        self.top_k = top_k
+        self.interval = interval
+        self.refreshed_at = None
+        # board -> content_id -> 待写入的得分增量
+        self._pending = defaultdict(lambda: defaultdict(float))
+        # board -> content_type（'' 表示全部类型） -> 按得分降序的内容 ID
+        self._boards = {board: {} for board in BOARDS}
+        self._lock = threading.Lock()
+        self._worker_pid = None
+        # (访客, content_id) -> 已计数，用于浏览去重
+        self._recent_views = LRUCache(max_size=RANKING_VIEW_DEDUP_SIZE, default_ttl=RANKING_VIEW_DEDUP_TTL)
+
+    # ---------- 事件 ----------
+
+    def record_view(self, content_id, viewer):
+        """记录一次浏览；viewer 标识访客（用户令牌或 IP），去重窗口内重复浏览不计分"""
+        key = (hash(viewer), content_id)
+        if self._recent_views.get(key):
+            return
+        self._recent_views.set(key, True)
+        self.ensure_worker()
+        with self._lock:
+            self._pending['trending'][content_id] += TRENDING_VIEW_WEIGHT
+
+    def record_paid(self, content_id):
+        self.ensure_worker()
+        with self._lock:
+            self._pending['trending'][content_id] += TRENDING_PAID_WEIGHT
+            self._pending['bestseller'][content_id] += 1
+
+    def record_refund(self, content_id, paid_at=None):
+        """已支付订单退款 / 取消：扣回该笔销售计入的得分（按支付时间衰减到当前）"""
+        age = max((datetime.now(timezone.utc) - _aware(paid_at)).total_seconds(), 0) if paid_at else 0
+        self.ensure_worker()
+        with self._lock:
+            self._pending['trending'][content_id] -= TRENDING_PAID_WEIGHT * _decay(age, TRENDING_HALF_LIFE)
+            self._pending['bestseller'][content_id] -= _decay(age, BESTSELLER_HALF_LIFE)
+
+    # ---------- 读取 ----------
+
+    def top(self, board, content_type=''):
+        """榜单上按得分降序的内容 ID 元组"""
+        self.ensure_worker()
+        return self._boards[board].get(content_type or '', ())
+
+    def stats(self):
+        return {
+            'pending_events': sum(len(scores) for scores in self._pending.values()),
+            'ranked': sum(len(self._boards[board].get('', ())) for board in BOARDS)
+        }
+
+    # ---------- 合并与刷新 ----------
+
+    def flush(self, conn):
+        """把进程内累计的得分增量合并写入 content_rankings"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: defaultdict(float))
+
+        cursor = conn.cursor()
+        try:
+            for board, scores in pending.items():
+                if not scores:
+                    continue
+                content_ids, deltas = zip(*sorted(scores.items()))
+                # 按 content_id 排序写入，避免多个 worker 同时合并时死锁
+                cursor.execute("""
+                    INSERT INTO content_rankings AS r (board, content_id, score)
+                    SELECT %s, d.content_id, d.delta
+                    FROM unnest(%s::int[], %s::float8[]) AS d(content_id, delta)
+                    JOIN contents c ON c.id = d.content_id
+                    ON CONFLICT (board, content_id) DO UPDATE SET
+                        score = GREATEST(
+                            r.score * exp(-%s * extract(epoch FROM NOW() - r.updated_at)) + EXCLUDED.score, 0
+                        ),
+                        updated_at = NOW()
+                """, (board, list(content_ids), list(deltas), math.log(2) / BOARDS[board]))
+                # 退款扣减后不再为正的得分（包括没有旧得分的扣减）直接删除
+                cursor.execute("""
+                    DELETE FROM content_rankings WHERE board = %s AND content_id = ANY(%s) AND score <= 0
+                """, (board, list(content_ids)))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            # 写入失败时把增量放回，下一轮重试
+            with self._lock:
+                for board, scores in pending.items():
+                    for content_id, delta in scores.items():
+                        self._pending[board][content_id] += delta
+            raise
+        finally:
+            cursor.close()
+
+    def refresh(self, conn):
+        """按当前时刻的衰减得分重新计算各类型 top-K"""
+        cursor = conn.cursor()
+        try:
+            for board, half_life in BOARDS.items():
+                cursor.execute("""
+                    SELECT type, content_id, current FROM (
+                        SELECT c.type, r.content_id, s.current,
+                               row_number() OVER (PARTITION BY c.type ORDER BY s.current DESC, r.content_id DESC) AS rn
+                        FROM content_rankings r
+                        JOIN contents c ON c.id = r.content_id
+                        CROSS JOIN LATERAL (
+                            SELECT r.score * exp(-%s * extract(epoch FROM NOW() - r.updated_at)) AS current
+                        ) s
+                        WHERE r.board = %s
+                    ) ranked
+                    WHERE current >= %s AND rn <= %s
+                """, (math.log(2) / half_life, board, MIN_SCORE, self.top_k))
+
+                by_type = defaultdict(list)
+                for content_type, content_id, current in cursor.fetchall():
+                    by_type[content_type].append((current, content_id))
+
+                # 各类型的 top-K 包含了全部类型 top-K 的所有成员，归并即可得到总榜
+                boards = {
+                    content_type: tuple(content_id for _, content_id in sorted(items, reverse=True))
+                    for content_type, items in by_type.items()
+                }
+                boards[''] = tuple(
+                    content_id for _, content_id in heapq.nlargest(
+                        self.top_k, (item for items in by_type.values() for item in items)
+                    )
+                )
+                self._boards[board] = boards
+
+            self._prune(cursor)
+            conn.commit()
+            self.refreshed_at = time.time()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def _prune(self, cursor):
+        for board, half_life in BOARDS.items():
+            cursor.execute("""
+                DELETE FROM content_rankings
+                WHERE board = %s AND score * exp(-%s * extract(epoch FROM NOW() - updated_at)) < %s
+            """, (board, math.log(2) / half_life, MIN_SCORE))
+
+    def sync(self):
+        """合并本进程的事件并刷新榜单，返回是否成功"""
+        try:
+            # 使用独立连接，不占用当前请求借出的连接
+            conn = db.raw_connection()
+        except Exception as e:
+            logger.error(f"刷新排行失败: {str(e)}")
+            return False
+        try:
+            self.flush(conn)
+            self.refresh(conn)
+            return True
+        except Exception as e:
+            logger.error(f"刷新排行失败: {str(e)}")
+            return False
+        finally:
+            conn.close()
+
+    def _sync_loop(self):
+        while True:
+            self.sync()
+            time.sleep(self.interval)
+
+    def ensure_worker(self):
+        """在当前进程中启动定时合并线程（fork 后的子进程会各自启动）"""
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid != os.getpid():
+                # fork 前未写入的事件属于父进程，子进程不重复写入
+                self._pending = defaultdict(lambda: defaultdict(float))
+                threading.Thread(target=self._sync_loop, name='ranking-sync', daemon=True).start()
+                self._worker_pid = os.getpid()
+
+
+rankings = Rankings()
@@ -0,0 +1,239 @@
+# app/sevices/revocation.py
+"""
+令牌吊销存储
+
+- SQLite 文件（WAL 模式）保存已吊销的 jti 及其过期时间，所有 worker 进程共享
+- 布隆过滤器放在 mmap 共享文件中，绝大多数未吊销令牌无需查询 SQLite
+- 过期记录定期清理，并据此重建布隆过滤器，占用只与未过期令牌数量相关
+
+布隆过滤器文件头部是一个序列号（seqlock）：重建期间为奇数，
+读方在重建期间或前后序列号不一致时直接回退到 SQLite 查询，保证不会漏判
+
+SQLite 是唯一的权威记录：过滤器文件缺失（被删除、临时目录被清理）或大小与配置不符时，
+按 revoked_tokens 重新生成（写临时文件后原子替换），不会以全零的过滤器放行已吊销的令牌
+"""
+import os
+import mmap
+import time
+import struct
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_DB_PATH = os.getenv(
+    'TOKEN_REVOCATION_DB', os.path.join(tempfile.gettempdir(), 'honghuang_revoked_tokens.db')
+)
+# 默认 8M 位（1MB），约 50 万个未过期吊销令牌时误判率约 1%
+BLOOM_BITS = int(os.getenv('TOKEN_REVOCATION_BLOOM_BITS', 1 << 23))
+BLOOM_HASHES = int(os.getenv('TOKEN_REVOCATION_BLOOM_HASHES', 7))
+PURGE_INTERVAL = int(os.getenv('TOKEN_REVOCATION_PURGE_INTERVAL', 600))
+
+_HEADER = struct.Struct('<Q')
+
+
+class RevocationStore:
+    """跨进程共享的令牌吊销存储"""
+
+    def __init__(self, path=REVOCATION_DB_PATH, bloom_bits=BLOOM_BITS, bloom_hashes=BLOOM_HASHES):
+        self.path = path
+        self.bloom_path = path + '.bloom'
+        self.bloom_bits = bloom_bits
+        self.bloom_hashes = bloom_hashes
+        self._local = threading.local()
+        self._bloom = None
+        self._bloom_pid = None
+        self._bloom_inode = None
+        self._bloom_lock = threading.Lock()
+        self._next_purge = 0
+
+    # ---------- 存储 ----------
+
+    def _db(self):
+        conn = getattr(self._local, 'conn', None)
+        # fork 之后不能复用父进程的连接
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS revoked_tokens (
+                    jti TEXT PRIMARY KEY,
+                    expires_at INTEGER NOT NULL
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at ON revoked_tokens(expires_at)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _bloom_map(self):
+        if self._bloom is not None and self._bloom_pid == os.getpid() and self._bloom_current():
+            return self._bloom
+        size = _HEADER.size + self.bloom_bits // 8
+        # 生成文件要取 SQLite 写锁，不能在持有 _bloom_lock 时进行（revoke 是先取写锁再映射）
+        if not self._bloom_file_ok(size):
+            self._create_bloom_file(size)
+        with self._bloom_lock:
+            if self._bloom is None or self._bloom_pid != os.getpid() or not self._bloom_current():
+                fd = os.open(self.bloom_path, os.O_RDWR)
+                try:
+                    stat = os.fstat(fd)
+                    self._bloom = mmap.mmap(fd, size)
+                finally:
+                    os.close(fd)
+                self._bloom_inode = (stat.st_dev, stat.st_ino)
+                self._bloom_pid = os.getpid()
+        return self._bloom
+
+    def _bloom_current(self):
+        # 文件被删除或被其他进程重建替换后，旧映射不再与其他进程共享，须重新映射
+        try:
+            stat = os.stat(self.bloom_path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_dev, stat.st_ino) == self._bloom_inode
+
+    def _bloom_file_ok(self, size):
+        # 大小不符（bloom_bits 配置变更）时位置计算不同，必须重建
+        try:
+            return os.path.getsize(self.bloom_path) == size
+        except FileNotFoundError:
+            return False
+
+    def _create_bloom_file(self, size):
+        """按 SQLite 中未过期的吊销记录生成过滤器文件"""
+        conn = self._db()
+        # 与 revoke / purge 使用同一把写锁：生成期间不会有新的吊销漏写进旧文件；
+        # 在 revoke / purge 中调用时已持有该锁
+        owns_lock = not conn.in_transaction
+        if owns_lock:
+            conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 等锁期间其他进程可能已经生成
+            if not self._bloom_file_ok(size):
+                bloom = bytearray(size)
+                live = self._live_jtis(conn)
+                self._fill_bits(bloom, live)
+                tmp_path = f'{self.bloom_path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(bloom)
+                os.chmod(tmp_path, 0o600)
+                os.replace(tmp_path, self.bloom_path)
+                logger.info(f"令牌吊销布隆过滤器已按 {len(live)} 条记录重建")
+            if owns_lock:
+                conn.execute("COMMIT")
+        except Exception:
+            if owns_lock:
+                conn.execute("ROLLBACK")
+            raise
+
+    # ---------- 布隆过滤器 ----------
+
+    def _positions(self, jti):
+        digest = hashlib.blake2b(jti.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bloom_bits for i in range(self.bloom_hashes)]
+
+    def _set_bits(self, bloom, jti):
+        for pos in self._positions(jti):
+            offset = _HEADER.size + (pos >> 3)
+            bloom[offset] = bloom[offset] | (1 << (pos & 7))
+
+    def _fill_bits(self, bloom, jtis):
+        """清空位图（不含头部）后按 jtis 重新置位"""
+        bloom[_HEADER.size:] = bytes(len(bloom) - _HEADER.size)
+        for jti in jtis:
+            self._set_bits(bloom, jti)
+
+    @staticmethod
+    def _live_jtis(conn):
+        return [row[0] for row in conn.execute(
+            "SELECT jti FROM revoked_tokens WHERE expires_at > ?", (int(time.time()),)
+        )]
+
+    def _might_contain(self, jti):
+        """返回 False 表示一定未吊销；None 表示过滤器正在重建，需查库"""
+        bloom = self._bloom_map()
+        seq = _HEADER.unpack_from(bloom, 0)[0]
+        if seq & 1:
+            return None
+        hit = all(bloom[_HEADER.size + (pos >> 3)] & (1 << (pos & 7)) for pos in self._positions(jti))
+        if _HEADER.unpack_from(bloom, 0)[0] != seq:
+            return None
+        return hit
+
+    # ---------- 对外接口 ----------
+
+    def revoke(self, jti, expires_at):
+        """吊销令牌，expires_at 为令牌的 exp（Unix 时间戳）"""
+        conn = self._db()
+        # BEGIN IMMEDIATE 同时充当跨进程写锁，避免并发写位时互相覆盖；
+        # 持锁期间过滤器文件不会被替换，位一定写进当前文件
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)",
+                (jti, int(expires_at))
+            )
+            self._set_bits(self._bloom_map(), jti)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._maybe_purge()
+
+    def is_revoked(self, jti):
+        if self._might_contain(jti) is False:
+            return False
+        row = self._db().execute(
+            "SELECT 1 FROM revoked_tokens WHERE jti = ? AND expires_at > ?", (jti, int(time.time()))
+        ).fetchone()
+        self._maybe_purge()
+        return row is not None
+
+    def purge(self):
+        """删除已过期的记录并重建布隆过滤器"""
+        conn = self._db()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            bloom = self._bloom_map()
+            deleted = conn.execute(
+                "DELETE FROM revoked_tokens WHERE expires_at <= ?", (int(time.time()),)
+            ).rowcount
+            live = self._live_jtis(conn)
+
+            seq = _HEADER.unpack_from(bloom, 0)[0]
+            _HEADER.pack_into(bloom, 0, seq + 1 if seq % 2 == 0 else seq)
+            self._fill_bits(bloom, live)
+            _HEADER.pack_into(bloom, 0, (seq | 1) + 1)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        logger.info(f"令牌吊销记录清理完成: 删除 {deleted} 条，剩余 {len(live)} 条")
+        return deleted
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + PURGE_INTERVAL
+        try:
+            self.purge()
+        except Exception as e:
+            logger.error(f"清理令牌吊销记录失败: {str(e)}")
+
+    def stats(self):
+        return {
+            'revoked_tokens': self._db().execute("SELECT COUNT(*) FROM revoked_tokens").fetchone()[0],
+            'bloom_bits': self.bloom_bits,
+            'bloom_hashes': self.bloom_hashes
+        }
+
+
+revocation_store = RevocationStore()
@@ -0,0 +1,73 @@
+# app/sevices/search.py
+"""
+内容全文检索
+
+中文标题没有空格分词，这里把标题和描述切成单字和二元组（bigram）并带位置写入 tsvector，
+用表达式 GIN 索引检索：
+- 两个字以上的查询词拆成相邻二元组，全部命中即为候选（等价于子串匹配）
+- 单字查询精确匹配单字 lexeme
+- 标题权重 A、描述权重 B，按 ts_rank 排序；prefix 模式只返回标题以查询词开头的内容
+"""
+import re
+import logging
+from app.extentions.db_postgres import get_db_connection
+from app.utils.serializers import select_list, fetch_dicts
+
+logger = logging.getLogger(__name__)
+
+MAX_QUERY_LENGTH = 64
+# 检索结果列表不返回描述
+SEARCH_FIELDS = ('id', 'type', 'title', 'price', 'image_url', 'created_at')
+
+_TERM_SPLIT = re.compile(r'[^\w]+', re.UNICODE)
+
+
+def build_tsquery(query):
+    """把用户输入转换成 bigram tsquery 文本；输入中没有可检索字符时返回 None"""
+    lexemes = []
+    for term in _TERM_SPLIT.split(query.lower()):
+        term = term.replace('_', '')
+        if not term:
+            continue
+        if len(term) == 1:
+            lexemes.append(f"'{term}'")
+        else:
+            lexemes.extend(f"'{term[i:i + 2]}'" for i in range(len(term) - 1))
+    return ' & '.join(dict.fromkeys(lexemes)) or None
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_contents(query, content_type='', limit=20, prefix=False):
+    """检索内容，返回按相关度排序的结果列表"""
+    tsquery = build_tsquery(query[:MAX_QUERY_LENGTH])
+    if not tsquery:
+        return []
+
+    conn = get_db_connection()
+    if not conn:
+        raise ConnectionError('数据库连接失败')
+
+    conditions = ["content_search_vector(title, description) @@ q"]
+    params = [tsquery]
+    if content_type:
+        conditions.append("type = %s")
+        params.append(content_type)
+    if prefix:
+        conditions.append("title ILIKE %s")
+        params.append(_escape_like(query.strip()) + '%')
+    params.append(limit)
+
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT {select_list(SEARCH_FIELDS)},
+               ts_rank(content_search_vector(title, description), q) AS score
+        FROM contents, CAST(%s AS tsquery) AS q
+        WHERE {' AND '.join(conditions)}
+        ORDER BY score DESC, created_at DESC, id DESC
+        LIMIT %s
+    """, params)
+
+    return fetch_dicts(cursor)
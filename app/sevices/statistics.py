@@ -0,0 +1,112 @@
+# app/sevices/statistics.py
+"""
+管理后台统计快照
+
+所有汇总指标预先计算在物化视图 admin_stats_snapshot 中（单行），
+后台线程定期 REFRESH MATERIALIZED VIEW CONCURRENTLY，
+两个统计页面只读取这一行并展示快照时间
+"""
+import os
+import time
+import threading
+import logging
+from app.extentions.db_postgres import db, get_db_connection
+
+logger = logging.getLogger(__name__)
+
+STATS_REFRESH_INTERVAL = int(os.getenv('STATS_REFRESH_INTERVAL', 60))
+# 多个 worker 之间用 advisory lock 保证同一时刻只有一个进程在刷新
+STATS_REFRESH_LOCK_KEY = 0x68680001
+
+_refresher_pid = None
+_refresher_lock = threading.Lock()
+
+
+def refresh_snapshot(max_age=None):
+    """刷新统计快照
+
+    max_age 不为空时，只有快照早于 max_age 秒才真正刷新，
+    避免多个 worker 在同一周期内重复刷新
+    """
+    try:
+        # 使用独立连接，不占用当前请求借出的连接
+        conn = db.raw_connection()
+    except Exception as e:
+        logger.error(f"统计快照刷新失败: {str(e)}")
+        return False
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", (STATS_REFRESH_LOCK_KEY,))
+        if not cursor.fetchone()[0]:
+            conn.rollback()
+            return False
+
+        if max_age is not None:
+            cursor.execute("""
+                SELECT refreshed_at < NOW() - make_interval(secs => %s) FROM admin_stats_snapshot
+            """, (max_age,))
+            row = cursor.fetchone()
+            if row and not row[0]:
+                conn.rollback()
+                return False
+
+        started = time.perf_counter()
+        cursor.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY admin_stats_snapshot")
+        conn.commit()
+        logger.info(f"统计快照刷新完成，耗时 {(time.perf_counter() - started) * 1000:.1f}ms")
+        return True
+    except Exception as e:
+        logger.error(f"统计快照刷新失败: {str(e)}")
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+
+def _refresh_loop():
+    while True:
+        time.sleep(STATS_REFRESH_INTERVAL)
+        refresh_snapshot(max_age=STATS_REFRESH_INTERVAL)
+
+
+def ensure_refresher():
+    """在当前进程中启动定时刷新线程（fork 后的子进程会各自启动）"""
+    global _refresher_pid
+    if _refresher_pid == os.getpid():
+        return
+    with _refresher_lock:
+        if _refresher_pid != os.getpid():
+            threading.Thread(target=_refresh_loop, name='stats-refresher', daemon=True).start()
+            _refresher_pid = os.getpid()
+
+
+def get_stats_snapshot():
+    """读取最新的统计快照"""
+    ensure_refresher()
+    conn = get_db_connection()
+    if not conn:
+        raise ConnectionError('数据库连接失败')
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT total_users, vip_users, total_contents, total_orders, paid_orders,
+               revenue, content_stats, order_stats, refreshed_at
+        FROM admin_stats_snapshot
+    """)
+    row = cursor.fetchone()
+    if not row:
+        return {}
+
+    (total_users, vip_users, total_contents, total_orders, paid_orders,
+     revenue, content_stats, order_stats, refreshed_at) = row
+    return {
+        'total_users': total_users,
+        'vip_users': vip_users,
+        'total_contents': total_contents,
+        'total_orders': total_orders,
+        'paid_orders': paid_orders,
+        'revenue': float(revenue or 0),
+        'content_stats': content_stats or {},
+        'order_stats': order_stats or {},
+        'as_of': refreshed_at
+    }
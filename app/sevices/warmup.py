@@ -0,0 +1,67 @@
+# app/sevices/warmup.py
+"""
+worker 预热：在开始接收请求前填满连接池、构建权益索引、加载排行榜，并请求一遍热门内容列表页，
+让进程内缓存、懒加载模块和连接都就绪，避免新 worker 的前几个请求变慢
+
+由 gunicorn.conf.py 的 post_worker_init 调用；预热失败只记录日志，不影响 worker 启动
+"""
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'true').lower() == 'true'
+WARMUP_CONTENT_TYPES = [t for t in os.getenv('WARMUP_CONTENT_TYPES', 'novel,music,anime,wallpaper').split(',') if t]
+WARMUP_PAGES = int(os.getenv('WARMUP_PAGES', 1))
+
+
+def hot_content_paths():
+    """首页及各分类前几页（页码分页），以及各分类游标分页、热门排序的首屏"""
+    paths = []
+    for content_type in ['', *WARMUP_CONTENT_TYPES]:
+        prefix = f'/api/v1/content/api/content?type={content_type}'
+        paths.extend(f'{prefix}&page={page}' for page in range(1, WARMUP_PAGES + 1))
+        paths.append(f'{prefix}&after=')
+        paths.append(f'{prefix}&sort=trending')
+    return paths
+
+
+def warm_up(app):
+    """填充连接池并预取热门页面，返回耗时（毫秒）"""
+    if not WARMUP_ENABLED:
+        return 0.0
+
+    from app.extentions.db_postgres import fill_pool
+    from app.sevices.entitlements import entitlements
+    from app.sevices.ranking import rankings
+
+    started = time.perf_counter()
+    try:
+        connections = fill_pool()
+    except Exception as e:
+        logger.warning(f"预热连接池失败: {str(e)}")
+        connections = 0
+
+    owners = 0
+    try:
+        with app.app_context():
+            owners = entitlements.preload()
+    except Exception as e:
+        logger.warning(f"预热权益索引失败: {str(e)}")
+
+    # 排行榜在内存中，先加载一次，避免首批排序请求拿到空榜单
+    rankings.sync()
+
+    primed = 0
+    client = app.test_client()
+    for path in hot_content_paths():
+        try:
+            if client.get(path).status_code == 200:
+                primed += 1
+        except Exception as e:
+            logger.warning(f"预热 {path} 失败: {str(e)}")
+
+    elapsed = (time.perf_counter() - started) * 1000
+    logger.info(f"worker {os.getpid()} 预热完成: {connections} 个连接，{owners} 个用户的权益，{primed} 个页面，耗时 {elapsed:.1f}ms")
+    return elapsed
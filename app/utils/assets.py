@@ -0,0 +1,120 @@
+# app/utils/assets.py
+"""
+静态资源构建：内容指纹文件名 + 预压缩
+
+构建后的文件写入 static/dist/，例如 css/style.css ->
+dist/css/style.3f2a9c1b7e.css，并生成 .gz / .br 兄弟文件；
+映射关系保存在 dist/manifest.json，模板通过 asset_url() 引用
+"""
+import os
+import json
+import gzip
+import shutil
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+ASSET_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt')
+# 压缩收益太小的文件不生成压缩版本
+MIN_COMPRESS_SIZE = 512
+
+_manifest_cache = {}
+
+
+def _fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:10]
+
+
+def _compress(path, brotli=None):
+    """生成 .gz 和（传入 brotli 模块时）.br 兄弟文件"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return []
+
+    encodings = []
+    with open(path + '.gz', 'wb') as f:
+        # mtime=0 保证同样内容构建出同样的字节
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    encodings.append('gzip')
+
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+        encodings.append('br')
+    return encodings
+
+
+def build_assets(static_folder):
+    """构建指纹化、预压缩的静态资源，返回 manifest"""
+    dist_root = os.path.join(static_folder, DIST_DIR)
+    if os.path.isdir(dist_root):
+        shutil.rmtree(dist_root)
+
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        logger.warning("未安装 brotli，跳过 .br 文件生成")
+
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist_root]
+        for name in sorted(files):
+            if not name.endswith(ASSET_EXTENSIONS):
+                continue
+            source = os.path.join(root, name)
+            logical = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            stem, ext = os.path.splitext(logical)
+            built = f'{DIST_DIR}/{stem}.{_fingerprint(source)}{ext}'
+
+            target = os.path.join(static_folder, built)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+            manifest[logical] = {'path': built, 'encodings': _compress(target, brotli)}
+
+    with open(os.path.join(dist_root, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    _manifest_cache.pop(static_folder, None)
+    logger.info(f"静态资源构建完成，共 {len(manifest)} 个文件")
+    return manifest
+
+
+def load_manifest(static_folder):
+    """读取 manifest（每个进程只读一次）；未构建时返回空映射"""
+    if static_folder not in _manifest_cache:
+        path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+        try:
+            with open(path, encoding='utf-8') as f:
+                _manifest_cache[static_folder] = json.load(f)
+        except FileNotFoundError:
+            _manifest_cache[static_folder] = {}
+    return _manifest_cache[static_folder]
+
+
+def fingerprinted_paths(static_folder):
+    """所有指纹化文件 -> 可用压缩编码"""
+    return {item['path']: item['encodings'] for item in load_manifest(static_folder).values()}
+
+
+def init_app(app):
+    """注册模板函数 asset_url() 和构建命令 flask build-assets"""
+
+    @app.template_global()
+    def asset_url(filename):
+        item = load_manifest(app.static_folder).get(filename)
+        return f"/static/{item['path'] if item else filename}"
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """构建指纹化、预压缩的静态资源"""
+        manifest = build_assets(app.static_folder)
+        for logical, item in sorted(manifest.items()):
+            print(f"{logical} -> {item['path']} {' '.join(item['encodings'])}")
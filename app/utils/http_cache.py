@@ -0,0 +1,45 @@
+# app/utils/http_cache.py
+"""
+HTTP 条件请求：ETag / 304 以及按蓝图配置的 Cache-Control
+
+只使用 ETag 作为校验器：内容的 created_at 是发布时间，编辑、删除都不会改变它，
+据此生成的 Last-Modified 会让 If-Modified-Since 对已修改的内容返回 304。
+ETag 由行版本（xmin）计算，任何修改都会改变它
+"""
+import hashlib
+import json
+from flask import current_app, request, make_response
+from app.utils.serializers import json_response
+
+
+def compute_etag(*parts):
+    """由行版本等数据计算弱 ETag（不含引号和 W/ 前缀）"""
+    digest = hashlib.sha1(json.dumps(parts, default=str, separators=(',', ':')).encode('utf-8'))
+    return digest.hexdigest()[:20]
+
+
+def cache_entry(payload, etag):
+    """打包可缓存的响应：响应体 + 校验器，304 判断无需序列化响应体"""
+    return {'payload': payload, 'etag': etag}
+
+
+def _apply_validators(response, etag):
+    response.set_etag(etag, weak=True)
+    cache_control = current_app.config.get('CACHE_CONTROL', {}).get(request.blueprint)
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def _is_not_modified(etag):
+    # 不发送 Last-Modified，If-Modified-Since 一律忽略
+    return bool(request.if_none_match) and request.if_none_match.contains_weak(etag)
+
+
+def conditional_json(entry, status=200):
+    """根据请求头返回 304 或完整 JSON 响应"""
+    etag = entry['etag']
+    if request.method in ('GET', 'HEAD') and _is_not_modified(etag):
+        return _apply_validators(make_response('', 304), etag)
+
+    return _apply_validators(json_response(entry['payload'], status), etag)
@@ -0,0 +1,205 @@
+# app/utils/media.py
+"""
+媒体文件（音频 / 视频）的分段传输
+
+- Range / If-Range，单段返回 206，多段返回 multipart/byteranges，不可满足返回 416
+- 单段（含完整文件）交给服务器的 wsgi.file_wrapper，gunicorn 下走 sendfile 零拷贝
+- 多段及没有 file_wrapper 的服务器从缓存的文件描述符 os.pread 按需读取，
+  拖动进度条只读取请求的区间；pread 不依赖文件偏移，同一描述符可被多个线程共用
+"""
+import os
+import uuid
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+MEDIA_FD_CACHE_SIZE = int(os.getenv('MEDIA_FD_CACHE_SIZE', 64))
+MEDIA_CHUNK_SIZE = int(os.getenv('MEDIA_CHUNK_SIZE', 256 * 1024))
+# 多段请求的段数上限，超出时忽略 Range 返回完整文件（RFC 9110 允许）
+MAX_RANGES = 16
+
+
+class RangeNotSatisfiable(ValueError):
+    """请求的区间全部超出文件长度"""
+
+
+class OpenFile:
+    """缓存中的一个已打开文件，refs 为正在使用它的响应数"""
+
+    __slots__ = ('path', 'fd', 'size', 'mtime', 'identity', 'refs', 'evicted')
+
+    def __init__(self, path, fd, stat):
+        self.path = path
+        self.fd = fd
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.identity = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        self.refs = 0
+        self.evicted = False
+
+    @property
+    def etag(self):
+        return f'{self.identity[1]:x}-{self.identity[2]:x}'
+
+
+class FileHandleCache:
+    """热点文件的描述符 LRU 缓存
+
+    每次获取时 stat 一次，文件被替换（inode / 大小 / mtime 变化）则重新打开；
+    被淘汰的描述符等最后一个使用者释放后才关闭
+    """
+
+    def __init__(self, max_size=MEDIA_FD_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, path):
+        stat = os.stat(path)
+        identity = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            handle = self._files.get(path)
+            if handle is not None and handle.identity == identity:
+                self._files.move_to_end(path)
+                self.hits += 1
+                handle.refs += 1
+                return handle
+
+        fd = os.open(path, os.O_RDONLY)
+        new_handle = OpenFile(path, fd, stat)
+        new_handle.refs = 1
+        with self._lock:
+            self.misses += 1
+            stale = self._files.pop(path, None)
+            if stale is not None:
+                self._retire(stale)
+            self._files[path] = new_handle
+            while len(self._files) > self.max_size:
+                self._retire(self._files.popitem(last=False)[1])
+        return new_handle
+
+    def release(self, handle):
+        with self._lock:
+            handle.refs -= 1
+            if handle.evicted and handle.refs == 0:
+                os.close(handle.fd)
+
+    def _retire(self, handle):
+        handle.evicted = True
+        if handle.refs == 0:
+            os.close(handle.fd)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'open_files': len(self._files),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+def parse_ranges(header, size):
+    """解析 Range 头，返回按起点排序、合并后的 [(start, stop)]（stop 不含）
+
+    头格式不对或段数过多时返回 None（按完整文件处理）；
+    所有区间都超出文件长度时抛出 RangeNotSatisfiable
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+    specs = header[6:].split(',')
+    if len(specs) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for spec in specs:
+        first, sep, last = spec.strip().partition('-')
+        if not sep:
+            return None
+        try:
+            if not first:
+                # 后缀区间：最后 N 个字节
+                length = int(last)
+                if length <= 0:
+                    continue
+                start, stop = max(size - length, 0), size
+            else:
+                start = int(first)
+                stop = int(last) + 1 if last else max(size, start + 1)
+                if start < 0 or stop <= start:
+                    return None
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, min(stop, size)))
+
+    if not ranges:
+        raise RangeNotSatisfiable(header)
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, stop in ranges[1:]:
+        last_start, last_stop = merged[-1]
+        if start <= last_stop:
+            merged[-1] = (last_start, max(last_stop, stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+class FileRangeStream:
+    """用 pread 按块输出若干区间，parts 为 [(前缀字节, start, stop)] 加结尾字节
+
+    响应结束（或客户端断开）时由 WSGI 服务器调用 close() 释放描述符
+    """
+
+    def __init__(self, cache, handle, parts, trailer=b''):
+        self._cache = cache
+        self._handle = handle
+        self._parts = parts
+        self._trailer = trailer
+        self._closed = False
+
+    def __iter__(self):
+        fd = self._handle.fd
+        for prefix, start, stop in self._parts:
+            if prefix:
+                yield prefix
+            offset = start
+            while offset < stop:
+                chunk = os.pread(fd, min(MEDIA_CHUNK_SIZE, stop - offset), offset)
+                if not chunk:
+                    return
+                offset += len(chunk)
+                yield chunk
+        if self._trailer:
+            yield self._trailer
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._cache.release(self._handle)
+
+
+def multipart_parts(ranges, size, content_type):
+    """构造 multipart/byteranges 各段，返回 (boundary, parts, trailer, content_length)"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    length = 0
+    for start, stop in ranges:
+        prefix = (
+            f'\r\n--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n'
+        ).encode('ascii')
+        parts.append((prefix, start, stop))
+        length += len(prefix) + stop - start
+    trailer = f'\r\n--{boundary}--\r\n'.encode('ascii')
+    return boundary, parts, trailer, length + len(trailer)
+
+
+media_files = FileHandleCache()
@@ -0,0 +1,47 @@
+# app/utils/pagination.py
+"""
+分页工具：基于 (created_at, id) 或单独 id 的游标分页
+"""
+import base64
+import json
+from datetime import datetime
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析"""
+
+
+def encode_cursor(created_at, row_id):
+    """将 (created_at, id) 编码为不透明的游标字符串"""
+    payload = json.dumps([created_at.isoformat() if created_at else None, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """解析游标字符串，返回 (created_at, id)"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise InvalidCursor(f'无效的游标: {token}')
+
+
+def encode_id_cursor(row_id):
+    """将 id 编码为不透明的游标字符串"""
+    payload = json.dumps(row_id)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_id_cursor(token):
+    """解析 id 游标，返回 id；兼容旧的 (时间, id) 游标，只取其中的 id"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        value = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if isinstance(value, list):
+            value = value[1]
+        if isinstance(value, bool):
+            raise ValueError(value)
+        return int(value)
+    except Exception:
+        raise InvalidCursor(f'无效的游标: {token}')
@@ -0,0 +1,80 @@
+# app/utils/serializers.py
+"""
+查询投影与 JSON 序列化
+
+- 每个视图显式声明查询列，支持客户端通过 fields= 只取需要的列
+- 按列名构造行字典，不再按下标逐个拼装
+- 安装了 orjson 时使用 orjson 编码（原生支持 datetime），否则退回标准库
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CONTENT_FIELDS = ('id', 'type', 'title', 'description', 'price', 'image_url', 'created_at')
+ORDER_FIELDS = ('id', 'user_id', 'content_id', 'payment_status', 'payment_time', 'amount')
+
+
+class InvalidFields(ValueError):
+    """fields 参数包含不允许的列"""
+
+
+def parse_fields(raw, allowed, default=None):
+    """解析逗号分隔的 fields 参数，返回按 allowed 顺序排列的列名元组"""
+    if not raw:
+        return tuple(default or allowed)
+    requested = {field.strip() for field in raw.split(',') if field.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise InvalidFields(f"不支持的字段: {', '.join(sorted(unknown))}")
+    return tuple(field for field in allowed if field in requested)
+
+
+def select_list(fields, *required):
+    """生成 SELECT 列清单；列名均来自白名单，可以直接拼接"""
+    return ', '.join(dict.fromkeys((*fields, *required)))
+
+
+def rows_to_dicts(names, rows, fields=None):
+    """按列名把行元组转换为字典；fields 不为空时只保留这些列"""
+    if fields is None or list(fields) == list(names):
+        return [dict(zip(names, row)) for row in rows]
+    keep = [names.index(field) for field in fields]
+    return [{names[i]: row[i] for i in keep} for row in rows]
+
+
+def fetch_dicts(cursor, fields=None):
+    """读取结果集并转换为字典列表"""
+    names = [column[0] for column in cursor.description]
+    return rows_to_dicts(names, cursor.fetchall(), fields)
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'无法序列化类型: {type(value).__name__}')
+
+
+def dumps(payload):
+    """编码为 UTF-8 JSON 字节串"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_response(payload, status=200):
+    """直接返回编码后的 JSON 响应，绕过 jsonify 的逐层转换"""
+    return Response(dumps(payload), status=status, mimetype='application/json')
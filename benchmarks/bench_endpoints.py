@@ -0,0 +1,501 @@
+# benchmarks/bench_endpoints.py
+"""
+接口压测：content / user / order 蓝图及管理后台统计、导出页面
+
+1. 启动临时 PostgreSQL 集群（见 pg_fixture.py），或用 --external 连接 DB_* 环境变量指定的库
+2. 按 --users / --contents / --orders 用 generate_series 灌入数据（同一数据目录只灌一次）
+3. 在子进程中启动应用并挂载管理后台，先校验 ORM 查询和管理后台列表页可用，之后每个场景在每个并发度下先预热再计时，
+   记录吞吐、p50/p95/p99 延迟、错误数，以及 pg_stat_statements 统计的每请求查询数
+4. 结果写入 benchmarks/results/<git sha>.json，用 compare 子命令对比两次提交
+
+用法：
+    python benchmarks/bench_endpoints.py run --contents 1000000 --orders 10000000 \\
+        --pgdata /tmp/bench-pg --concurrency 1,8,32 --duration 15
+    python benchmarks/bench_endpoints.py compare results/<base>.json results/<head>.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import threading
+import subprocess
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+import psycopg2
+from pg_fixture import TempPostgres
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+BENCH_PASSWORD = 'bench123'
+CONTENT_TYPES = ('novel', 'music', 'anime', 'wallpaper')
+CHAR_POOL = '洪荒纪元开天辟地之音神话旋律传说魔录壁纸集韵典藏盘古女娲伏羲昆仑山海经上古龙凤麒麟玄黄混沌太极阴阳五行'
+# 登录后轮流使用的压测账号数（订单按幂分布生成，编号越小的账号订单越多）
+TOKEN_USERS = 8
+
+# 在子进程中启动应用并挂载管理后台；挂载失败时直接退出，不让管理后台场景被静默跳过
+SERVE_SNIPPET = """
+import sys
+from werkzeug.serving import run_simple
+from app.app import app
+from app.models import db as models_db
+from app.admin.admin import init_admin
+models_db.init_app(app)
+if init_admin(app, models_db) is None:
+    sys.exit('管理后台挂载失败')
+run_simple('127.0.0.1', int(sys.argv[1]), app, threaded=True)
+"""
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def git_sha():
+    try:
+        sha = subprocess.check_output(['git', 'rev-parse', '--short=12', 'HEAD'], cwd=ROOT, text=True).strip()
+        dirty = subprocess.run(['git', 'diff', '--quiet', 'HEAD'], cwd=ROOT).returncode != 0
+        return sha + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+# ==================== 灌数 ====================
+
+def seed(conn, users, contents, orders):
+    """灌入压测数据；bench_meta 中记录的数据量与本次一致时跳过"""
+    from app.sevices.password import _hash_password, PASSWORD_HASH_ROUNDS
+
+    volumes = {'users': users, 'contents': contents, 'orders': orders}
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE IF NOT EXISTS bench_meta (key TEXT PRIMARY KEY, value JSONB)")
+    cursor.execute("SELECT value FROM bench_meta WHERE key = 'volumes'")
+    row = cursor.fetchone()
+    if row and row[0] == volumes:
+        print(f"复用已灌入的数据: {volumes}")
+        return
+    if row:
+        raise SystemExit(f"数据目录中已有不同数据量 {row[0]}，请换一个 --pgdata")
+
+    started = time.perf_counter()
+    cursor.execute("SELECT setseed(0.42)")
+    # 所有压测账号共用同一个密码哈希，避免灌数阶段计算上万次 bcrypt
+    cursor.execute("""
+        INSERT INTO users (username, password_hash, membership_level)
+        SELECT 'bench_' || i, %s, CASE WHEN i %% 10 = 0 THEN 'vip' ELSE 'free' END
+        FROM generate_series(1, %s) AS i
+    """, (_hash_password(BENCH_PASSWORD, PASSWORD_HASH_ROUNDS), users))
+    cursor.execute("""
+        INSERT INTO contents (type, title, description, price, image_url, created_at)
+        SELECT
+            (%(types)s::text[])[1 + i %% 4],
+            substr(%(pool)s, 1 + (i * 7) %% 40, 4 + i %% 6) || ' 第' || i || '卷',
+            repeat(substr(%(pool)s, 1 + (i * 13) %% 30, 12), 1 + i %% 4),
+            round((random() * 50)::numeric, 1),
+            'https://example.com/static/' || i || '.jpg',
+            NOW() - make_interval(secs => i)
+        FROM generate_series(1, %(count)s) AS i
+    """, {'types': list(CONTENT_TYPES), 'pool': CHAR_POOL, 'count': contents})
+    cursor.execute("SELECT min(id), max(id) FROM users WHERE username LIKE 'bench\\_%'")
+    user_min, user_max = cursor.fetchone()
+    cursor.execute("SELECT min(id), max(id) FROM contents")
+    content_min, content_max = cursor.fetchone()
+    cursor.execute("""
+        INSERT INTO orders (user_id, content_id, payment_status, payment_time)
+        SELECT
+            %(user_min)s + floor(power(random(), 3) * (%(user_max)s - %(user_min)s + 1))::int,
+            %(content_min)s + floor(random() * (%(content_max)s - %(content_min)s + 1))::int,
+            (ARRAY['paid', 'paid', 'paid', 'pending', 'cancelled', 'refunded'])[1 + i %% 6],
+            NOW() - make_interval(secs => i)
+        FROM generate_series(1, %(count)s) AS i
+    """, {'user_min': user_min, 'user_max': user_max,
+          'content_min': content_min, 'content_max': content_max, 'count': orders})
+    cursor.execute("INSERT INTO bench_meta VALUES ('volumes', %s)", (json.dumps(volumes),))
+    conn.commit()
+
+    conn.autocommit = True
+    cursor.execute("VACUUM ANALYZE")
+    cursor.execute("REFRESH MATERIALIZED VIEW admin_stats_snapshot")
+    conn.autocommit = False
+    print(f"灌数完成 {volumes}，耗时 {time.perf_counter() - started:.1f}s")
+
+
+# ==================== 场景 ====================
+
+class Context:
+    """场景共享数据：登录令牌与 id 范围"""
+
+    def __init__(self, base_url, tokens, content_max):
+        self.base_url = base_url
+        self.tokens = tokens
+        self.content_max = content_max
+
+    def auth(self, rng):
+        return {'Authorization': f'Bearer {rng.choice(self.tokens)}'}
+
+
+def _content_list(ctx, rng):
+    params = {'limit': 20}
+    if rng.random() < 0.75:
+        params['type'] = rng.choice(CONTENT_TYPES)
+    return 'GET', '/api/v1/content/api/content', {'params': params}
+
+
+def _content_ranked(ctx, rng):
+    params = {'limit': 20, 'sort': rng.choice(('trending', 'bestseller'))}
+    if rng.random() < 0.75:
+        params['type'] = rng.choice(CONTENT_TYPES)
+    return 'GET', '/api/v1/content/api/content', {'params': params}
+
+
+def _content_detail(ctx, rng):
+    return 'GET', f'/api/v1/content/api/content/{rng.randint(1, ctx.content_max)}', {}
+
+
+def _content_search(ctx, rng):
+    term = ''.join(rng.choice(CHAR_POOL) for _ in range(rng.choice((1, 2, 2, 3))))
+    return 'GET', '/api/v1/content/api/content/search', {'params': {'q': term}}
+
+
+def _user_profile(ctx, rng):
+    return 'GET', '/api/v1/user/profile', {'headers': ctx.auth(rng)}
+
+
+def _user_login(ctx, rng):
+    body = {'username': f'bench_{rng.randint(1, TOKEN_USERS)}', 'password': BENCH_PASSWORD}
+    return 'POST', '/api/v1/user/user/login', {'json': body}
+
+
+def _order_list(ctx, rng):
+    return 'GET', '/api/v1/order/', {'headers': ctx.auth(rng)}
+
+
+def _order_stats(ctx, rng):
+    return 'GET', '/api/v1/order/stats', {'headers': ctx.auth(rng)}
+
+
+def _order_create(ctx, rng):
+    return 'POST', '/api/v1/order/', {'headers': ctx.auth(rng), 'json': {'content_id': rng.randint(1, ctx.content_max)}}
+
+
+def _admin_statistics(ctx, rng):
+    return 'GET', '/admin/statistics/', {'cookies': {'admin_logged_in': 'true'}}
+
+
+def _admin_export_orders(ctx, rng):
+    return 'GET', '/admin/export/export-orders/', {'cookies': {'admin_logged_in': 'true'}, 'stream': True}
+
+
+# 名称 -> (请求构造函数, 最大并发)；导出会读完整张订单表，只在低并发下测
+SCENARIOS = {
+    'content_list': (_content_list, None),
+    'content_ranked': (_content_ranked, None),
+    'content_detail': (_content_detail, None),
+    'content_search': (_content_search, None),
+    'user_profile': (_user_profile, None),
+    'user_login': (_user_login, None),
+    'order_list': (_order_list, None),
+    'order_stats': (_order_stats, None),
+    'order_create': (_order_create, None),
+    'admin_statistics': (_admin_statistics, None),
+    'admin_export_orders': (_admin_export_orders, 1),
+}
+
+
+def _send(session, ctx, build, rng):
+    method, path, kwargs = build(ctx, rng)
+    started = time.perf_counter()
+    response = session.request(method, ctx.base_url + path, timeout=600, **kwargs)
+    if kwargs.get('stream'):
+        for _ in response.iter_content(65536):
+            pass
+    return time.perf_counter() - started, response.status_code
+
+
+def run_level(ctx, build, concurrency, duration, warmup, seed_value, on_measure_start=None):
+    """固定并发下循环发请求，返回 (延迟列表, 状态码计数, 实际计时秒数)
+
+    on_measure_start 在预热结束、开始计时时调用（用于重置查询统计）
+    """
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + duration
+
+    def worker(index):
+        rng = random.Random(seed_value + index)
+        session = requests.Session()
+        local_latencies, local_statuses = [], {}
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            try:
+                elapsed, status = _send(session, ctx, build, rng)
+            except requests.RequestException:
+                elapsed, status = time.perf_counter() - now, 'error'
+            if now >= measure_from:
+                local_latencies.append(elapsed)
+                local_statuses[status] = local_statuses.get(status, 0) + 1
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    timer = threading.Timer(warmup, on_measure_start) if on_measure_start else None
+    if timer:
+        timer.start()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    if timer:
+        timer.join()
+    return latencies, statuses, duration
+
+
+def count_queries(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT COALESCE(sum(calls), 0) FROM pg_stat_statements
+        WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+          AND query NOT ILIKE '%pg_stat_statements%'
+    """)
+    return int(cursor.fetchone()[0])
+
+
+def reset_queries(conn):
+    conn.cursor().execute("SELECT pg_stat_statements_reset()")
+
+
+def summarize(latencies, statuses, duration, queries):
+    total = len(latencies)
+    errors = sum(count for status, count in statuses.items() if status == 'error' or status >= 500)
+    result = {
+        'requests': total,
+        'errors': errors,
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        'throughput_rps': round(total / duration, 2),
+        'queries_per_request': round(queries / total, 2) if total and queries is not None else None,
+    }
+    if latencies:
+        result.update({
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        })
+    return result
+
+
+# ==================== 子命令 ====================
+
+def start_server(port, server_cmd, env):
+    if server_cmd:
+        command = server_cmd.format(port=port, python=sys.executable).split()
+    else:
+        command = [sys.executable, '-c', SERVE_SNIPPET, str(port)]
+    log = open(os.path.join(RESULTS_DIR, 'server.log'), 'w')
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    base_url = f'http://127.0.0.1:{port}'
+    for _ in range(300):
+        if process.poll() is not None:
+            raise SystemExit(f"应用启动失败，见 {log.name}")
+        try:
+            requests.get(base_url + '/api/v1/content/api/content', params={'limit': 1}, timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("应用启动超时")
+
+
+def check_orm(base_url):
+    """计时前校验 ORM 与管理后台：进程内执行一次 ORM 查询，并加载各模型列表页，返回失败说明列表"""
+    from app import create_app
+    from app.models import db as models_db, User, Content, Order
+
+    failures = []
+    app = create_app()
+    models_db.init_app(app)
+    with app.app_context():
+        for model in (User, Content, Order):
+            try:
+                model.query.limit(1).all()
+            except Exception as e:
+                failures.append(f'ORM 查询 {model.__name__} 失败: {e}')
+    for path in ('/admin/user/', '/admin/content/', '/admin/order/'):
+        response = requests.get(base_url + path, cookies={'admin_logged_in': 'true'}, timeout=60)
+        if response.status_code != 200:
+            failures.append(f'{path} 返回 {response.status_code}')
+    return failures
+
+
+def login_tokens(base_url):
+    tokens = []
+    for i in range(1, TOKEN_USERS + 1):
+        response = requests.post(base_url + '/api/v1/user/user/login',
+                                 json={'username': f'bench_{i}', 'password': BENCH_PASSWORD}, timeout=30)
+        if response.ok:
+            tokens.append(response.json()['token'])
+    if not tokens:
+        raise SystemExit("压测账号登录失败")
+    return tokens
+
+
+def command_run(args):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    pg = None
+    if not args.external:
+        pg = TempPostgres(args.pgdata).start()
+        os.environ.update(pg.env)
+
+    server = None
+    try:
+        # DB_* 环境变量在导入时读取，必须先设置好
+        from app.extentions.db_postgres import DB_CONFIG
+        from app.migrations import migrate
+        conn = psycopg2.connect(**DB_CONFIG)
+        migrate(conn)
+        seed(conn, args.users, args.contents, args.orders)
+        try:
+            conn.autocommit = True
+            conn.cursor().execute("CREATE EXTENSION IF NOT EXISTS pg_stat_statements")
+            reset_queries(conn)
+            track_queries = True
+        except psycopg2.Error as e:
+            print(f"pg_stat_statements 不可用，不统计查询数: {e}")
+            conn.rollback()
+            track_queries = False
+
+        cursor = conn.cursor()
+        cursor.execute("SELECT max(id) FROM contents")
+        content_max = cursor.fetchone()[0]
+        cursor.execute("SHOW server_version")
+        pg_version = cursor.fetchone()[0]
+
+        server, base_url = start_server(args.port, args.server_cmd, dict(os.environ))
+        failures = check_orm(base_url)
+        if failures:
+            raise SystemExit('ORM / 管理后台校验失败:\n' + '\n'.join(failures))
+        ctx = Context(base_url, login_tokens(base_url), content_max)
+
+        selected = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+        levels = [int(level) for level in args.concurrency.split(',')]
+        results = {}
+        for name in selected:
+            build, max_concurrency = SCENARIOS[name]
+            method, path, kwargs = build(ctx, random.Random(0))
+            probe = requests.request(method, base_url + path, timeout=600, **kwargs)
+            if probe.status_code == 404 and name.startswith('admin_'):
+                # 自定义 --server-cmd 没有挂载管理后台
+                raise SystemExit(f"{name}: 管理后台未挂载，请挂载后重试或用 --scenarios 排除该场景")
+
+            results[name] = {}
+            for level in levels:
+                if max_concurrency and level > max_concurrency:
+                    continue
+                latencies, statuses, duration = run_level(
+                    ctx, build, level, args.duration, args.warmup, args.seed,
+                    on_measure_start=(lambda: reset_queries(conn)) if track_queries else None
+                )
+                queries = count_queries(conn) if track_queries else None
+                results[name][str(level)] = summary = summarize(latencies, statuses, duration, queries)
+                print(f"{name:22s} c={level:<4d} {summary['throughput_rps']:>9.1f} rps  "
+                      f"p50={summary.get('p50_ms', 0):.1f}ms p95={summary.get('p95_ms', 0):.1f}ms "
+                      f"p99={summary.get('p99_ms', 0):.1f}ms  q/req={summary['queries_per_request']}  "
+                      f"errors={summary['errors']}")
+
+        sha = git_sha()
+        report = {
+            'git_sha': sha,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'postgres': pg_version,
+            'volumes': {'users': args.users, 'contents': args.contents, 'orders': args.orders},
+            'duration_s': args.duration,
+            'warmup_s': args.warmup,
+            'server_cmd': args.server_cmd or 'werkzeug threaded',
+            'results': results,
+        }
+        output = args.output or os.path.join(RESULTS_DIR, f'{sha}.json')
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {output}")
+        conn.close()
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+        if pg:
+            pg.stop()
+
+
+def command_compare(args):
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.head, encoding='utf-8') as f:
+        head = json.load(f)
+    if base['volumes'] != head['volumes']:
+        print(f"警告：两次数据量不同 {base['volumes']} vs {head['volumes']}")
+
+    print(f"{base['git_sha']} -> {head['git_sha']}")
+    regressions = 0
+    for name, levels in head['results'].items():
+        for level, current in levels.items():
+            previous = base['results'].get(name, {}).get(level)
+            if not previous or 'p95_ms' not in previous or 'p95_ms' not in current:
+                continue
+            rps_delta = (current['throughput_rps'] / previous['throughput_rps'] - 1) * 100 \
+                if previous['throughput_rps'] else 0.0
+            p95_delta = (current['p95_ms'] / previous['p95_ms'] - 1) * 100 if previous['p95_ms'] else 0.0
+            regressed = p95_delta > args.threshold or rps_delta < -args.threshold
+            regressions += regressed
+            print(f"{'!' if regressed else ' '} {name:22s} c={level:<4s} "
+                  f"rps {previous['throughput_rps']:>9.1f} -> {current['throughput_rps']:>9.1f} ({rps_delta:+.1f}%)  "
+                  f"p95 {previous['p95_ms']:>8.1f} -> {current['p95_ms']:>8.1f}ms ({p95_delta:+.1f}%)  "
+                  f"q/req {previous.get('queries_per_request')} -> {current.get('queries_per_request')}")
+    if regressions:
+        print(f"{regressions} 项超过 {args.threshold}% 阈值")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='接口压测')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='灌数并压测')
+    run_parser.add_argument('--users', type=int, default=10000)
+    run_parser.add_argument('--contents', type=int, default=100000)
+    run_parser.add_argument('--orders', type=int, default=1000000)
+    run_parser.add_argument('--pgdata', help='保留并复用临时集群的数据目录')
+    run_parser.add_argument('--external', action='store_true', help='使用 DB_* 环境变量指定的数据库')
+    run_parser.add_argument('--concurrency', default='1,8,32')
+    run_parser.add_argument('--duration', type=float, default=10, help='每个并发度的计时秒数')
+    run_parser.add_argument('--warmup', type=float, default=2)
+    run_parser.add_argument('--scenarios', help='逗号分隔，默认全部：' + ','.join(SCENARIOS))
+    run_parser.add_argument('--port', type=int, default=5099)
+    run_parser.add_argument('--server-cmd', help='自定义启动命令，可用 {port} {python} 占位')
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--output')
+    run_parser.set_defaults(func=command_run)
+
+    compare_parser = subparsers.add_parser('compare', help='对比两次结果')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('head')
+    compare_parser.add_argument('--threshold', type=float, default=10, help='回退阈值（百分比）')
+    compare_parser.set_defaults(func=command_compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
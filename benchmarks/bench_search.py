@@ -0,0 +1,153 @@
+# benchmarks/bench_search.py
+"""
+内容检索基准：bigram GIN 索引 vs. ILIKE '%q%' 顺序扫描
+
+在临时表中生成指定数量的合成内容（不会修改 contents 表），
+分别用两种方式执行同一批查询词，输出 p50/p95/p99 延迟（毫秒）。
+计时前先校验检索结果：末尾字符能命中，标题命中排在描述命中之前，不满足时退出码为 1
+
+用法：
+    python benchmarks/bench_search.py --rows 200000 --runs 200
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import psycopg2
+from app.extentions.db_postgres import DB_CONFIG
+from app.sevices.search import build_tsquery
+from app.migrations.versions.v0009_content_search_grams import CREATE_SEARCH_FUNCTIONS_SQL
+
+CHAR_POOL = '洪荒纪元开天辟地之音神话旋律传说魔录壁纸集韵典藏盘古女娲伏羲昆仑山海经上古龙凤麒麟玄黄混沌太极阴阳五行'
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def seed(cursor, rows):
+    for sql in CREATE_SEARCH_FUNCTIONS_SQL:
+        cursor.execute(sql)
+    cursor.execute("""
+        CREATE TEMP TABLE bench_contents (
+            id SERIAL PRIMARY KEY,
+            type VARCHAR(20) NOT NULL,
+            title VARCHAR(200) NOT NULL,
+            description TEXT,
+            created_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO bench_contents (type, title, description, created_at)
+        SELECT
+            (ARRAY['novel', 'music', 'anime', 'wallpaper'])[1 + i % 4],
+            (SELECT string_agg(substr(%(pool)s, 1 + floor(random() * char_length(%(pool)s))::int, 1), '')
+             FROM generate_series(1, 6 + i % 8)),
+            (SELECT string_agg(substr(%(pool)s, 1 + floor(random() * char_length(%(pool)s))::int, 1), '')
+             FROM generate_series(1, 20 + i % 30)),
+            NOW() - make_interval(secs => i)
+        FROM generate_series(1, %(rows)s) AS i
+    """, {'pool': CHAR_POOL, 'rows': rows})
+    cursor.execute("""
+        CREATE INDEX ON bench_contents USING gin (content_search_vector(title, description))
+    """)
+    cursor.execute("ANALYZE bench_contents")
+
+
+# (查询词, 应命中的标题, 应排在其后的标题)；后者为 None 时只校验命中
+RELEVANCE_CASES = [
+    ('地', '开天辟地', None),
+    ('音', '神话 旋律之音 合集', None),
+    ('盘古', '盘古传说', '山海经异闻'),
+]
+
+
+def check_relevance(cursor):
+    """在临时表中校验检索语义，返回失败说明列表"""
+    cursor.execute("""
+        CREATE TEMP TABLE check_contents (id SERIAL PRIMARY KEY, title TEXT, description TEXT)
+    """)
+    cursor.execute("""
+        INSERT INTO check_contents (title, description) VALUES
+            ('开天辟地', '混沌初分'),
+            ('神话 旋律之音 合集', NULL),
+            ('山海经异闻', '其中记载了盘古的传说'),
+            ('盘古传说', '上古神话')
+    """)
+    failures = []
+    for term, expected, below in RELEVANCE_CASES:
+        cursor.execute("""
+            SELECT title FROM check_contents, CAST(%s AS tsquery) AS q
+            WHERE content_search_vector(title, description) @@ q
+            ORDER BY ts_rank(content_search_vector(title, description), q) DESC, id
+        """, (build_tsquery(term),))
+        titles = [row[0] for row in cursor.fetchall()]
+        if expected not in titles:
+            failures.append(f'{term!r} 未命中 {expected!r}: {titles}')
+        elif below is not None and (below not in titles or titles.index(expected) > titles.index(below)):
+            failures.append(f'{term!r} 的排序不符合预期（{expected!r} 应在 {below!r} 之前）: {titles}')
+    return failures
+
+
+def run(cursor, sql, params_list):
+    samples = []
+    for params in params_list:
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='内容检索基准')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    seed(cursor, args.rows)
+
+    failures = check_relevance(cursor)
+    if failures:
+        print('\n'.join(failures), file=sys.stderr)
+        conn.rollback()
+        sys.exit(1)
+
+    random.seed(42)
+    terms = [''.join(random.choice(CHAR_POOL) for _ in range(random.choice((1, 2, 2, 3, 4))))
+             for _ in range(args.runs)]
+
+    bigram = run(cursor, """
+        SELECT id, ts_rank(content_search_vector(title, description), q) AS score
+        FROM bench_contents, CAST(%s AS tsquery) AS q
+        WHERE content_search_vector(title, description) @@ q
+        ORDER BY score DESC, created_at DESC, id DESC
+        LIMIT 20
+    """, [(build_tsquery(term),) for term in terms])
+
+    ilike = run(cursor, """
+        SELECT id FROM bench_contents
+        WHERE title ILIKE %s OR description ILIKE %s
+        ORDER BY created_at DESC, id DESC
+        LIMIT 20
+    """, [(f'%{term}%', f'%{term}%') for term in terms])
+
+    print(json.dumps({'rows': args.rows, 'runs': args.runs, 'bigram_gin': bigram, 'ilike': ilike}, indent=2))
+    conn.rollback()
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
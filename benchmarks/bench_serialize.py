@@ -0,0 +1,77 @@
+# benchmarks/bench_serialize.py
+"""
+行序列化微基准：每行编码耗时（微秒）
+
+- before：按下标拼装字典 + isoformat + 标准库 json（jsonify 的实现方式）
+- after：按列名 zip 成字典 + app.utils.serializers.dumps（有 orjson 时使用 orjson）
+- after (fields)：fields=id,title,price,image_url 投影后的编码耗时
+
+用法：
+    python benchmarks/bench_serialize.py --rows 1000 --repeat 200
+"""
+import os
+import sys
+import json
+import timeit
+import argparse
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.utils.serializers import CONTENT_FIELDS, rows_to_dicts, dumps, orjson
+
+
+def make_rows(count):
+    now = datetime.now(timezone.utc)
+    return [
+        (i, 'novel', f'洪荒纪元：开天辟地 第{i}卷', '讲述盘古开天辟地的传说故事' * 4, 29.9,
+         f'https://example.com/static/{i}.jpg', now)
+        for i in range(count)
+    ]
+
+
+def before(rows):
+    content_list = []
+    for content in rows:
+        content_list.append({
+            'id': content[0],
+            'type': content[1],
+            'title': content[2],
+            'description': content[3],
+            'price': content[4],
+            'image_url': content[5],
+            'created_at': content[6].isoformat() if content[6] else None
+        })
+    return json.dumps({'success': True, 'data': content_list}).encode('utf-8')
+
+
+def after(rows, fields=None):
+    return dumps({'success': True, 'data': rows_to_dicts(CONTENT_FIELDS, rows, fields)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='行序列化微基准')
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    projected = ('id', 'title', 'price', 'image_url')
+    projected_rows = [(row[0], row[2], row[4], row[5]) for row in rows]
+
+    results = {
+        'encoder': 'orjson' if orjson is not None else 'json',
+        'before_us_per_row': timeit.timeit(lambda: before(rows), number=args.repeat),
+        'after_us_per_row': timeit.timeit(lambda: after(rows), number=args.repeat),
+        'after_fields_us_per_row': timeit.timeit(
+            lambda: dumps({'success': True, 'data': rows_to_dicts(projected, projected_rows)}),
+            number=args.repeat
+        ),
+    }
+    for key in ('before_us_per_row', 'after_us_per_row', 'after_fields_us_per_row'):
+        results[key] = round(results[key] / args.repeat / args.rows * 1e6, 3)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_startup.py
+"""
+冷启动基准：全新解释器中 import app + create_app() 的耗时
+
+子进程把 DB_HOST 指向不可达地址（TEST-NET-1），启动阶段只要尝试连接数据库，
+就会卡到连接超时并超出预算；同时检查连接池中没有建立任何连接。
+结果超出 --budget-ms 或启动时建立了连接时退出码为 1，可直接放进 CI
+
+用法：
+    python benchmarks/bench_startup.py --runs 10 --budget-ms 800
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+from app.extentions.db_postgres import db
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'startup_ms': (created - started) * 1000,
+    'db_connections': db.pool.checkedin() + db.pool.checkedout(),
+    'modules': len(sys.modules),
+}))
+"""
+
+
+def run_once():
+    env = dict(os.environ, DB_HOST='192.0.2.1', DB_PORT='5432')
+    started = time.perf_counter()
+    output = subprocess.check_output([sys.executable, '-c', PROBE], cwd=ROOT, env=env, text=True,
+                                     stderr=subprocess.DEVNULL, timeout=120)
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='冷启动基准')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=800, help='startup_ms 中位数上限')
+    args = parser.parse_args()
+
+    # 第一次运行会编译字节码，不计入结果
+    run_once()
+    runs = [run_once() for _ in range(args.runs)]
+
+    summary = {'runs': args.runs, 'budget_ms': args.budget_ms}
+    for key in ('import_ms', 'create_app_ms', 'startup_ms', 'process_ms'):
+        values = [run[key] for run in runs]
+        summary[key] = {'median': round(statistics.median(values), 1), 'max': round(max(values), 1)}
+    summary['db_connections'] = max(run['db_connections'] for run in runs)
+    summary['modules'] = runs[-1]['modules']
+    print(json.dumps(summary, indent=2))
+
+    if summary['db_connections']:
+        print("启动阶段建立了数据库连接", file=sys.stderr)
+        sys.exit(1)
+    if summary['startup_ms']['median'] > args.budget_ms:
+        print(f"启动耗时超出预算 {args.budget_ms}ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
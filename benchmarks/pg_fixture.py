@@ -0,0 +1,129 @@
+# benchmarks/pg_fixture.py
+"""
+基准测试用的临时 PostgreSQL 集群（initdb + pg_ctl，无需容器）
+
+集群只监听本机端口，关闭 fsync 等持久化选项以加快灌数，
+预加载 pg_stat_statements 用于统计每个请求的查询次数。
+指定 --pgdata 时复用已有数据目录，跳过 initdb（大数据量只需灌一次）
+
+用法（单独启动，Ctrl+C 停止）：
+    python benchmarks/pg_fixture.py --pgdata /tmp/bench-pg
+"""
+import os
+import sys
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import subprocess
+
+BENCH_DB_NAME = 'bench'
+BENCH_DB_USER = 'bench'
+
+SERVER_SETTINGS = {
+    'shared_preload_libraries': 'pg_stat_statements',
+    'pg_stat_statements.track': 'top',
+    'fsync': 'off',
+    'synchronous_commit': 'off',
+    'full_page_writes': 'off',
+    'max_connections': '200',
+    'shared_buffers': '512MB',
+    'maintenance_work_mem': '512MB',
+    'max_wal_size': '4GB',
+}
+
+
+def find_pg_bin():
+    """按 PG_BIN、pg_config --bindir、PATH 的顺序查找 PostgreSQL 可执行文件目录"""
+    if os.getenv('PG_BIN'):
+        return os.getenv('PG_BIN')
+    try:
+        return subprocess.check_output(['pg_config', '--bindir'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    initdb = shutil.which('initdb')
+    if initdb:
+        return os.path.dirname(initdb)
+    raise RuntimeError('找不到 initdb，请安装 PostgreSQL 或设置 PG_BIN')
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class TempPostgres:
+    """临时集群；用作上下文管理器时退出即停止，未指定 pgdata 时同时删除数据目录"""
+
+    def __init__(self, pgdata=None, port=None):
+        self.bin_dir = find_pg_bin()
+        self.keep = pgdata is not None
+        self.pgdata = pgdata or tempfile.mkdtemp(prefix='bench-pg-')
+        self.port = port or _free_port()
+        self.log_path = os.path.join(self.pgdata, 'server.log') if self.keep else \
+            os.path.join(tempfile.gettempdir(), f'bench-pg-{self.port}.log')
+
+    def _run(self, name, *args):
+        subprocess.run([os.path.join(self.bin_dir, name), *args], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    def start(self):
+        if not os.path.exists(os.path.join(self.pgdata, 'PG_VERSION')):
+            self._run('initdb', '-D', self.pgdata, '-U', BENCH_DB_USER,
+                      '--auth=trust', '--encoding=UTF8', '--locale=C')
+        options = ' '.join(f'-c {key}={value}' for key, value in SERVER_SETTINGS.items())
+        self._run('pg_ctl', '-D', self.pgdata, '-l', self.log_path, '-w', 'start',
+                  '-o', f'-p {self.port} -k {self.pgdata} -c listen_addresses=127.0.0.1 {options}')
+        try:
+            self._run('createdb', '-h', '127.0.0.1', '-p', str(self.port), '-U', BENCH_DB_USER, BENCH_DB_NAME)
+        except subprocess.CalledProcessError as e:
+            # 复用数据目录时库已存在
+            if b'already exists' not in e.stderr:
+                raise
+        return self
+
+    def stop(self):
+        try:
+            self._run('pg_ctl', '-D', self.pgdata, '-m', 'fast', '-w', 'stop')
+        finally:
+            if not self.keep:
+                shutil.rmtree(self.pgdata, ignore_errors=True)
+
+    @property
+    def env(self):
+        """供 app.extentions.db_postgres 读取的连接环境变量"""
+        return {
+            'DB_NAME': BENCH_DB_NAME,
+            'DB_USER': BENCH_DB_USER,
+            'DB_PASSWORD': '',
+            'DB_HOST': '127.0.0.1',
+            'DB_PORT': str(self.port),
+        }
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动临时 PostgreSQL 集群')
+    parser.add_argument('--pgdata', help='数据目录（保留，可重复使用）')
+    parser.add_argument('--port', type=int)
+    args = parser.parse_args()
+
+    with TempPostgres(args.pgdata, args.port) as pg:
+        print(' '.join(f'{key}={value}' for key, value in pg.env.items()))
+        sys.stdout.flush()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
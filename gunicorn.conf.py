@@ -0,0 +1,70 @@
+# gunicorn.conf.py
+"""
+生产环境 gunicorn 配置（python main.py 或 gunicorn -c gunicorn.conf.py app.app:app）
+
+- preload_app：主进程只导入并创建一次应用，worker 由 fork 得到，启动只需毫秒级
+- gthread：每个 worker 进程多个线程，进程数默认等于 CPU 核数；
+  线程数不超过每个进程的连接池上限，避免线程排队等连接
+- max_requests + jitter：worker 处理一定数量请求后轮换，限制内存增长，且不会同时重启
+- post_fork 丢弃从主进程继承的连接池，post_worker_init 预热后才开始接收请求
+
+平滑重启：kill -HUP <master> 会按当前配置逐个替换 worker（preload 的代码不会重新加载）；
+更新代码请用 kill -USR2 <master> 启动新主进程，确认正常后对旧主进程 kill -WINCH、kill -QUIT
+"""
+import os
+import multiprocessing
+
+_cores = multiprocessing.cpu_count()
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', 3000)}")
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', _cores))
+threads = int(os.getenv('GUNICORN_THREADS', min(4, int(os.getenv('DB_POOL_MAX', 10)))))
+preload_app = True
+
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+# 用内存文件系统存放 worker 心跳文件，避免磁盘 IO 阻塞导致误判超时
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def on_starting(server):
+    # 清空上次运行留下的各进程指标快照
+    from app.extentions.metrics import registry
+    registry.reset()
+
+
+def post_fork(server, worker):
+    # 连接不能跨进程共享；close=False 只丢弃引用，不关闭主进程仍持有的连接
+    from app.extentions.db_postgres import db
+    db.dispose(close=False)
+
+
+def post_worker_init(worker):
+    from app.sevices.warmup import warm_up
+    warm_up(worker.wsgi)
+
+
+def worker_exit(server, worker):
+    # 写入最后一次快照，上次定时写入之后的请求也计入
+    from app.extentions.metrics import registry
+    try:
+        registry.flush()
+    except Exception as e:
+        server.log.warning(f"写入指标快照失败: {str(e)}")
+
+
+def child_exit(server, worker):
+    # 主进程中执行：把退出 worker 的直方图并入累计文件，PID 被新 worker 复用前完成
+    from app.extentions.metrics import registry
+    try:
+        registry.retire(worker.pid)
+    except Exception as e:
+        server.log.warning(f"合并 worker {worker.pid} 指标失败: {str(e)}")
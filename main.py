@@ -0,0 +1,15 @@
+# main.py
+"""
+生产入口：python main.py
+
+以 gunicorn.conf.py 的配置启动多进程服务；本地调试仍可使用 python -m app.app
+"""
+import os
+import sys
+
+from gunicorn.app.wsgiapp import run
+
+if __name__ == '__main__':
+    config = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+    sys.argv = [sys.argv[0], '--config', config, *sys.argv[1:], 'app.app:app']
+    sys.exit(run())